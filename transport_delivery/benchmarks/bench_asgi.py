@@ -0,0 +1,109 @@
+"""
+Suivis concurrents servis par le gestionnaire ASGI (vues asynchrones).
+
+Lance N consultations /api/track/<numero>/ simultanées avec AsyncClient, qui
+traverse le gestionnaire ASGI et toute la pile de middlewares, pendant que des
+appels au dashboard s'exécutent. Cache vidé avant chaque palier pour que
+chaque suivi passe par l'ORM async. Mesure ensuite N dashboards simultanés,
+regroupés en un seul calcul (core/regroupement.py). Sans limitation de débit :
+
+    python -m benchmarks.bench_asgi --concurrence 100,1000,5000
+"""
+import argparse
+import asyncio
+import os
+import time
+from decimal import Decimal
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'transport_delivery.settings')
+django.setup()
+
+import numpy as np  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import AsyncClient  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+from core import jetons, limitation, statistiques  # noqa: E402
+from core.models import Client, Destination, TypeService, Expedition, TrackingHistorique  # noqa: E402
+from core.numerotation import allouer  # noqa: E402
+
+
+def peupler(expeditions):
+    client = Client.objects.create(nom="Bench", adresse="x", telephone="0")
+    destination = Destination.objects.create(ville="Alger", pays="DZ", tarif_base=Decimal("5.00"))
+    service = TypeService.objects.create(nom="Standard", tarif_poids=Decimal("1.00"), tarif_volume=Decimal("1.00"))
+    Expedition.objects.bulk_create([
+        Expedition(numero_suivi=numero, client=client, destination=destination, service=service,
+                   poids=1.0, volume=0.1, description="Colis", montant_total=Decimal("6.10"))
+        for numero in allouer('E', expeditions)
+    ])
+    TrackingHistorique.objects.bulk_create([
+        TrackingHistorique(expedition_id=pk, lieu="Centre", statut='CENTRE_TRI')
+        for pk in Expedition.objects.values_list('id', flat=True)
+    ])
+    statistiques.reconstruire()
+    return list(Expedition.objects.values_list('numero_suivi', flat=True))
+
+
+async def palier(numeros, concurrence, dashboards, entete):
+    api = AsyncClient()
+
+    async def appel(url, headers=None):
+        debut = time.perf_counter()
+        reponse = await api.get(url, headers=headers)
+        return reponse.status_code, time.perf_counter() - debut
+
+    debut = time.perf_counter()
+    resultats = await asyncio.gather(
+        *(appel(f'/api/track/{numeros[i % len(numeros)]}/') for i in range(concurrence)),
+        *(appel('/api/analytics/dashboard/', entete) for _ in range(dashboards)),
+    )
+    return resultats[:concurrence], time.perf_counter() - debut
+
+
+async def dashboards(n, entete):
+    api = AsyncClient()
+    debut = time.perf_counter()
+    reponses = await asyncio.gather(*(api.get('/api/analytics/dashboard/', headers=entete) for _ in range(n)))
+    assert all(reponse.status_code == 200 for reponse in reponses)
+    return time.perf_counter() - debut
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrence', default='10,100,1000', help="suivis simultanés par palier")
+    parser.add_argument('--dashboards', type=int, default=5, help="appels au dashboard pendant chaque palier")
+    parser.add_argument('--expeditions', type=int, default=1000)
+    parser.add_argument('--simultanes', type=int, default=50, help="dashboards simultanés")
+    args = parser.parse_args()
+
+    setup_test_environment()
+    limitation.BUDGETS.clear()
+    ancien_nom = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        numeros = peupler(args.expeditions)
+        # Le suivi est public ; le dashboard demande un jeton
+        entete = {'Authorization': f"Bearer {jetons.emettre(User.objects.create_user('bench'))['acces']}"}
+        print(f"{connection.vendor}, {args.dashboards} dashboards par palier")
+        print(f"{'suivis':>7} {'durée s':>8} {'suivis/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'erreurs':>8}")
+        for n in (int(x) for x in args.concurrence.split(',')):
+            cache.clear()
+            suivis, duree = asyncio.run(palier(numeros, n, args.dashboards, entete))
+            latences = np.array([d for _, d in suivis]) * 1000
+            erreurs = sum(1 for code, _ in suivis if code != 200)
+            print(f"{n:>7} {duree:>8.2f} {n / duree:>9.0f} {np.percentile(latences, 50):>8.1f} "
+                  f"{np.percentile(latences, 99):>8.1f} {erreurs:>8}")
+        seul = min(asyncio.run(dashboards(1, entete)) for _ in range(5))
+        simultanes = asyncio.run(dashboards(args.simultanes, entete))
+        print(f"dashboard seul {seul * 1000:.1f} ms, {args.simultanes} simultanés {simultanes * 1000:.1f} ms")
+    finally:
+        connection.creation.destroy_test_db(ancien_nom, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
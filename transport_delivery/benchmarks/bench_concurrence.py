@@ -0,0 +1,144 @@
+"""
+Débit d'écriture soutenu avec N threads écrivains (événements de suivi).
+
+Chaque écrivain enregistre des événements TrackingHistorique, un par
+transaction, comme les mises à jour envoyées par les chauffeurs : insertion
+puis recopie du dernier événement sur l'expédition (signal). Des lecteurs
+optionnels consultent l'historique en parallèle. La base est celle de
+DATABASES (SQLite ou PostgreSQL selon DB_ENGINE), recréée comme base de test :
+
+    python -m benchmarks.bench_concurrence --ecrivains 1,4,16 --duree 5
+    python -m benchmarks.bench_concurrence --sans-reglages   # SQLite sans WAL ni IMMEDIATE
+    DB_ENGINE=postgresql python -m benchmarks.bench_concurrence
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'transport_delivery.settings')
+django.setup()
+
+import numpy as np  # noqa: E402
+from django.db import OperationalError, connection, transaction  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+from core.models import Client, Destination, TypeService, Expedition, TrackingHistorique  # noqa: E402
+from core.numerotation import allouer  # noqa: E402
+
+
+def peupler(expeditions):
+    client = Client.objects.create(nom="Bench", adresse="x", telephone="0")
+    destination = Destination.objects.create(ville="Alger", pays="DZ", tarif_base=Decimal("5.00"))
+    service = TypeService.objects.create(nom="Standard", tarif_poids=Decimal("1.00"), tarif_volume=Decimal("1.00"))
+    Expedition.objects.bulk_create([
+        Expedition(numero_suivi=numero, client=client, destination=destination, service=service,
+                   poids=1.0, volume=0.1, description="Colis", montant_total=Decimal("6.10"))
+        for numero in allouer('E', expeditions)
+    ])
+    return list(Expedition.objects.values_list('id', flat=True))
+
+
+class Resultats:
+    def __init__(self):
+        self.verrou = threading.Lock()
+        self.latences, self.erreurs, self.lectures = [], {}, 0
+
+    def ajouter(self, latences, erreurs, lectures=0):
+        with self.verrou:
+            self.latences += latences
+            self.lectures += lectures
+            for message, nombre in erreurs.items():
+                self.erreurs[message] = self.erreurs.get(message, 0) + nombre
+
+
+def ecrivain(ids, fin, graine, resultats):
+    hasard = random.Random(graine)
+    latences, erreurs = [], {}
+    try:
+        while time.perf_counter() < fin:
+            debut = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    TrackingHistorique.objects.create(
+                        expedition_id=hasard.choice(ids), lieu=f"Centre {graine}", statut='CENTRE_TRI',
+                    )
+                latences.append(time.perf_counter() - debut)
+            except OperationalError as exc:
+                erreurs[str(exc)] = erreurs.get(str(exc), 0) + 1
+    finally:
+        connection.close()
+        resultats.ajouter(latences, erreurs)
+
+
+def lecteur(ids, fin, graine, resultats):
+    hasard = random.Random(graine)
+    lectures, erreurs = 0, {}
+    try:
+        while time.perf_counter() < fin:
+            try:
+                list(TrackingHistorique.objects.filter(expedition_id=hasard.choice(ids))[:20])
+                lectures += 1
+            except OperationalError as exc:
+                erreurs[f"lecture : {exc}"] = erreurs.get(f"lecture : {exc}", 0) + 1
+    finally:
+        connection.close()
+        resultats.ajouter([], erreurs, lectures)
+
+
+def mesurer(ids, ecrivains, lecteurs, duree):
+    resultats = Resultats()
+    fin = time.perf_counter() + duree
+    threads = [threading.Thread(target=ecrivain, args=(ids, fin, i, resultats)) for i in range(ecrivains)]
+    threads += [threading.Thread(target=lecteur, args=(ids, fin, 1000 + i, resultats)) for i in range(lecteurs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return resultats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ecrivains', default='1,2,4,8,16', help="nombres de threads écrivains, séparés par des virgules")
+    parser.add_argument('--lecteurs', type=int, default=2)
+    parser.add_argument('--duree', type=float, default=5.0, help="secondes par palier")
+    parser.add_argument('--expeditions', type=int, default=1000)
+    parser.add_argument('--sans-reglages', action='store_true',
+                        help="SQLite : options par défaut (journal DELETE, transactions DEFERRED)")
+    args = parser.parse_args()
+
+    setup_test_environment()
+    reglages = connection.settings_dict
+    if connection.vendor == 'sqlite':
+        # Base de test en fichier : une base en mémoire ne dit rien du journal
+        reglages['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), 'bench_concurrence.sqlite3')
+        if args.sans_reglages:
+            reglages['OPTIONS'] = {}
+    ancien_nom = reglages['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        ids = peupler(args.expeditions)
+        connection.close()
+        options = reglages.get('OPTIONS', {})
+        print(f"{connection.vendor}, options : {options or 'par défaut'}, {args.lecteurs} lecteurs, {args.duree:.0f} s par palier")
+        print(f"{'écrivains':>9} {'écritures/s':>12} {'p50 ms':>8} {'p99 ms':>8} {'lectures/s':>11} {'erreurs':>8}")
+        for n in (int(x) for x in args.ecrivains.split(',')):
+            resultats = mesurer(ids, n, args.lecteurs, args.duree)
+            latences = np.array(resultats.latences) * 1000 if resultats.latences else np.zeros(1)
+            erreurs = sum(resultats.erreurs.values())
+            print(f"{n:>9} {len(resultats.latences) / args.duree:>12.0f} {np.percentile(latences, 50):>8.1f} "
+                  f"{np.percentile(latences, 99):>8.1f} {resultats.lectures / args.duree:>11.0f} {erreurs:>8}")
+            for message, nombre in resultats.erreurs.items():
+                print(f"{'':>9} {nombre} x {message}")
+    finally:
+        connection.creation.destroy_test_db(ancien_nom, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Nombre de requêtes et temps de réponse des listes imbriquées.
+
+Crée dans une base de test T tournées de S arrêts (et autant de factures),
+puis appelle /api/tournees/ et /api/factures/ avec et sans ?expand= :
+
+    python -m benchmarks.bench_imbrication --tournees 50 --arrets 100
+"""
+import argparse
+import os
+import time
+from datetime import date
+from decimal import Decimal
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'transport_delivery.settings')
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext, setup_test_environment  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from core import jetons  # noqa: E402
+from core.models import (  # noqa: E402
+    Client, Chauffeur, Vehicule, Destination, TypeService, Expedition,
+    Tournee, TourneeExpedition, Facture, FactureExpedition,
+)
+from core.numerotation import allouer  # noqa: E402
+
+
+def peupler(tournees, arrets):
+    client = Client.objects.create(nom="Bench", adresse="x", telephone="0")
+    chauffeur = Chauffeur.objects.create(nom="Bench", permis="B")
+    vehicule = Vehicule.objects.create(matricule="BENCH-1", type_vehicule="Camion", capacite=10000)
+    destination = Destination.objects.create(ville="Alger", pays="DZ", tarif_base=Decimal("5.00"))
+    service = TypeService.objects.create(nom="Standard", tarif_poids=Decimal("1.00"), tarif_volume=Decimal("1.00"))
+    total = tournees * arrets
+    expeditions = Expedition.objects.bulk_create([
+        Expedition(numero_suivi=numero, client=client, destination=destination, service=service,
+                   poids=1.0, volume=0.1, description="Colis", montant_total=Decimal("6.10"))
+        for numero in allouer('E', total)
+    ])
+    lignes_tournee, lignes_facture = [], []
+    for t, (numero_tournee, numero_facture) in enumerate(zip(allouer('T', tournees), allouer('F', tournees))):
+        tournee = Tournee.objects.create(numero_tournee=numero_tournee, date=date.today(),
+                                         chauffeur=chauffeur, vehicule=vehicule)
+        facture = Facture.objects.create(numero_facture=numero_facture, client=client, date_echeance=date.today(),
+                                         montant_ht=Decimal("100.00"), taux_tva=Decimal("19.00"))
+        for ordre, expedition in enumerate(expeditions[t * arrets:(t + 1) * arrets]):
+            lignes_tournee.append(TourneeExpedition(tournee=tournee, expedition=expedition, ordre=ordre))
+            lignes_facture.append(FactureExpedition(facture=facture, expedition=expedition))
+    TourneeExpedition.objects.bulk_create(lignes_tournee, batch_size=1000)
+    FactureExpedition.objects.bulk_create(lignes_facture, batch_size=1000)
+
+
+def mesurer(api, url, params):
+    with CaptureQueriesContext(connection) as ctx:
+        debut = time.perf_counter()
+        response = api.get(url, params)
+        duree = time.perf_counter() - debut
+    assert response.status_code == 200, response.status_code
+    return len(ctx.captured_queries), duree, len(response.content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tournees', type=int, default=50)
+    parser.add_argument('--arrets', type=int, default=100)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    ancien_nom = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        peupler(args.tournees, args.arrets)
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION=f"Bearer {jetons.emettre(User.objects.create_user('bench'))['acces']}")
+        print(f"{'requête':<46} {'requêtes':>9} {'temps s':>8} {'octets':>10}")
+        for url in ('/api/tournees/', '/api/factures/'):
+            for params in ({}, {'expand': ''}, {'fields': 'id,statut'}):
+                params = {'page_size': args.tournees, **params}
+                requetes, duree, taille = mesurer(api, url, params)
+                libelle = url + ('?' + '&'.join(f'{k}={v}' for k, v in params.items()))
+                print(f'{libelle:<46} {requetes:>9} {duree:>8.3f} {taille:>10}')
+    finally:
+        connection.creation.destroy_test_db(ancien_nom, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
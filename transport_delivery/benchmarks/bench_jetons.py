@@ -0,0 +1,82 @@
+"""
+Coût de l'authentification : vérification d'un jeton d'accès contre la
+session Django (lecture de la session puis de l'utilisateur).
+
+JetonAuthentication ne lit pas la base : signature HMAC, âge, dict des
+sessions révoquées. Objectif : moins de 0,1 ms par requête authentifiée.
+
+    python -m benchmarks.bench_jetons --appels 100000
+"""
+import argparse
+import os
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'transport_delivery.settings')
+django.setup()
+
+from importlib import import_module  # noqa: E402
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import CaptureQueriesContext, setup_test_environment  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from core import jetons  # noqa: E402
+
+OBJECTIF_MS = 0.1
+
+
+def mesurer(fonction, appels):
+    """ms par appel et requêtes SQL d'un appel"""
+    with CaptureQueriesContext(connection) as requetes:
+        assert fonction().is_authenticated
+    debut = time.perf_counter()
+    for _ in range(appels):
+        fonction()
+    return (time.perf_counter() - debut) * 1000 / appels, len(requetes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--appels', type=int, default=20_000)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    ancien_nom = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        user = User.objects.create_user('bench', 'bench@example.com', 'bench')
+        fabrique = APIRequestFactory()
+        authentification = jetons.JetonAuthentication()
+        avec_jeton = fabrique.get('/api/clients/', HTTP_AUTHORIZATION=f"Bearer {jetons.emettre(user)['acces']}")
+
+        navigateur = Client()
+        navigateur.force_login(user)
+        cle = navigateur.cookies[settings.SESSION_COOKIE_NAME].value
+        SessionStore = import_module(settings.SESSION_ENGINE).SessionStore
+
+        def par_session():
+            # Ce que font SessionMiddleware puis AuthenticationMiddleware à chaque requête
+            requete = fabrique.get('/api/clients/')
+            requete.session = SessionStore(cle)
+            return get_user(requete)
+
+        print(f"{'authentification':<20} {'ms/appel':>9} {'requêtes':>9}")
+        for libelle, fonction in (
+            ('jeton', lambda: authentification.authenticate(avec_jeton)[0]),
+            ('session', par_session),
+        ):
+            ms, requetes = mesurer(fonction, args.appels)
+            print(f"{libelle:<20} {ms:>9.4f} {requetes:>9}"
+                  f"{'' if libelle != 'jeton' or ms < OBJECTIF_MS else f'  > objectif {OBJECTIF_MS} ms'}")
+    finally:
+        connection.creation.destroy_test_db(ancien_nom, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
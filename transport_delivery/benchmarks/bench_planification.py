@@ -0,0 +1,66 @@
+"""
+Répartition de N colis entre V véhicules sur des données synthétiques.
+
+Mesure le temps de first-fit decreasing + recherche locale et la qualité du
+résultat (remplissage, destinations par tournée, colis non affectés) :
+
+    python -m benchmarks.bench_planification --colis 10000 --vehicules 200
+"""
+import argparse
+import os
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'transport_delivery.settings')
+django.setup()
+
+import numpy as np  # noqa: E402
+
+from core import planification, routage  # noqa: E402
+
+
+def donnees(colis, vehicules, destinations, graine):
+    rng = np.random.default_rng(graine)
+    latitudes = 36.0 + rng.uniform(-3, 3, destinations)
+    longitudes = 3.0 + rng.uniform(-3, 3, destinations)
+    matrice = routage.haversine(latitudes, longitudes)
+    poids = rng.lognormal(1.5, 0.8, colis)
+    volumes = rng.lognormal(-2.5, 0.7, colis)
+    destinations_colis = rng.integers(0, destinations, colis)
+    capacites = rng.choice([500.0, 1000.0, 3500.0], vehicules)
+    capacites_volume = capacites / 200
+    return poids, volumes, destinations_colis, capacites, capacites_volume, matrice
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--colis', type=int, default=10000)
+    parser.add_argument('--vehicules', type=int, default=200)
+    parser.add_argument('--destinations', type=int, default=80)
+    parser.add_argument('--graine', type=int, default=0)
+    args = parser.parse_args()
+
+    poids, volumes, dest, capacites, capacites_volume, matrice = donnees(
+        args.colis, args.vehicules, args.destinations, args.graine
+    )
+    debut = time.perf_counter()
+    affectation = planification.repartir(poids, volumes, dest, capacites, capacites_volume, matrice)
+    duree = time.perf_counter() - debut
+
+    places = affectation >= 0
+    utilises = np.unique(affectation[places])
+    charge = np.bincount(affectation[places], weights=poids[places], minlength=len(capacites))
+    charge_volume = np.bincount(affectation[places], weights=volumes[places], minlength=len(capacites))
+    remplissage = np.maximum(charge / capacites, charge_volume / capacites_volume)[utilises]
+    par_tournee = [len(np.unique(dest[affectation == b])) for b in utilises]
+    print(f"colis               : {args.colis} ({poids.sum():.0f} kg, capacité totale {capacites.sum():.0f} kg)")
+    print(f"temps               : {duree:.3f} s")
+    print(f"affectés            : {places.sum()} ({places.mean():.1%})")
+    print(f"véhicules utilisés  : {len(utilises)} / {len(capacites)}")
+    print(f"remplissage moyen   : {remplissage.mean():.1%} (poids ou volume, le plus contraint)")
+    print(f"destinations/tournée: {np.mean(par_tournee):.1f} (max {max(par_tournee)})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Recherche plein texte : autocomplétion et ?q= sur N expéditions.
+
+Crée dans une base de test des clients, des destinations et N expéditions
+(descriptions tirées d'un vocabulaire, graine fixe), insérées en
+bulk_create donc indexées par les triggers. Mesure ensuite, pour des
+préfixes rares et des préfixes présents partout, les 20 meilleurs résultats
+(recherche.classer), GET /api/search/ et GET /api/expeditions/?q=.
+Objectif : moins de 10 ms pour les 20 meilleurs sur 1M expéditions.
+
+    python -m benchmarks.bench_recherche --expeditions 1000000
+"""
+import argparse
+import os
+import random
+import time
+from decimal import Decimal
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'transport_delivery.settings')
+django.setup()
+
+import numpy as np  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from core import jetons, limitation, recherche  # noqa: E402
+from core.models import Client, Destination, TypeService, Expedition  # noqa: E402
+from core.numerotation import allouer  # noqa: E402
+
+OBJECTIF_MS = 10
+OBJETS = ['Colis', 'Carton', 'Palette', 'Enveloppe', 'Caisse', 'Sac', 'Fût', 'Rouleau', 'Malle', 'Valise']
+CONTENUS = ['vêtements', 'livres', 'pièces détachées', 'électroménager', 'médicaments', 'documents',
+            'réfrigérateur', 'téléviseur', 'vaisselle', 'outillage', 'jouets', 'chaussures',
+            'café', 'épices', 'textile', 'informatique', 'mobilier', 'cosmétiques', 'pneus', 'câbles']
+ETATS = ['fragile', 'urgent', 'lourd', 'volumineux', 'sous douane', '']
+NOMS = ['Benali', 'Haddad', 'Kaci', 'Mansouri', 'Bouzid', 'Ferhat', 'Saidi', 'Belkacem', 'Amrani', 'Cherif']
+VILLES = ['Alger', 'Oran', 'Constantine', 'Annaba', 'Blida', 'Sétif', 'Batna', 'Tlemcen', 'Béjaïa', 'Biskra']
+
+
+def peupler(expeditions, clients, graine):
+    hasard = random.Random(graine)
+    Client.objects.bulk_create([
+        Client(nom=f"{hasard.choice(('Société', 'Ets', 'SARL', ''))} {hasard.choice(NOMS)} {i}".strip(),
+               adresse="x", telephone=f"0{hasard.choice('567')}{i:08d}")
+        for i in range(clients)
+    ], batch_size=2000)
+    Destination.objects.bulk_create([
+        Destination(ville=f"{VILLES[i % len(VILLES)]} {i // len(VILLES)}", pays="DZ", tarif_base=Decimal("5.00"))
+        for i in range(500)
+    ])
+    service = TypeService.objects.create(nom="Standard", tarif_poids=Decimal("1.00"), tarif_volume=Decimal("1.00"))
+    client_ids = list(Client.objects.values_list('id', flat=True))
+    destination_ids = list(Destination.objects.values_list('id', flat=True))
+    numeros = allouer('E', expeditions)
+    for debut in range(0, expeditions, 50_000):
+        with transaction.atomic():
+            Expedition.objects.bulk_create([
+                Expedition(numero_suivi=numero, client_id=hasard.choice(client_ids),
+                           destination_id=hasard.choice(destination_ids), service=service, poids=1.0, volume=0.1,
+                           description=f"{hasard.choice(OBJETS)} {hasard.choice(CONTENUS)} {hasard.choice(ETATS)}",
+                           montant_total=Decimal("6.10"))
+                for numero in numeros[debut:debut + 50_000]
+            ], batch_size=2000)
+    return numeros
+
+
+def chronometrer(fonction, repetitions):
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        durees.append((time.perf_counter() - debut) * 1000)
+    return np.percentile(durees, 50), np.percentile(durees, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--expeditions', type=int, default=200_000)
+    parser.add_argument('--clients', type=int, default=10_000)
+    parser.add_argument('--repetitions', type=int, default=50)
+    parser.add_argument('--graine', type=int, default=0)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    limitation.BUDGETS.clear()
+    ancien_nom = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        debut = time.perf_counter()
+        numeros = peupler(args.expeditions, args.clients, args.graine)
+        print(f"{args.expeditions} expéditions, {args.clients} clients ({connection.vendor}), "
+              f"insérées et indexées en {time.perf_counter() - debut:.1f} s")
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION=f"Bearer {jetons.emettre(User.objects.create_user('bench'))['acces']}")
+        milieu = numeros[len(numeros) // 2]
+        requetes = [
+            ('numéro complet', milieu),
+            ('numéro, préfixe', milieu[:-2]),
+            ('numéro, préfixe commun', milieu[:3]),
+            ('chiffres du numéro', milieu[2:]),
+            ('réfrig', 'réfrig'),
+            ('colis frag', 'colis frag'),
+            ('co (presque tout)', 'co'),
+            ('client', 'benali 12'),
+            ('téléphone', '0500001'),
+            ('ville', 'béj'),
+        ]
+        print(f"{'recherche':<24} {'correspond.':>11} {'top20 p50':>10} {'p99':>7} "
+              f"{'/search p50':>12} {'?q= p50':>8}   (ms)")
+        for libelle, texte in requetes:
+            correspondances = recherche.filtrer(Expedition.objects.all(), texte).count()
+            p50, p99 = chronometrer(lambda: recherche.classer(Expedition, texte), args.repetitions)
+            http, _ = chronometrer(lambda: api.get('/api/search/', {'q': texte}), args.repetitions)
+            liste, _ = chronometrer(lambda: api.get('/api/expeditions/', {'q': texte, 'page_size': 20}),
+                                    args.repetitions)
+            print(f"{libelle:<24} {correspondances:>11} {p50:>10.2f} {p99:>7.2f} {http:>12.2f} {liste:>8.2f}"
+                  f"{'' if p50 < OBJECTIF_MS else f'  > objectif {OBJECTIF_MS} ms'}")
+    finally:
+        connection.creation.destroy_test_db(ancien_nom, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
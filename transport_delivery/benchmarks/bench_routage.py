@@ -0,0 +1,51 @@
+"""
+Ordonnancement d'une tournée de N arrêts tirés au hasard.
+
+Compare la longueur dans l'ordre de saisie, après plus proche voisin et après
+2-opt/Or-opt, avec le temps de calcul :
+
+    python -m benchmarks.bench_routage --arrets 200 --repetitions 5
+"""
+import argparse
+import os
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'transport_delivery.settings')
+django.setup()
+
+import numpy as np  # noqa: E402
+
+from core import routage  # noqa: E402
+
+
+def tournee_aleatoire(n, graine):
+    """Arrêts répartis autour d'Alger (±2°), matrice haversine"""
+    rng = np.random.default_rng(graine)
+    latitudes = 36.75 + rng.uniform(-2, 2, n)
+    longitudes = 3.06 + rng.uniform(-2, 2, n)
+    return routage.haversine(latitudes, longitudes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--arrets', type=int, default=200)
+    parser.add_argument('--repetitions', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'graine':>6} {'saisie km':>11} {'voisin km':>11} {'optimisé km':>12} {'gain':>7} {'temps s':>8}")
+    for graine in range(args.repetitions):
+        matrice = tournee_aleatoire(args.arrets, graine)
+        saisie = routage.longueur(matrice, np.arange(args.arrets))
+        voisin = routage.longueur(matrice, routage.plus_proche_voisin(matrice))
+        debut = time.perf_counter()
+        ordre = routage.optimiser(matrice)
+        duree = time.perf_counter() - debut
+        optimise = routage.longueur(matrice, ordre)
+        print(f'{graine:>6} {saisie:>11.1f} {voisin:>11.1f} {optimise:>12.1f} '
+              f'{1 - optimise / saisie:>7.1%} {duree:>8.3f}')
+
+
+if __name__ == '__main__':
+    main()
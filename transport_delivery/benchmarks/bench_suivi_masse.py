@@ -0,0 +1,134 @@
+"""
+Scans des hubs : événements de suivi un par un contre l'import en masse.
+
+Crée X expéditions dans une base de test, puis enregistre N scans aléatoires
+(graine fixe, 5 % de scans répétés) par trois chemins : TrackingHistorique
+créé ligne à ligne (ce que fait POST /api/tracking/, signaux compris),
+ingestion.importer_evenements, et POST /api/tracking/bulk/ en NDJSON
+(analyse du corps comprise). Objectif : 20 000 événements/s.
+
+    python -m benchmarks.bench_suivi_masse --evenements 100000
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'transport_delivery.settings')
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from core import jetons  # noqa: E402
+from core.ingestion import importer_evenements  # noqa: E402
+from core.models import Client, Destination, TypeService, Expedition, TrackingHistorique  # noqa: E402
+from core.numerotation import allouer  # noqa: E402
+
+OBJECTIF = 20_000
+ETAPES = ('CENTRE_TRI', 'EN_TRANSIT', 'LIVRAISON', 'LIVRE', 'ECHEC')
+
+
+def peupler(expeditions):
+    client = Client.objects.create(nom="Bench", adresse="x", telephone="0")
+    destination = Destination.objects.create(ville="Alger", pays="DZ", tarif_base=Decimal("5.00"))
+    service = TypeService.objects.create(nom="Standard", tarif_poids=Decimal("1.00"), tarif_volume=Decimal("1.00"))
+    Expedition.objects.bulk_create([
+        Expedition(numero_suivi=numero, client=client, destination=destination, service=service,
+                   poids=1.0, volume=0.1, description="Colis", montant_total=Decimal("6.10"))
+        for numero in allouer('E', expeditions)
+    ], batch_size=2000)
+    return list(Expedition.objects.values_list('numero_suivi', flat=True))
+
+
+def scans(numeros, n, graine):
+    hasard = random.Random(graine)
+    debut = timezone.now() - timedelta(days=1)
+    lignes = []
+    for i in range(n):
+        if lignes and hasard.random() < 0.05:
+            lignes.append(hasard.choice(lignes))  # scan répété
+            continue
+        lignes.append({
+            'numero_suivi': hasard.choice(numeros), 'lieu': f"Hub {hasard.randrange(40)}",
+            'statut': hasard.choice(ETAPES), 'date_heure': (debut + timedelta(milliseconds=i)).isoformat(),
+        })
+    return lignes
+
+
+def mesurer(fonction):
+    # Compteur plutôt que connection.queries, limité à 9000 entrées
+    requetes = 0
+
+    def compter(execute, sql, params, many, context):
+        nonlocal requetes
+        requetes += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(compter), transaction.atomic():
+        debut = time.perf_counter()
+        fonction()
+        duree = time.perf_counter() - debut
+        # Chaque chemin repart de la même base
+        transaction.set_rollback(True)
+    return duree, requetes
+
+
+def un_par_un(lignes, ids):
+    for ligne in lignes:
+        TrackingHistorique.objects.create(
+            expedition_id=ids[ligne['numero_suivi']], lieu=ligne['lieu'], statut=ligne['statut'],
+            date_heure=ligne['date_heure'],
+        )
+
+
+def par_http(lignes, acces):
+    corps = '\n'.join(json.dumps(ligne) for ligne in lignes)
+    api = APIClient()
+    api.credentials(HTTP_AUTHORIZATION=f'Bearer {acces}')
+    reponse = api.post('/api/tracking/bulk/', corps, content_type='application/x-ndjson')
+    assert reponse.status_code == 201, reponse.content[:500]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--evenements', type=int, default=100_000)
+    parser.add_argument('--expeditions', type=int, default=20_000)
+    parser.add_argument('--unitaires', type=int, default=2000, help="scans du chemin un par un (lent)")
+    parser.add_argument('--graine', type=int, default=0)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    ancien_nom = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        numeros = peupler(args.expeditions)
+        ids = dict(Expedition.objects.values_list('numero_suivi', 'id'))
+        lignes = scans(numeros, args.evenements, args.graine)
+        acces = jetons.emettre(User.objects.create_user('scanner'))['acces']
+
+        print(f"{args.evenements} scans sur {args.expeditions} expéditions ({connection.vendor})")
+        print(f"{'chemin':<30} {'scans':>8} {'temps s':>8} {'requêtes':>9} {'scans/s':>9}")
+        for libelle, n, fonction in (
+            ('un par un (signaux)', args.unitaires, lambda: un_par_un(lignes[:args.unitaires], ids)),
+            ('importer_evenements', args.evenements, lambda: importer_evenements(lignes)),
+            ('POST /api/tracking/bulk/', args.evenements, lambda: par_http(lignes, acces)),
+        ):
+            duree, requetes = mesurer(fonction)
+            debit = n / duree
+            print(f"{libelle:<30} {n:>8} {duree:>8.2f} {requetes:>9} {debit:>9.0f}"
+                  f"{'' if debit >= OBJECTIF else f'  < objectif {OBJECTIF}'}")
+    finally:
+        connection.creation.destroy_test_db(ancien_nom, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Chiffrage : Expedition.save() ligne à ligne contre le devis par lot.
+
+Crée dans une base de test D destinations et S services, puis chiffre N
+lignes aléatoires (graine fixe) par les deux chemins :
+
+    python -m benchmarks.bench_tarification --lignes 5000
+"""
+import argparse
+import os
+import random
+import time
+from decimal import Decimal
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'transport_delivery.settings')
+django.setup()
+
+from django.db import connection, transaction  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+from core import devis, tarification  # noqa: E402
+from core.models import Client, Destination, TypeService, Expedition  # noqa: E402
+
+
+def peupler(destinations, services):
+    Destination.objects.bulk_create([
+        Destination(ville=f"Ville {i}", pays="DZ", tarif_base=Decimal(5 + i % 20))
+        for i in range(destinations)
+    ])
+    TypeService.objects.bulk_create([
+        TypeService(nom=f"Service {i}", tarif_poids=Decimal('1.25') + i, tarif_volume=Decimal('3.10') + i)
+        for i in range(services)
+    ])
+    return Client.objects.create(nom="Bench", adresse="x", telephone="0")
+
+
+def lignes_aleatoires(n, graine=42):
+    hasard = random.Random(graine)
+    destinations = list(Destination.objects.values_list('id', flat=True))
+    services = list(TypeService.objects.values_list('id', flat=True))
+    return [{
+        'destination': hasard.choice(destinations), 'service': hasard.choice(services),
+        'poids': round(hasard.uniform(0.1, 80), 3), 'volume': round(hasard.uniform(0.01, 3), 3),
+    } for _ in range(n)]
+
+
+def mesurer(fonction):
+    # Compteur plutôt que connection.queries, limité à 9000 entrées
+    requetes = 0
+
+    def compter(execute, sql, params, many, context):
+        nonlocal requetes
+        requetes += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(compter):
+        debut = time.perf_counter()
+        resultat = fonction()
+        duree = time.perf_counter() - debut
+    return resultat, duree, requetes
+
+
+def par_save(client, lignes):
+    """Chemin historique : une expédition créée (et annulée) par prix voulu"""
+    montants = []
+    with transaction.atomic():
+        for i, ligne in enumerate(lignes):
+            expedition = Expedition(
+                numero_suivi=f'BENCH{i}', client=client, description="Colis",
+                destination_id=ligne['destination'], service_id=ligne['service'],
+                poids=ligne['poids'], volume=ligne['volume'],
+            )
+            expedition.save()
+            montants.append(expedition.montant_total.quantize(devis.CENTIME))
+        transaction.set_rollback(True)
+    return montants
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lignes', type=int, default=5000)
+    parser.add_argument('--destinations', type=int, default=200)
+    parser.add_argument('--services', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    ancien_nom = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        client = peupler(args.destinations, args.services)
+        lignes = lignes_aleatoires(args.lignes)
+
+        attendus, duree_save, requetes_save = mesurer(lambda: par_save(client, lignes))
+        tarification._grilles = None
+        froid, duree_froid, requetes_froid = mesurer(lambda: devis.coter(lignes))
+        chaud, duree_chaud, requetes_chaud = mesurer(lambda: devis.coter(lignes))
+
+        for resultat in (froid, chaud):
+            obtenus = [Decimal(ligne['montant_total']) for ligne in resultat['resultats']]
+            assert not resultat['erreurs'] and obtenus == attendus, "montants différents de save()"
+
+        print(f"{args.lignes} lignes, {args.destinations} destinations, {args.services} services")
+        print(f"{'chemin':<28} {'temps s':>8} {'requêtes':>9} {'lignes/s':>10}")
+        for libelle, duree, requetes in (
+            ('save() ligne à ligne', duree_save, requetes_save),
+            ('devis (grilles à charger)', duree_froid, requetes_froid),
+            ('devis (grilles en mémoire)', duree_chaud, requetes_chaud),
+        ):
+            print(f'{libelle:<28} {duree:>8.3f} {requetes:>9} {args.lignes / duree:>10.0f}')
+    finally:
+        connection.creation.destroy_test_db(ancien_nom, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
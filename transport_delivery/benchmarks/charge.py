@@ -0,0 +1,218 @@
+"""
+Test de charge de l'API sur un jeu de données à l'échelle voulue.
+
+Génère les données (benchmarks/generateur.py) dans une base de test, puis
+appelle chaque route du routeur (list, retrieve, actions GET dont celles
+d'analytics) ainsi que le suivi public et les devis. Pour chaque route :
+latences p50/p95/p99, requêtes SQL par appel et pic de mémoire (RSS) du
+processus, sans limitation de débit. Les résultats sont écrits en JSON pour comparer deux exécutions :
+
+    python -m benchmarks.charge --echelle 0.01 --repetitions 30 --sortie avant.json
+    python -m benchmarks.charge --echelle 0.01 --repetitions 30 --comparer avant.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import re
+import resource
+import time
+from datetime import datetime
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'transport_delivery.settings')
+django.setup()
+
+import numpy as np  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.cache import caches  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from benchmarks import generateur  # noqa: E402
+from core import limitation  # noqa: E402
+from core.models import Destination, Expedition, TypeService  # noqa: E402
+from transport_delivery.urls import router  # noqa: E402
+
+PERCENTILES = (50, 95, 99)
+
+
+class Route:
+    def __init__(self, nom, methode, url, donnees=None, ids=None):
+        self.nom, self.methode, self.url, self.donnees, self.ids = nom, methode, url, donnees, ids
+
+    def appel(self, i):
+        url = self.url.format(pk=self.ids[i % len(self.ids)]) if self.ids else self.url
+        return self.methode, url, self.donnees
+
+
+def _ids(model, nombre, rng):
+    """Identifiants tirés au hasard (les tables générées ont des id contigus)"""
+    bornes = model.objects.order_by().values_list('pk', flat=True)
+    premier, dernier = bornes.order_by('pk').first(), bornes.order_by('-pk').first()
+    if premier is None:
+        return None
+    return rng.integers(premier, dernier + 1, nombre).tolist()
+
+
+def routes(repetitions, rng):
+    """Routes à mesurer, déduites du routeur (transport_delivery/urls.py)"""
+    resultat = []
+    for prefixe, viewset, _ in router.registry:
+        base = f'/api/{prefixe}/'
+        model = viewset.queryset.model if getattr(viewset, 'queryset', None) is not None else None
+        ids = _ids(model, repetitions, rng) if model is not None else None
+        if hasattr(viewset, 'list'):
+            resultat.append(Route(f'{prefixe}-list', 'get', base))
+            resultat.append(Route(f'{prefixe}-list-100', 'get', base + '?page_size=100'))
+        if hasattr(viewset, 'retrieve') and ids:
+            resultat.append(Route(f'{prefixe}-detail', 'get', base + '{pk}/', ids=ids))
+        for action in viewset.get_extra_actions():
+            if 'get' not in action.mapping:
+                continue
+            if action.detail and ids:
+                resultat.append(Route(f'{prefixe}-{action.url_path}', 'get', base + '{pk}/' + action.url_path + '/', ids=ids))
+            elif not action.detail:
+                resultat.append(Route(f'{prefixe}-{action.url_path}', 'get', base + action.url_path + '/'))
+
+    numeros = list(Expedition.objects.filter(pk__in=_ids(Expedition, repetitions, rng) or [])
+                   .values_list('numero_suivi', flat=True))
+    if numeros:
+        resultat.append(Route('track', 'get', '/api/track/{pk}/', ids=numeros))
+    destinations = list(Destination.objects.values_list('id', flat=True)[:50])
+    services = list(TypeService.objects.values_list('id', flat=True))
+    if destinations and services:
+        lignes = [
+            {'destination': destinations[i % len(destinations)], 'service': services[i % len(services)],
+             'poids': 1.5 + i, 'volume': 0.1}
+            for i in range(100)
+        ]
+        resultat.append(Route('quotes-100', 'post', '/api/quotes/', donnees=lignes))
+    return resultat
+
+
+def rss_mo():
+    """Pic de mémoire résidente du processus, en Mo"""
+    pic = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pic / (1024 * 1024) if platform.system() == 'Darwin' else pic / 1024
+
+
+def mesurer(api, route, repetitions, echauffement):
+    requetes = 0
+
+    def compter(execute, sql, params, many, context):
+        nonlocal requetes
+        requetes += 1
+        return execute(sql, params, many, context)
+
+    durees, par_appel, statuts = [], [], {}
+    rss_avant = rss_mo()
+    for i in range(echauffement + repetitions):
+        methode, url, donnees = route.appel(i)
+        requetes = 0
+        with connection.execute_wrapper(compter):
+            debut = time.perf_counter()
+            reponse = getattr(api, methode)(url, donnees, format='json') if donnees else getattr(api, methode)(url)
+            if reponse.streaming:
+                for _ in reponse.streaming_content:
+                    pass
+            duree = time.perf_counter() - debut
+        if i < echauffement:
+            continue
+        durees.append(duree * 1000)
+        par_appel.append(requetes)
+        statuts[reponse.status_code] = statuts.get(reponse.status_code, 0) + 1
+
+    p = np.percentile(durees, PERCENTILES)
+    return {
+        'route': route.nom,
+        'methode': route.methode.upper(),
+        'url': route.url,
+        'appels': repetitions,
+        'statuts': {str(code): nombre for code, nombre in sorted(statuts.items())},
+        **{f'p{q}_ms': round(float(v), 2) for q, v in zip(PERCENTILES, p)},
+        'moyenne_ms': round(float(np.mean(durees)), 2),
+        'max_ms': round(float(np.max(durees)), 2),
+        'requetes_moyenne': round(float(np.mean(par_appel)), 2),
+        'requetes_max': int(np.max(par_appel)),
+        'rss_max_mo': round(rss_mo(), 1),
+        'rss_hausse_mo': round(rss_mo() - rss_avant, 1),
+    }
+
+
+def comparer(ancien, nouveau):
+    precedents = {r['route']: r for r in ancien['resultats']}
+    print(f"\n{'route':<36} {'p95 avant':>10} {'p95 après':>10} {'écart':>8} {'req. avant':>11} {'req. après':>11}")
+    for r in nouveau['resultats']:
+        a = precedents.get(r['route'])
+        if a is None:
+            continue
+        ecart = (r['p95_ms'] / a['p95_ms'] - 1) if a['p95_ms'] else 0.0
+        print(f"{r['route']:<36} {a['p95_ms']:>10.1f} {r['p95_ms']:>10.1f} {ecart:>+8.0%} "
+              f"{a['requetes_moyenne']:>11.1f} {r['requetes_moyenne']:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--echelle', type=float, default=0.01, help="1 = 1M expéditions")
+    parser.add_argument('--graine', type=int, default=0)
+    parser.add_argument('--repetitions', type=int, default=30)
+    parser.add_argument('--echauffement', type=int, default=2, help="appels non mesurés par route")
+    parser.add_argument('--routes', default='', help="expression régulière sur le nom des routes")
+    parser.add_argument('--sortie', default=f"charge-{datetime.now():%Y%m%d-%H%M%S}.json")
+    parser.add_argument('--comparer', help="résultats JSON d'une exécution précédente")
+    args = parser.parse_args()
+
+    setup_test_environment()
+    limitation.BUDGETS.clear()
+    ancien_nom = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        for alias in caches:
+            caches[alias].clear()
+        debut = time.perf_counter()
+        volumes = generateur.generer(args.echelle, args.graine, sortie=io.StringIO())
+        generation = time.perf_counter() - debut
+        print(f"données générées en {generation:.1f} s : "
+              + ", ".join(f"{table} {nombre}" for table, nombre in volumes.items()))
+
+        api = APIClient()
+        api.force_authenticate(User.objects.create_superuser('charge', 'charge@example.com', 'charge'))
+        rng = np.random.default_rng(args.graine)
+        selection = [r for r in routes(args.repetitions, rng) if re.search(args.routes, r.nom)]
+
+        resultats = []
+        print(f"{'route':<36} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'requêtes':>9} {'RSS Mo':>7} statuts")
+        for route in selection:
+            mesure = mesurer(api, route, args.repetitions, args.echauffement)
+            resultats.append(mesure)
+            print(f"{mesure['route']:<36} {mesure['p50_ms']:>8.1f} {mesure['p95_ms']:>8.1f} {mesure['p99_ms']:>8.1f} "
+                  f"{mesure['requetes_moyenne']:>9.1f} {mesure['rss_max_mo']:>7.0f} {mesure['statuts']}")
+    finally:
+        connection.creation.destroy_test_db(ancien_nom, verbosity=0)
+
+    rapport = {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'echelle': args.echelle,
+        'graine': args.graine,
+        'repetitions': args.repetitions,
+        'base': connection.vendor,
+        'django': django.get_version(),
+        'python': platform.python_version(),
+        'generation_s': round(generation, 1),
+        'volumes': volumes,
+        'resultats': resultats,
+    }
+    with open(args.sortie, 'w') as fichier:
+        json.dump(rapport, fichier, indent=2, ensure_ascii=False)
+    print(f"\nrésultats écrits dans {args.sortie}")
+    if args.comparer:
+        with open(args.comparer) as fichier:
+            comparer(json.load(fichier), rapport)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,347 @@
+"""
+Jeu de données synthétique, déterministe et proportionnel à une échelle.
+
+À l'échelle 1 : 1M expéditions, ~5M événements de suivi, ~100k factures,
+20k tournées, 10k clients... (VOLUMES). Les expéditions sont produites par
+tranches de TAILLE_TRANCHE, chacune insérée en bulk_create dans sa propre
+transaction avec son suivi, ses factures, ses tournées, ses incidents et ses
+réclamations : la mémoire ne dépend pas de l'échelle. Même graine, même
+échelle : mêmes données (dates relatives au jour de la génération).
+
+Les champs dénormalisés sont tenus comme en production : dernier événement
+recopié sur l'expédition, grand livre (EcritureClient puis Client.solde) et
+statistiques reconstruits à la fin.
+
+    python -m benchmarks.generateur --echelle 0.01
+
+Remplit la base configurée, qui doit être vide ; benchmarks/charge.py
+l'utilise dans une base de test.
+"""
+import argparse
+import contextlib
+import os
+import sys
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'transport_delivery.settings')
+django.setup()
+
+import numpy as np  # noqa: E402
+from django.db import transaction  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from core import comptabilite, numerotation, statistiques  # noqa: E402
+from core.models import (  # noqa: E402
+    Client, Chauffeur, Vehicule, Destination, TypeService, Expedition,
+    Tournee, TourneeExpedition, TrackingHistorique, Facture, FactureExpedition,
+    Paiement, Incident, Reclamation, EcritureClient,
+)
+from core.tarification import calculer_montant  # noqa: E402
+
+# Nombre de lignes à l'échelle 1 (les autres tables en découlent)
+VOLUMES = {
+    'expeditions': 1_000_000,
+    'clients': 10_000,
+    'destinations': 500,
+    'chauffeurs': 500,
+    'vehicules': 500,
+}
+EXPEDITIONS_PAR_FACTURE = 10
+EXPEDITIONS_PAR_TOURNEE = 50
+EXPEDITIONS_PAR_INCIDENT = 100
+EXPEDITIONS_PAR_RECLAMATION = 200
+TAILLE_TRANCHE = 10_000
+JOURS = 365
+TAUX_TVA = Decimal('19.00')
+CENTIME = Decimal('0.01')
+
+# Parcours d'une expédition ; le statut final fixe l'étape atteinte
+PARCOURS = ['EN_TRANSIT', 'CENTRE_TRI', 'LIVRAISON', 'LIVRE']
+STATUTS = ['EN_TRANSIT', 'CENTRE_TRI', 'LIVRAISON', 'LIVRE', 'ECHEC']
+PROBA_STATUTS = [0.08, 0.07, 0.05, 0.75, 0.05]
+STATUTS_FACTURE = ['EMISE', 'PAYEE', 'ANNULEE', 'BROUILLON']
+PROBA_FACTURE = [0.35, 0.55, 0.05, 0.05]
+VILLES = ['Alger', 'Oran', 'Constantine', 'Annaba', 'Blida', 'Sétif', 'Batna', 'Tlemcen', 'Béjaïa', 'Biskra']
+
+
+def volumes(echelle):
+    """Nombre de lignes par table pour cette échelle"""
+    base = {nom: max(int(n * echelle), 1) for nom, n in VOLUMES.items()}
+    base['clients'] = max(base['clients'], 2)
+    base['destinations'] = max(base['destinations'], 5)
+    base['chauffeurs'] = base['vehicules'] = max(base['vehicules'], 2)
+    return base
+
+
+@contextlib.contextmanager
+def dates_imposees(*champs):
+    """Désactive auto_now_add le temps d'insérer des dates historiques"""
+    for champ in champs:
+        champ.auto_now_add = False
+    try:
+        yield
+    finally:
+        for champ in champs:
+            champ.auto_now_add = True
+
+
+def champ(model, nom):
+    return model._meta.get_field(nom)
+
+
+def generer(echelle=0.01, graine=0, sortie=sys.stdout):
+    """Remplit la base ; retourne le nombre de lignes créées par table"""
+    rng = np.random.default_rng(graine)
+    n = volumes(echelle)
+    maintenant = timezone.now()
+    debut = maintenant - timedelta(days=JOURS)
+    comptes = dict.fromkeys(
+        ['expeditions', 'tracking', 'factures', 'paiements', 'tournees', 'incidents', 'reclamations'], 0
+    )
+
+    with transaction.atomic():
+        clients = Client.objects.bulk_create([
+            Client(nom=f"Client {i:05d}", adresse=f"{i} rue du Commerce, {VILLES[i % len(VILLES)]}",
+                   telephone=f"0{550000000 + i}")
+            for i in range(n['clients'])
+        ], batch_size=1000)
+        latitudes = 36.0 + rng.uniform(-3, 3, n['destinations'])
+        longitudes = 3.0 + rng.uniform(-3, 3, n['destinations'])
+        destinations = Destination.objects.bulk_create([
+            Destination(ville=f"{VILLES[i % len(VILLES)]} {i // len(VILLES)}", pays="Algérie",
+                        tarif_base=Decimal(int(rng.integers(300, 1500))),
+                        latitude=float(latitudes[i]), longitude=float(longitudes[i]))
+            for i in range(n['destinations'])
+        ], batch_size=1000)
+        services = TypeService.objects.bulk_create([
+            TypeService(nom="Standard", tarif_poids=Decimal('20.00'), tarif_volume=Decimal('150.00')),
+            TypeService(nom="Express", tarif_poids=Decimal('35.00'), tarif_volume=Decimal('250.00')),
+            TypeService(nom="Frigorifique", tarif_poids=Decimal('45.00'), tarif_volume=Decimal('400.00')),
+        ])
+        chauffeurs = Chauffeur.objects.bulk_create([
+            Chauffeur(nom=f"Chauffeur {i:04d}", permis=f"C{i:07d}", disponible=bool(rng.random() < 0.8))
+            for i in range(n['chauffeurs'])
+        ], batch_size=1000)
+        capacites = rng.choice([800.0, 1500.0, 3500.0, 12000.0], n['vehicules'])
+        vehicules = Vehicule.objects.bulk_create([
+            Vehicule(matricule=f"{i:05d}-{graine % 1000:03d}-16", type_vehicule="Camion" if c > 3500 else "Fourgon",
+                     capacite=float(c), capacite_volume=float(c) / 200)
+            for i, c in enumerate(capacites)
+        ], batch_size=1000)
+
+    references = {
+        'clients': [c.id for c in clients],
+        'destinations': [(d.id, d.tarif_base, d.ville) for d in destinations],
+        'services': [(s.id, s.tarif_poids, s.tarif_volume) for s in services],
+        'chauffeurs': [c.id for c in chauffeurs],
+        'vehicules': [v.id for v in vehicules],
+    }
+    fait = 0
+    while fait < n['expeditions']:
+        taille = min(TAILLE_TRANCHE, n['expeditions'] - fait)
+        with dates_imposees(
+            champ(Expedition, 'date_creation'),
+            champ(Facture, 'date_emission'), champ(Paiement, 'date_paiement'),
+            champ(Tournee, 'date_creation'), champ(Incident, 'date_incident'),
+            champ(Reclamation, 'date_reclamation'), champ(EcritureClient, 'date_ecriture'),
+        ), transaction.atomic():
+            _tranche(rng, taille, references, debut, maintenant, comptes)
+        fait += taille
+        print(f"{fait}/{n['expeditions']} expéditions", file=sortie)
+
+    comptabilite.reconstruire()
+    statistiques.reconstruire()
+    comptes.update(clients=len(clients), destinations=len(destinations), services=len(services),
+                   chauffeurs=len(chauffeurs), vehicules=len(vehicules))
+    return comptes
+
+
+def _tranche(rng, taille, references, debut, maintenant, comptes):
+    clients, destinations, services = references['clients'], references['destinations'], references['services']
+
+    # Une facture potentielle par groupe d'expéditions consécutives : même client
+    groupes = np.arange(taille) // EXPEDITIONS_PAR_FACTURE
+    client_groupe = rng.integers(0, len(clients), groupes[-1] + 1)
+    secondes = np.sort(rng.uniform(0, (maintenant - debut).total_seconds(), taille))
+    statuts = rng.choice(len(STATUTS), taille, p=PROBA_STATUTS)
+    destination_idx = rng.integers(0, len(destinations), taille)
+    service_idx = rng.choice(len(services), taille, p=[0.7, 0.2, 0.1])
+    poids = np.round(rng.lognormal(1.5, 0.9, taille), 2)
+    volumes_colis = np.round(rng.lognormal(-2.5, 0.7, taille), 3)
+    # Événements par étape du parcours : 1 à 2 scans
+    scans = rng.integers(1, 3, (taille, len(PARCOURS)))
+    ecarts = rng.uniform(1, 18, (taille, 2 * len(PARCOURS)))
+
+    expeditions, evenements = [], []
+    for i, numero in enumerate(numerotation.allouer('E', taille)):
+        destination_id, tarif_base, ville = destinations[destination_idx[i]]
+        service_id, tarif_poids, tarif_volume = services[service_idx[i]]
+        statut = STATUTS[statuts[i]]
+        cree = debut + timedelta(seconds=float(secondes[i]))
+        etapes = PARCOURS[:PARCOURS.index(statut) + 1] if statut != 'ECHEC' else PARCOURS[:3] + ['ECHEC']
+        quand, suivi = cree, []
+        for e, etape in enumerate(etapes):
+            for s in range(scans[i, e]):
+                quand += timedelta(hours=float(ecarts[i, 2 * e + s]))
+                if quand >= maintenant:
+                    break
+                lieu = ville if etape in ('LIVRAISON', 'LIVRE', 'ECHEC') else f"Centre {VILLES[(i + e) % len(VILLES)]}"
+                suivi.append((quand, lieu, etape))
+        dernier = suivi[-1] if suivi else (None, '', '')
+        expeditions.append(Expedition(
+            numero_suivi=numero, client_id=clients[client_groupe[groupes[i]]],
+            destination_id=destination_id, service_id=service_id,
+            poids=float(poids[i]), volume=float(volumes_colis[i]), description=f"Colis {numero}",
+            montant_total=calculer_montant(
+                tarif_base, tarif_poids, tarif_volume, poids[i], volumes_colis[i]
+            ).quantize(CENTIME),
+            statut=statut, date_creation=cree,
+            date_dernier_evenement=dernier[0], dernier_lieu=dernier[1], dernier_statut_suivi=dernier[2],
+        ))
+        evenements.append(suivi)
+    Expedition.objects.bulk_create(expeditions, batch_size=1000)
+
+    lignes_suivi = [
+        TrackingHistorique(expedition_id=expedition.id, date_heure=quand, lieu=lieu, statut=etape)
+        for expedition, suivi in zip(expeditions, evenements) for quand, lieu, etape in suivi
+    ]
+    TrackingHistorique.objects.bulk_create(lignes_suivi, batch_size=2000)
+
+    _factures(rng, expeditions, groupes, maintenant, comptes)
+    _tournees(rng, expeditions, references, maintenant, comptes)
+    _incidents(rng, expeditions, comptes)
+    comptes['expeditions'] += len(expeditions)
+    comptes['tracking'] += len(lignes_suivi)
+
+
+def _factures(rng, expeditions, groupes, maintenant, comptes):
+    par_groupe = {}
+    for expedition, groupe in zip(expeditions, groupes):
+        if expedition.statut == 'LIVRE':
+            par_groupe.setdefault(int(groupe), []).append(expedition)
+    if not par_groupe:
+        return
+    statuts = rng.choice(len(STATUTS_FACTURE), len(par_groupe), p=PROBA_FACTURE)
+    factures = []
+    for (groupe, livrees), s, numero in zip(
+        par_groupe.items(), statuts, numerotation.allouer('F', len(par_groupe))
+    ):
+        montant_ht = sum((e.montant_total for e in livrees), Decimal('0'))
+        montant_tva = (montant_ht * TAUX_TVA / Decimal('100')).quantize(CENTIME)
+        emission = min(max(e.date_creation for e in livrees) + timedelta(days=2), maintenant).date()
+        factures.append(Facture(
+            numero_facture=numero, client_id=livrees[0].client_id, statut=STATUTS_FACTURE[s],
+            date_emission=emission, date_echeance=emission + timedelta(days=30), taux_tva=TAUX_TVA,
+            montant_ht=montant_ht, montant_tva=montant_tva, montant_ttc=montant_ht + montant_tva,
+        ))
+    Facture.objects.bulk_create(factures, batch_size=1000)
+    FactureExpedition.objects.bulk_create([
+        FactureExpedition(facture_id=facture.id, expedition_id=expedition.id)
+        for facture, livrees in zip(factures, par_groupe.values()) for expedition in livrees
+    ], batch_size=2000)
+
+    # Payées : paiement complet ; émises : un acompte une fois sur trois
+    paiements = []
+    modes = rng.choice(['VIREMENT', 'CHEQUE', 'CARTE', 'ESPECES'], len(factures))
+    for facture, mode, tirage in zip(factures, modes, rng.random(len(factures))):
+        if facture.statut == 'PAYEE':
+            montant = facture.montant_ttc
+        elif facture.statut == 'EMISE' and tirage < 1 / 3:
+            montant = (facture.montant_ttc / 2).quantize(CENTIME)
+        else:
+            continue
+        paiements.append(Paiement(
+            facture_id=facture.id, montant=montant, mode_paiement=str(mode), reference=f"REF-{facture.id}",
+            date_paiement=min(facture.date_emission + timedelta(days=int(tirage * 40)), maintenant.date()),
+        ))
+    Paiement.objects.bulk_create(paiements, batch_size=1000)
+
+    # Grand livre écrit directement, soldes recalculés en fin de génération
+    clients = {facture.id: facture.client_id for facture in factures}
+    ecritures = []
+    for facture in factures:
+        ecritures += comptabilite.ecritures_facture(None, facture)
+    for paiement in paiements:
+        ecritures += comptabilite.ecritures_paiement(None, paiement, clients[paiement.facture_id])
+    for ecriture in ecritures:
+        ecriture.date_ecriture = maintenant
+    EcritureClient.objects.bulk_create(ecritures, batch_size=2000)
+    comptes['factures'] += len(factures)
+    comptes['paiements'] += len(paiements)
+
+
+def _tournees(rng, expeditions, references, maintenant, comptes):
+    nombre = max(len(expeditions) // EXPEDITIONS_PAR_TOURNEE, 1)
+    chauffeurs = rng.choice(references['chauffeurs'], nombre)
+    vehicules = rng.choice(references['vehicules'], nombre)
+    tournees = []
+    for t, numero in enumerate(numerotation.allouer('T', nombre)):
+        date_tournee = expeditions[t * EXPEDITIONS_PAR_TOURNEE].date_creation + timedelta(days=1)
+        if date_tournee.date() < maintenant.date():
+            statut = 'TERMINEE'
+        else:
+            statut = 'EN_COURS' if date_tournee <= maintenant else 'PLANIFIEE'
+        tournees.append(Tournee(
+            numero_tournee=numero, date=date_tournee.date(), statut=statut,
+            chauffeur_id=int(chauffeurs[t]), vehicule_id=int(vehicules[t]),
+            date_creation=min(date_tournee, maintenant),
+        ))
+    Tournee.objects.bulk_create(tournees, batch_size=1000)
+    liens = [
+        TourneeExpedition(tournee_id=tournees[i // EXPEDITIONS_PAR_TOURNEE].id, expedition_id=expedition.id,
+                          ordre=i % EXPEDITIONS_PAR_TOURNEE)
+        for i, expedition in enumerate(expeditions[:nombre * EXPEDITIONS_PAR_TOURNEE])
+        if expedition.statut in ('LIVRAISON', 'LIVRE', 'ECHEC')
+    ]
+    TourneeExpedition.objects.bulk_create(liens, batch_size=2000)
+    comptes['tournees'] += len(tournees)
+
+
+def _incidents(rng, expeditions, comptes):
+    touchees = rng.choice(len(expeditions), max(len(expeditions) // EXPEDITIONS_PAR_INCIDENT, 1), replace=False)
+    types = [code for code, _ in Incident.TYPE_INCIDENT]
+    statuts = [code for code, _ in Incident.STATUT_INCIDENT]
+    Incident.objects.bulk_create([
+        Incident(expedition_id=expeditions[i].id, type_incident=types[i % len(types)],
+                 statut=statuts[(i // len(types)) % len(statuts)], description="Incident généré",
+                 date_incident=expeditions[i].date_dernier_evenement or expeditions[i].date_creation)
+        for i in touchees.tolist()
+    ], batch_size=1000)
+
+    reclamees = touchees[:max(len(expeditions) // EXPEDITIONS_PAR_RECLAMATION, 1)].tolist()
+    types = [code for code, _ in Reclamation.TYPE_RECLAMATION]
+    statuts = [code for code, _ in Reclamation.STATUT_RECLAMATION]
+    Reclamation.objects.bulk_create([
+        Reclamation(numero_reclamation=numero, client_id=expeditions[i].client_id, expedition_id=expeditions[i].id,
+                    type_reclamation=types[i % len(types)], statut=statuts[(i // len(types)) % len(statuts)],
+                    description="Réclamation générée",
+                    date_reclamation=(expeditions[i].date_dernier_evenement or expeditions[i].date_creation)
+                    + timedelta(days=1))
+        for i, numero in zip(reclamees, numerotation.allouer('R', len(reclamees)))
+    ], batch_size=1000)
+    comptes['incidents'] += len(touchees)
+    comptes['reclamations'] += len(reclamees)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--echelle', type=float, default=0.01, help="1 = 1M expéditions")
+    parser.add_argument('--graine', type=int, default=0)
+    args = parser.parse_args()
+
+    if Expedition.objects.exists() or Client.objects.exists():
+        parser.error("la base contient déjà des données")
+    debut = time.perf_counter()
+    comptes = generer(args.echelle, args.graine)
+    duree = time.perf_counter() - debut
+    for table, nombre in comptes.items():
+        print(f"{table:<14} {nombre:>10}")
+    print(f"généré en {duree:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
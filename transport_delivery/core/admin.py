@@ -2,7 +2,8 @@ from django.contrib import admin
 from .models import (
     Client, Chauffeur, Vehicule, Destination, TypeService, Expedition,
     Tournee, TourneeExpedition, TrackingHistorique, Facture, FactureExpedition,
-    Paiement, Incident, Reclamation
+    Paiement, Incident, Reclamation, StatistiqueExpedition, CompteurStatut,
+    DistanceDestination, ExecutionFacturation, EcritureClient
 )
 
 admin.site.register(Client)
@@ -18,6 +19,11 @@ admin.site.register(FactureExpedition)
 admin.site.register(Paiement)
 admin.site.register(Incident)
 admin.site.register(Reclamation)
+admin.site.register(StatistiqueExpedition)
+admin.site.register(CompteurStatut)
+admin.site.register(DistanceDestination)
+admin.site.register(ExecutionFacturation)
+admin.site.register(EcritureClient)
 
 @admin.register(Expedition)
 class ExpeditionAdmin(admin.ModelAdmin):
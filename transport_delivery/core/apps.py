@@ -3,3 +3,14 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+
+        import os
+
+        from . import jetons, metriques, recherche, signals  # noqa: F401
+        jetons.verifier_cache(int(os.environ.get('WEB_CONCURRENCY') or 1))
+        connection_created.connect(metriques.installer, dispatch_uid='core.metriques.installer')
+        post_migrate.connect(recherche.reinstaller, sender=self, dispatch_uid='core.recherche.reinstaller')
@@ -0,0 +1,179 @@
+"""
+Grand livre client.
+
+Tout mouvement qui change ce que doit un client produit une EcritureClient :
+débit à l'émission d'une facture, crédit pour un paiement ou une annulation.
+Client.solde (montant dû) est la somme courante du grand livre, mise à jour
+par UPDATE ... SET solde = solde + x : aucun agrégat à la lecture.
+
+Une facture compte au débit tant qu'elle est EMISE ou PAYEE. Elle passe
+d'elle-même à PAYEE quand ses paiements couvrent montant_ttc, et revient à
+EMISE si un paiement est retiré.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import (
+    Case, Count, DecimalField, Exists, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, When,
+)
+from django.db.models.functions import Coalesce
+
+from .models import Client, EcritureClient, Facture, Paiement
+
+STATUTS_DUS = ('EMISE', 'PAYEE')
+ZERO = Decimal('0')
+MONTANT = DecimalField(max_digits=14, decimal_places=2)
+
+
+def montant_du(facture):
+    """Montant porté au débit du client pour cette facture (0 si brouillon ou annulée)"""
+    if facture is None or facture.statut not in STATUTS_DUS:
+        return ZERO
+    return facture.montant_ttc or ZERO
+
+
+def ecrire(ecritures):
+    """Enregistre des écritures (non sauvegardées) et répercute la variation sur chaque solde"""
+    ecritures = [ecriture for ecriture in ecritures if ecriture.debit or ecriture.credit]
+    if not ecritures:
+        return
+    EcritureClient.objects.bulk_create(ecritures, batch_size=1000)
+    variations = defaultdict(Decimal)
+    for ecriture in ecritures:
+        variations[ecriture.client_id] += ecriture.debit - ecriture.credit
+    for client_id, variation in variations.items():
+        if variation:
+            Client.objects.filter(pk=client_id).update(solde=F('solde') + variation)
+
+
+def _ecritures(mouvements, nouveau, retrait, **valeurs):
+    """
+    Écritures pour des variations de débit par client ({client_id: (avant, apres)}).
+    `nouveau` / `retrait` : type d'écriture quand le montant apparaît / disparaît.
+    """
+    ecritures = []
+    for client_id, (avant, apres) in mouvements.items():
+        variation = apres - avant
+        if not variation:
+            continue
+        if not avant:
+            type_ecriture = nouveau
+        elif not apres:
+            type_ecriture = retrait
+        else:
+            type_ecriture = 'AJUSTEMENT'
+        ecritures.append(EcritureClient(
+            client_id=client_id, type_ecriture=type_ecriture,
+            debit=max(variation, ZERO), credit=max(-variation, ZERO), **valeurs,
+        ))
+    return ecritures
+
+
+def ecritures_facture(avant, apres):
+    """Écritures induites par le passage d'une facture de `avant` à `apres` (None = inexistante)"""
+    mouvements = defaultdict(lambda: [ZERO, ZERO])
+    for position, facture in enumerate((avant, apres)):
+        if facture is not None:
+            mouvements[facture.client_id][position] += montant_du(facture)
+    facture = apres or avant
+    return _ecritures(
+        mouvements, 'FACTURE', 'ANNULATION',
+        facture_id=apres.pk if apres is not None else None,
+        libelle=f"Facture {facture.numero_facture}",
+    )
+
+
+def ecritures_paiement(avant, apres, client_id, lier_facture=True):
+    """
+    Idem pour un paiement de la facture du client `client_id` (crédit).
+    `lier_facture=False` quand la facture est en cours de suppression.
+    """
+    mouvements = {client_id: (
+        -(avant.montant if avant is not None else ZERO),
+        -(apres.montant if apres is not None else ZERO),
+    )}
+    paiement = apres or avant
+    return _ecritures(
+        mouvements, 'PAIEMENT', 'ANNULATION',
+        facture_id=paiement.facture_id if lier_facture else None,
+        paiement_id=apres.pk if apres is not None else None,
+        libelle=f"Paiement {paiement.mode_paiement} {paiement.reference}".strip(),
+    )
+
+
+def actualiser_statut(facture_id):
+    """PAYEE si les paiements couvrent montant_ttc, EMISE sinon (factures émises uniquement)"""
+    facture = (
+        Facture.objects.filter(pk=facture_id, statut__in=STATUTS_DUS)
+        .annotate(paye=Coalesce(Sum('paiements__montant'), ZERO))
+        .first()
+    )
+    if facture is None:
+        return
+    statut = 'PAYEE' if facture.paye >= facture.montant_ttc else 'EMISE'
+    if statut != facture.statut:
+        facture.statut = statut
+        facture.save(update_fields=['statut'])
+
+
+def reconstruire():
+    """Recalcule Client.solde depuis le grand livre (après une correction manuelle)"""
+    soldes = dict(
+        EcritureClient.objects.values('client').annotate(solde=Sum('debit') - Sum('credit'))
+        .values_list('client', 'solde')
+    )
+    clients = list(Client.objects.only('id', 'solde'))
+    for client in clients:
+        client.solde = soldes.get(client.id, ZERO)
+    Client.objects.bulk_update(clients, ['solde'], batch_size=1000)
+    return len(clients)
+
+
+# Balance âgée : tranches de retard par rapport à date_echeance
+TRANCHES_RETARD = (('jours_0_30', 0, 30), ('jours_31_60', 31, 60), ('jours_61_90', 61, 90))
+
+
+def clients_debiteurs():
+    """Clients ayant au moins une facture émise non soldée (index client, statut)"""
+    return Client.objects.filter(Exists(Facture.objects.filter(client=OuterRef('pk'), statut='EMISE')))
+
+
+def balance_agee(jour):
+    """
+    Créances par client au `jour` donné, en une requête : factures EMISE
+    regroupées par client, reste dû (montant_ttc - paiements, sous-requête)
+    ventilé en tranches avec Case/When. À restreindre aux clients d'une page
+    (client__in) : le GROUP BY ne porte alors que sur leurs factures.
+    """
+    paye = Subquery(
+        Paiement.objects.filter(facture=OuterRef('pk')).values('facture')
+        .annotate(total=Sum('montant')).values('total'),
+        output_field=MONTANT,
+    )
+    factures = Facture.objects.filter(statut='EMISE').annotate(
+        paye=Coalesce(paye, ZERO, output_field=MONTANT),
+    ).annotate(
+        reste=ExpressionWrapper(F('montant_ttc') - F('paye'), output_field=MONTANT),
+    )
+
+    def tranche(condition):
+        return Coalesce(Sum(Case(When(condition, then=F('reste')), default=ZERO, output_field=MONTANT)),
+                        ZERO, output_field=MONTANT)
+
+    tranches = {
+        nom: tranche(Q(date_echeance__lte=jour - timedelta(days=debut),
+                       date_echeance__gte=jour - timedelta(days=fin)))
+        for nom, debut, fin in TRANCHES_RETARD
+    }
+    return factures.values('client').annotate(
+        client_nom=F('client__nom'),
+        solde=F('client__solde'),
+        nombre_factures=Count('id'),
+        montant_ttc=Sum('montant_ttc'),
+        paye=Sum('paye'),
+        reste_du=Sum('reste'),
+        non_echu=tranche(Q(date_echeance__gt=jour)),
+        **tranches,
+        jours_90_plus=tranche(Q(date_echeance__lt=jour - timedelta(days=90))),
+    )
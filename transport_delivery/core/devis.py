@@ -0,0 +1,71 @@
+"""
+Devis : prix d'expéditions non encore créées.
+
+Même formule que Expedition.save() et mêmes grilles en mémoire que l'import
+(tarification.grilles) : un devis donne exactement le montant_total qu'aura
+l'expédition créée avec les mêmes valeurs, tant que les tarifs ne changent
+pas entre les deux.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+
+from . import tarification
+from .ingestion import valider_tarif
+
+CENTIME = Decimal('0.01')
+LIGNES_MAX = getattr(settings, 'DEVIS_LIGNES_MAX', 10000)
+
+
+def coter(lignes):
+    """
+    Prix d'une liste de lignes {destination, service, poids, volume}.
+
+    Les lignes valides sont chiffrées en une passe sur les grilles en mémoire :
+    {'resultats': [{'ligne', ..., 'montant_total'}], 'erreurs': [{'ligne', 'erreurs'}]}
+    """
+    tarifs_base, tarifs_service = tarification.grilles()
+    if _references_inconnues(lignes, tarifs_base, tarifs_service):
+        # Destination ou service créé dans un autre processus depuis le dernier chargement
+        tarifs_base, tarifs_service = tarification.grilles(recharger=True)
+
+    resultat = {'resultats': [], 'erreurs': []}
+    valides = []
+    for numero, ligne in enumerate(lignes, start=1):
+        if not isinstance(ligne, dict):
+            resultat['erreurs'].append({'ligne': numero, 'erreurs': {'non_field_errors': ['Objet attendu.']}})
+            continue
+        valeurs, erreurs = valider_tarif(ligne, tarifs_base, tarifs_service)
+        if erreurs:
+            resultat['erreurs'].append({'ligne': numero, 'erreurs': erreurs})
+        else:
+            valides.append((numero, valeurs))
+
+    montants = tarification.calculer_montants(
+        [(v['destination_id'], v['service_id'], v['poids'], v['volume']) for _, v in valides],
+        tarifs_base, tarifs_service,
+    )
+    for (numero, valeurs), montant in zip(valides, montants):
+        resultat['resultats'].append({
+            'ligne': numero,
+            'destination': valeurs['destination_id'],
+            'service': valeurs['service_id'],
+            'poids': valeurs['poids'],
+            'volume': valeurs['volume'],
+            # Arrondi du DecimalField à l'enregistrement, en chaîne comme dans les serializers
+            'montant_total': str(montant.quantize(CENTIME)),
+        })
+    return resultat
+
+
+def _references_inconnues(lignes, tarifs_base, tarifs_service):
+    for ligne in lignes:
+        if not isinstance(ligne, dict):
+            continue
+        for champ, references in (('destination', tarifs_base), ('service', tarifs_service)):
+            try:
+                if int(ligne.get(champ)) not in references:
+                    return True
+            except (TypeError, ValueError):
+                pass
+    return False
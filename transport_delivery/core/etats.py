@@ -0,0 +1,206 @@
+"""
+Cycle de vie des statuts : expéditions, tournées, factures, incidents, réclamations.
+
+TRANSITIONS liste, pour chaque modèle, les statuts atteignables depuis chaque
+statut. Un changement de statut hors table est refusé par les serializers
+(PUT/PATCH) et par POST /<ressource>/transition/, qui change le statut de
+nombreuses lignes en un seul UPDATE ... WHERE statut IN (sources autorisées)
+puis applique les effets en masse : statistiques, historique de suivi, grand
+livre. Une tournée entraîne ses expéditions (CASCADE_TOURNEE).
+
+Le statut à la création reste libre (imports, reprises de données).
+"""
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from . import comptabilite, statistiques, suivi
+from .models import Expedition, Facture, Incident, Reclamation, Tournee, TrackingHistorique
+
+TRANSITIONS = {
+    Expedition: {
+        'EN_TRANSIT': ('CENTRE_TRI', 'LIVRAISON', 'LIVRE', 'ECHEC'),
+        'CENTRE_TRI': ('EN_TRANSIT', 'LIVRAISON', 'LIVRE', 'ECHEC'),
+        'LIVRAISON': ('CENTRE_TRI', 'LIVRE', 'ECHEC'),
+        # Retour au centre ou nouvelle tentative
+        'ECHEC': ('EN_TRANSIT', 'CENTRE_TRI', 'LIVRAISON'),
+        'LIVRE': (),
+    },
+    Tournee: {
+        'PLANIFIEE': ('EN_COURS', 'ANNULEE'),
+        'EN_COURS': ('TERMINEE', 'ANNULEE'),
+        'TERMINEE': (),
+        'ANNULEE': (),
+    },
+    # PAYEE / EMISE suivent les paiements (comptabilite.actualiser_statut)
+    Facture: {
+        'BROUILLON': ('EMISE', 'ANNULEE'),
+        'EMISE': ('ANNULEE',),
+        'PAYEE': (),
+        'ANNULEE': (),
+    },
+    Incident: {
+        'OUVERT': ('EN_COURS', 'RESOLU', 'CLOS'),
+        'EN_COURS': ('RESOLU', 'CLOS'),
+        'RESOLU': ('EN_COURS', 'CLOS'),
+        'CLOS': (),
+    },
+    Reclamation: {
+        'NOUVELLE': ('EN_COURS', 'RESOLUE', 'ANNULEE'),
+        'EN_COURS': ('RESOLUE', 'ANNULEE'),
+        'RESOLUE': ('EN_COURS',),
+        'ANNULEE': (),
+    },
+}
+
+# Tournée passée à la clé : (statut cible, statuts concernés) de ses expéditions
+CASCADE_TOURNEE = {
+    'EN_COURS': ('LIVRAISON', ('EN_TRANSIT', 'CENTRE_TRI', 'ECHEC')),
+    # Colis encore en livraison à la fin de la tournée : tentative échouée
+    'TERMINEE': ('ECHEC', ('LIVRAISON',)),
+    'ANNULEE': ('CENTRE_TRI', ('LIVRAISON',)),
+}
+
+LIEU_MAX = TrackingHistorique._meta.get_field('lieu').max_length
+
+# Colonnes lues avant la transition pour en calculer les effets
+CHAMPS = {
+    Expedition: ('id', 'statut', 'numero_suivi', 'montant_total', 'date_creation', 'dernier_lieu'),
+    Tournee: ('id', 'statut', 'numero_tournee'),
+    Facture: ('id', 'statut', 'client_id', 'montant_ttc', 'numero_facture'),
+    Incident: ('id', 'statut'),
+    Reclamation: ('id', 'statut'),
+}
+
+
+def autorise(model, avant, apres):
+    return apres in TRANSITIONS[model].get(avant, ())
+
+
+def sources(model, statut):
+    """Statuts depuis lesquels `statut` est atteignable"""
+    return [depuis for depuis, cibles in TRANSITIONS[model].items() if statut in cibles]
+
+
+def transitionner(model, ids, statut, lieu='', commentaire=''):
+    """
+    Passe les lignes `ids` au statut `statut` quand la table l'autorise.
+    {'statut', 'modifies': [id], 'refuses': [{'id', 'statut'}], 'inconnus': [id], 'expeditions': n}
+    ('expeditions' : expéditions entraînées par des tournées)
+    """
+    autorises = sources(model, statut)
+    with transaction.atomic():
+        lignes = list(
+            model.objects.select_for_update().filter(pk__in=ids).order_by('pk').values(*CHAMPS[model])
+        )
+        a_modifier = [ligne for ligne in lignes if ligne['statut'] in autorises]
+        resultat = {
+            'statut': statut,
+            'modifies': [ligne['id'] for ligne in a_modifier],
+            'refuses': [{'id': ligne['id'], 'statut': ligne['statut']}
+                        for ligne in lignes if ligne['statut'] not in autorises],
+            'inconnus': sorted(set(ids) - {ligne['id'] for ligne in lignes}),
+            'expeditions': 0,
+        }
+        if not a_modifier:
+            return resultat
+
+        if model is Expedition:
+            _transition_expeditions(a_modifier, statut, lieu, commentaire)
+        else:
+            model.objects.filter(pk__in=resultat['modifies'], statut__in=autorises).update(statut=statut)
+            if model is Tournee:
+                resultat['expeditions'] = cascade_tournees(a_modifier, statut)
+            elif model in statistiques.COMPTEURS:
+                _effets_compteurs(model, a_modifier, statut)
+    return resultat
+
+
+def _transition_expeditions(lignes, statut, lieu, commentaire):
+    """UPDATE unique (statut et dernier événement), puis historique et statistiques en masse"""
+    maintenant = timezone.now()
+    valeurs = {'statut': statut, 'dernier_statut_suivi': statut, 'date_dernier_evenement': maintenant}
+    if lieu:
+        valeurs['dernier_lieu'] = lieu
+    Expedition.objects.filter(
+        pk__in=[ligne['id'] for ligne in lignes], statut__in=sources(Expedition, statut),
+    ).update(**valeurs)
+
+    TrackingHistorique.objects.bulk_create([
+        TrackingHistorique(
+            expedition_id=ligne['id'], date_heure=maintenant, statut=statut,
+            lieu=lieu or ligne['dernier_lieu'], commentaire=ligne.get('commentaire', commentaire),
+        )
+        for ligne in lignes
+    ], batch_size=500)
+
+    deltas = None
+    for ligne in lignes:
+        deltas = statistiques.deltas_statut(ligne, statut, deltas)
+    statistiques.appliquer_deltas(deltas)
+    suivi.invalider(*(ligne['numero_suivi'] for ligne in lignes))
+
+
+def cascade_tournees(tournees, statut):
+    """
+    Expéditions des tournées `tournees` ({'id', 'numero_tournee'}) passées au
+    statut de CASCADE_TOURNEE, celles qui le peuvent. Retourne leur nombre.
+    """
+    if statut not in CASCADE_TOURNEE:
+        return 0
+    cible, concernes = CASCADE_TOURNEE[statut]
+    numeros = {tournee['id']: tournee['numero_tournee'] for tournee in tournees}
+    lignes = {}
+    for ligne in (
+        Expedition.objects.select_for_update()
+        .filter(tourneeexpedition__tournee__in=numeros, statut__in=concernes)
+        .order_by('pk')
+        .values(*CHAMPS[Expedition], 'tourneeexpedition__tournee')
+    ):
+        ligne['commentaire'] = f"Tournée {numeros[ligne.pop('tourneeexpedition__tournee')]}"
+        lignes.setdefault(ligne['id'], ligne)
+    if lignes:
+        _transition_expeditions(list(lignes.values()), cible, '', '')
+    return len(lignes)
+
+
+def _effets_compteurs(model, lignes, statut):
+    """Compteurs du dashboard et, pour les factures, écritures du grand livre"""
+    deltas, ecritures = None, []
+    for ligne in lignes:
+        avant, apres = model(**ligne), model(**dict(ligne, statut=statut))
+        deltas = statistiques.deltas_compteur(model, avant, apres, deltas)
+        if model is Facture:
+            ecritures += comptabilite.ecritures_facture(avant, apres)
+    statistiques.appliquer_deltas(deltas)
+    comptabilite.ecrire(ecritures)
+
+
+class TransitionMixin:
+    """POST /<ressource>/transition/ : {"ids": [...], "statut": "...", "lieu": "...", "commentaire": "..."}"""
+    transition_ids_max = 10000
+
+    @action(detail=False, methods=['post'])
+    def transition(self, request):
+        model = self.get_queryset().model
+        ids, statut = request.data.get('ids'), request.data.get('statut')
+        if statut not in TRANSITIONS[model]:
+            return Response({'statut': [f"« {statut} » n'est pas un choix valide."]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if (not isinstance(ids, list) or not ids or len(ids) > self.transition_ids_max
+                or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids)):
+            return Response({'ids': [f"Liste de 1 à {self.transition_ids_max} identifiants attendue."]},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        lieu = str(request.data.get('lieu') or '')
+        if len(lieu) > LIEU_MAX:
+            return Response({'lieu': [f'Assurez-vous que ce champ comporte au plus {LIEU_MAX} caractères.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        resultat = transitionner(model, ids, statut, lieu=lieu, commentaire=str(request.data.get('commentaire') or ''))
+        if resultat['modifies']:
+            return Response(resultat)
+        code = status.HTTP_409_CONFLICT if resultat['refuses'] else status.HTTP_404_NOT_FOUND
+        return Response(resultat, status=code)
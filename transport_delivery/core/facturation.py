@@ -0,0 +1,152 @@
+"""
+Facturation par lot des expéditions livrées.
+
+Pour une date d'arrêt `fin`, les expéditions LIVRE sans facture active
+créées jusqu'à ce jour sont regroupées par client : une facture EMISE par
+client, avec une ligne FactureExpedition par expédition. Il n'y a pas de
+date de début : un colis créé en fin de mois M et livré en M+1 est facturé
+par la passe de M+1. Une exécution est donc identifiée par `fin` seule.
+
+- Un lot = jusqu'à TAILLE_LOT clients, traités en une transaction : une
+  requête d'agrégat (GROUP BY client) puis des bulk_create. La mémoire dépend
+  de la taille du lot, pas du nombre d'expéditions.
+- Reprise : ExecutionFacturation garde le dernier client traité, enregistré
+  dans la même transaction que le lot. Une exécution interrompue repart de là.
+- Idempotence : seules les expéditions sans facture active sont retenues,
+  relancer une date déjà facturée ne crée rien de plus.
+- Verrou : une seule exécution à la fois (index unique partiel sur verrou).
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, Max, OuterRef, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import comptabilite, numerotation, statistiques
+from .models import Expedition, ExecutionFacturation, Facture, FactureExpedition
+
+TAILLE_LOT = getattr(settings, 'FACTURATION_TAILLE_LOT', 500)
+TAILLE_LIENS = 5000
+DELAI_PAIEMENT = timedelta(days=getattr(settings, 'FACTURATION_DELAI_PAIEMENT', 30))
+TAUX_TVA = Decimal('19.00')
+# Un verrou non rafraîchi depuis ce délai est considéré comme abandonné
+EXPIRATION_VERROU = timedelta(minutes=getattr(settings, 'FACTURATION_EXPIRATION_VERROU', 15))
+CENTIME = Decimal('0.01')
+
+
+class FacturationEnCours(Exception):
+    pass
+
+
+def expeditions_a_facturer(fin):
+    """Expéditions livrées, créées au plus tard le jour `fin` et absentes de toute facture non annulée"""
+    facturee = FactureExpedition.objects.filter(expedition=OuterRef('pk')).exclude(facture__statut='ANNULEE')
+    # Borne sur la colonne brute (index statut, date_creation), pas sur __date
+    limite = timezone.make_aware(datetime.combine(fin + timedelta(days=1), time.min))
+    return Expedition.objects.filter(statut='LIVRE', date_creation__lt=limite).filter(~Exists(facturee))
+
+
+def facturer(fin, taille_lot=TAILLE_LOT):
+    """Lance (ou reprend) la facturation arrêtée au jour `fin` ; retourne l'ExecutionFacturation"""
+    execution = _acquerir(fin)
+    try:
+        while True:
+            with transaction.atomic():
+                lot = _facturer_lot(fin, execution.dernier_client, taille_lot)
+                if lot is None:
+                    break
+                execution.dernier_client, factures, expeditions, montant = lot
+                execution.factures_creees += factures
+                execution.expeditions_facturees += expeditions
+                execution.montant_ttc += montant
+                execution.save(update_fields=[
+                    'dernier_client', 'factures_creees', 'expeditions_facturees', 'montant_ttc', 'date_maj',
+                ])
+    except Exception as exc:
+        ExecutionFacturation.objects.filter(pk=execution.pk).update(
+            statut='ECHEC', verrou=False, erreur=str(exc), date_maj=timezone.now(),
+        )
+        raise
+
+    execution.statut = 'TERMINEE'
+    execution.verrou = False
+    execution.save(update_fields=['statut', 'verrou', 'date_maj'])
+    return execution
+
+
+def _acquerir(fin):
+    maintenant = timezone.now()
+    ExecutionFacturation.objects.filter(verrou=True, date_maj__lt=maintenant - EXPIRATION_VERROU).update(
+        verrou=False, statut='ECHEC', erreur='Verrou expiré', date_maj=maintenant,
+    )
+    execution, _ = ExecutionFacturation.objects.get_or_create(fin=fin)
+    if execution.statut == 'TERMINEE':
+        # Nouvelle passe sur une date close : seules les nouvelles livraisons seront prises
+        execution.dernier_client = 0
+    try:
+        with transaction.atomic():
+            pris = ExecutionFacturation.objects.filter(pk=execution.pk, verrou=False).update(
+                verrou=True, statut='EN_COURS', erreur='', dernier_client=execution.dernier_client,
+                date_maj=maintenant,
+            )
+    except IntegrityError:
+        pris = 0
+    if not pris:
+        raise FacturationEnCours('Une facturation est déjà en cours')
+    execution.refresh_from_db()
+    return execution
+
+
+def _facturer_lot(fin, apres_client, taille_lot):
+    """Facture les `taille_lot` clients suivants ; None s'il n'en reste plus"""
+    a_facturer = expeditions_a_facturer(fin)
+    totaux = list(
+        a_facturer.filter(client_id__gt=apres_client)
+        .values('client_id')
+        .annotate(montant=Coalesce(Sum('montant_total'), Decimal('0')), nombre=Count('id'), dernier=Max('id'))
+        .order_by('client_id')[:taille_lot]
+    )
+    if not totaux:
+        return None
+
+    emission = timezone.localdate()
+    factures = []
+    for ligne, numero in zip(totaux, numerotation.allouer('F', len(totaux))):
+        montant_ht = Decimal(ligne['montant']).quantize(CENTIME)
+        montant_tva = (montant_ht * TAUX_TVA / Decimal('100')).quantize(CENTIME)
+        factures.append(Facture(
+            numero_facture=numero, client_id=ligne['client_id'], statut='EMISE',
+            date_echeance=emission + DELAI_PAIEMENT, taux_tva=TAUX_TVA,
+            montant_ht=montant_ht, montant_tva=montant_tva, montant_ttc=montant_ht + montant_tva,
+        ))
+    Facture.objects.bulk_create(factures)
+
+    # Lignes recopiées par tranches d'id : mêmes critères que l'agrégat, bornés
+    # à son dernier id pour ne pas rattacher une expédition non comptée.
+    par_client = {facture.client_id: facture.id for facture in factures}
+    liees, depuis = 0, 0
+    lignes = a_facturer.filter(client_id__in=par_client, id__lte=max(l['dernier'] for l in totaux))
+    while tranche := list(lignes.filter(id__gt=depuis).order_by('id').values_list('id', 'client_id')[:TAILLE_LIENS]):
+        FactureExpedition.objects.bulk_create([
+            FactureExpedition(facture_id=par_client[client_id], expedition_id=pk) for pk, client_id in tranche
+        ], batch_size=1000)
+        liees += len(tranche)
+        depuis = tranche[-1][0]
+    attendues = sum(ligne['nombre'] for ligne in totaux)
+    if liees != attendues:
+        # Une expédition a changé entre l'agrégat et la copie : le lot est annulé
+        raise IntegrityError(f'Lot incohérent : {liees} lignes pour {attendues} expéditions')
+
+    # bulk_create n'envoie pas de signaux : statistiques et grand livre ici
+    deltas, ecritures = None, []
+    for facture in factures:
+        deltas = statistiques.deltas_compteur(Facture, None, facture, deltas)
+        ecritures += comptabilite.ecritures_facture(None, facture)
+    statistiques.appliquer_deltas(deltas)
+    comptabilite.ecrire(ecritures)
+
+    montant = sum((facture.montant_ttc for facture in factures), Decimal('0'))
+    return totaux[-1]['client_id'], len(factures), attendues, montant
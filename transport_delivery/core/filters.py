@@ -0,0 +1,141 @@
+from django_filters import rest_framework as filters
+from django_filters.constants import EMPTY_VALUES
+
+from . import recherche
+from .models import (
+    Client, Destination, Expedition, Tournee, TrackingHistorique, Facture, Paiement, Incident, Reclamation
+)
+
+
+# Les clés étrangères sont filtrées sur l'id brut (NumberFilter) : un
+# ModelChoiceFilter ferait une requête de validation par valeur reçue.
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    """?client__in=1,2,3"""
+
+
+class CharInFilter(filters.BaseInFilter, filters.CharFilter):
+    """?statut__in=LIVRE,ECHEC"""
+
+
+class RechercheFilter(filters.CharFilter):
+    """?q=dup alg : tous les mots, en préfixes, dans l'index plein texte (core/recherche.py)"""
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        return recherche.filtrer(qs, value)
+
+
+class ClientFilter(filters.FilterSet):
+    q = RechercheFilter()
+
+    class Meta:
+        model = Client
+        fields = []
+
+
+class DestinationFilter(filters.FilterSet):
+    q = RechercheFilter()
+
+    class Meta:
+        model = Destination
+        fields = []
+
+
+class ExpeditionFilter(filters.FilterSet):
+    q = RechercheFilter()
+    statut__in = CharInFilter(field_name='statut', lookup_expr='in')
+    client = filters.NumberFilter(field_name='client')
+    client__in = NumberInFilter(field_name='client', lookup_expr='in')
+    destination = filters.NumberFilter(field_name='destination')
+    destination__in = NumberInFilter(field_name='destination', lookup_expr='in')
+    service = filters.NumberFilter(field_name='service')
+    service__in = NumberInFilter(field_name='service', lookup_expr='in')
+
+    class Meta:
+        model = Expedition
+        fields = {
+            'statut': ['exact'],
+            'date_creation': ['gte', 'lte', 'gt', 'lt'],
+        }
+
+
+class TourneeFilter(filters.FilterSet):
+    statut__in = CharInFilter(field_name='statut', lookup_expr='in')
+    chauffeur = filters.NumberFilter(field_name='chauffeur')
+    chauffeur__in = NumberInFilter(field_name='chauffeur', lookup_expr='in')
+    vehicule = filters.NumberFilter(field_name='vehicule')
+
+    class Meta:
+        model = Tournee
+        fields = {
+            'statut': ['exact'],
+            'date': ['exact', 'gte', 'lte', 'gt', 'lt'],
+        }
+
+
+class TrackingHistoriqueFilter(filters.FilterSet):
+    expedition = filters.NumberFilter(field_name='expedition')
+    expedition__in = NumberInFilter(field_name='expedition', lookup_expr='in')
+
+    class Meta:
+        model = TrackingHistorique
+        fields = {
+            'statut': ['exact'],
+            'date_heure': ['gte', 'lte', 'gt', 'lt'],
+        }
+
+
+class FactureFilter(filters.FilterSet):
+    statut__in = CharInFilter(field_name='statut', lookup_expr='in')
+    client = filters.NumberFilter(field_name='client')
+    client__in = NumberInFilter(field_name='client', lookup_expr='in')
+
+    class Meta:
+        model = Facture
+        fields = {
+            'statut': ['exact'],
+            'date_emission': ['gte', 'lte', 'gt', 'lt'],
+        }
+
+
+class PaiementFilter(filters.FilterSet):
+    facture = filters.NumberFilter(field_name='facture')
+    facture__in = NumberInFilter(field_name='facture', lookup_expr='in')
+
+    class Meta:
+        model = Paiement
+        fields = {
+            'mode_paiement': ['exact'],
+            'date_paiement': ['gte', 'lte', 'gt', 'lt'],
+        }
+
+
+class IncidentFilter(filters.FilterSet):
+    statut__in = CharInFilter(field_name='statut', lookup_expr='in')
+    type_incident__in = CharInFilter(field_name='type_incident', lookup_expr='in')
+    expedition = filters.NumberFilter(field_name='expedition')
+    tournee = filters.NumberFilter(field_name='tournee')
+
+    class Meta:
+        model = Incident
+        fields = {
+            'statut': ['exact'],
+            'type_incident': ['exact'],
+            'date_incident': ['gte', 'lte', 'gt', 'lt'],
+        }
+
+
+class ReclamationFilter(filters.FilterSet):
+    statut__in = CharInFilter(field_name='statut', lookup_expr='in')
+    client = filters.NumberFilter(field_name='client')
+    client__in = NumberInFilter(field_name='client', lookup_expr='in')
+
+    class Meta:
+        model = Reclamation
+        fields = {
+            'statut': ['exact'],
+            'type_reclamation': ['exact'],
+            'date_reclamation': ['gte', 'lte', 'gt', 'lt'],
+        }
@@ -0,0 +1,318 @@
+import math
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import etats, numerotation, statistiques, suivi
+from .models import Client, Expedition, TrackingHistorique
+from .tarification import calculer_montants, grilles
+
+TAILLE_LOT = 2000
+
+OBLIGATOIRE = 'Ce champ est obligatoire.'
+NOMBRE_INVALIDE = 'Un nombre valide est requis.'
+STATUTS = {code for code, _ in Expedition.STATUT_CHOIX}
+DATE_INVALIDE = ("La date + heure n'a pas le bon format. "
+                 "Utilisez le format ISO 8601 : AAAA-MM-JJThh:mm[:ss[.uuuuuu]][+HH:MM|Z].")
+LIEU_MAX = TrackingHistorique._meta.get_field('lieu').max_length
+# Colonnes de l'expédition lues avant d'appliquer ses scans
+CHAMPS_EXPEDITION = ('id', 'numero_suivi', 'statut', 'montant_total', 'date_creation', 'date_dernier_evenement')
+
+
+def par_lots(iterable, taille):
+    iterateur = iter(iterable)
+    while lot := list(islice(iterateur, taille)):
+        yield lot
+
+
+def importer_expeditions(lignes, taille_lot=TAILLE_LOT):
+    """
+    Crée les expéditions d'un manifeste (itérable de dicts) en une transaction.
+
+    Les grilles tarifaires viennent de la mémoire (tarification.grilles), les clients
+    vérifiés par lot, les prix calculés par lot puis insérés avec bulk_create.
+    Une ligne invalide est signalée sans interrompre l'import :
+    {'crees': n, 'numeros_suivi': [...], 'erreurs': [{'ligne': i, 'erreurs': {...}}]}
+    """
+    tarifs_base, tarifs_service = grilles()
+    resultat = {'crees': 0, 'numeros_suivi': [], 'erreurs': []}
+
+    with transaction.atomic():
+        for lot in par_lots(enumerate(lignes, start=1), taille_lot):
+            _importer_lot(lot, tarifs_base, tarifs_service, resultat)
+    return resultat
+
+
+def _importer_lot(lot, tarifs_base, tarifs_service, resultat):
+    valides = []
+    for numero, ligne in lot:
+        valeurs, erreurs = valider_ligne(ligne, tarifs_base, tarifs_service)
+        if erreurs:
+            resultat['erreurs'].append({'ligne': numero, 'erreurs': erreurs})
+        else:
+            valides.append((numero, valeurs))
+
+    clients = set(Client.objects.filter(
+        id__in={valeurs['client_id'] for _, valeurs in valides}
+    ).values_list('id', flat=True))
+    expeditions = []
+    for numero, valeurs in valides:
+        if valeurs['client_id'] not in clients:
+            resultat['erreurs'].append({'ligne': numero, 'erreurs': {
+                'client': [f"Clé primaire « {valeurs['client_id']} » non valide - l'objet n'existe pas."]
+            }})
+            continue
+        expeditions.append(Expedition(**valeurs))
+    for expedition, numero_suivi in zip(expeditions, numerotation.allouer('E', len(expeditions))):
+        expedition.numero_suivi = numero_suivi
+
+    a_tarifer = [e for e in expeditions if not e.montant_total]
+    montants = calculer_montants(
+        [(e.destination_id, e.service_id, e.poids, e.volume) for e in a_tarifer],
+        tarifs_base, tarifs_service,
+    )
+    for expedition, montant in zip(a_tarifer, montants):
+        expedition.montant_total = montant
+
+    Expedition.objects.bulk_create(expeditions, batch_size=500)
+
+    # bulk_create n'envoie pas de signaux : statistiques mises à jour ici
+    deltas = None
+    for expedition in expeditions:
+        deltas = statistiques.deltas_expedition(None, statistiques.etat_expedition(expedition), deltas)
+    if deltas:
+        statistiques.appliquer_deltas(deltas)
+
+    resultat['crees'] += len(expeditions)
+    resultat['numeros_suivi'] += [e.numero_suivi for e in expeditions]
+
+
+def valider_ligne(ligne, tarifs_base, tarifs_service):
+    """Retourne (valeurs pour Expedition(**valeurs), erreurs par champ)"""
+    if not isinstance(ligne, dict):
+        return None, {'non_field_errors': [str(ligne) if isinstance(ligne, Exception) else 'Objet attendu.']}
+
+    valeurs, erreurs = valider_tarif(ligne, tarifs_base, tarifs_service)
+    valeur = ligne.get('client')
+    if valeur in (None, ''):
+        erreurs['client'] = [OBLIGATOIRE]
+    else:
+        try:
+            valeurs['client_id'] = int(valeur)
+        except (TypeError, ValueError):
+            erreurs['client'] = ['Type incorrect. Attendait une clé primaire.']
+
+    description = ligne.get('description')
+    if not isinstance(description, str) or not description.strip():
+        erreurs['description'] = [OBLIGATOIRE]
+    else:
+        valeurs['description'] = description
+
+    statut = ligne.get('statut', 'EN_TRANSIT')
+    if statut not in STATUTS:
+        erreurs['statut'] = [f"« {statut} » n'est pas un choix valide."]
+    else:
+        valeurs['statut'] = statut
+
+    montant = ligne.get('montant_total')
+    if montant not in (None, ''):
+        try:
+            montant = Decimal(str(montant))
+        except InvalidOperation:
+            montant = None
+        if montant is None or not montant.is_finite():
+            erreurs['montant_total'] = [NOMBRE_INVALIDE]
+        else:
+            valeurs['montant_total'] = montant.quantize(Decimal('0.01'))
+
+    return valeurs, erreurs
+
+
+def valider_tarif(ligne, tarifs_base, tarifs_service):
+    """Champs utiles au prix : destination, service, poids, volume -> (valeurs, erreurs)"""
+    valeurs, erreurs = {}, {}
+    for champ, references in (('destination', tarifs_base), ('service', tarifs_service)):
+        valeur = ligne.get(champ)
+        if valeur in (None, ''):
+            erreurs[champ] = [OBLIGATOIRE]
+            continue
+        try:
+            pk = int(valeur)
+        except (TypeError, ValueError):
+            erreurs[champ] = ['Type incorrect. Attendait une clé primaire.']
+            continue
+        if pk not in references:
+            erreurs[champ] = [f"Clé primaire « {pk} » non valide - l'objet n'existe pas."]
+            continue
+        valeurs[f'{champ}_id'] = pk
+
+    for champ in ('poids', 'volume'):
+        valeur = ligne.get(champ)
+        if valeur in (None, ''):
+            erreurs[champ] = [OBLIGATOIRE]
+            continue
+        try:
+            valeurs[champ] = float(valeur)
+        except (TypeError, ValueError):
+            erreurs[champ] = [NOMBRE_INVALIDE]
+            continue
+        if math.isnan(valeurs[champ]) or math.isinf(valeurs[champ]):
+            erreurs[champ] = [NOMBRE_INVALIDE]
+    return valeurs, erreurs
+
+
+def importer_evenements(lignes, taille_lot=TAILLE_LOT):
+    """
+    Enregistre des événements de suivi (scans des hubs et terminaux) en une transaction.
+
+    Chaque ligne : {numero_suivi, lieu, statut, date_heure (ISO 8601, heure de
+    réception à défaut), commentaire}. Par lot : numéros résolus en une requête
+    IN, scans déjà enregistrés écartés (un terminal qui renvoie son lot ne crée
+    pas de doublons), insertion avec bulk_create, puis un UPDATE par statut
+    d'arrivée pour les expéditions dont le scan est le plus récent, si la
+    transition est permise (core/etats.py).
+    {'crees': n, 'doublons': n, 'expeditions_modifiees': n, 'erreurs': [{'ligne': i, 'erreurs': {...}}]}
+    """
+    maintenant = timezone.now()
+    resultat = {'crees': 0, 'doublons': 0, 'expeditions_modifiees': 0, 'erreurs': []}
+
+    with transaction.atomic():
+        for lot in par_lots(enumerate(lignes, start=1), taille_lot):
+            _importer_evenements_lot(lot, maintenant, resultat)
+    resultat['erreurs'].sort(key=lambda erreur: erreur['ligne'])
+    return resultat
+
+
+def _importer_evenements_lot(lot, maintenant, resultat):
+    valides = []
+    for numero, ligne in lot:
+        valeurs, erreurs = valider_evenement(ligne, maintenant)
+        if erreurs:
+            resultat['erreurs'].append({'ligne': numero, 'erreurs': erreurs})
+        else:
+            valides.append((numero, valeurs))
+
+    # Verrou dans l'ordre des id : deux imports concurrents ne s'interbloquent pas
+    expeditions = {
+        e['numero_suivi']: e
+        for e in Expedition.objects.select_for_update()
+        .filter(numero_suivi__in={valeurs['numero_suivi'] for _, valeurs in valides})
+        .order_by('pk')
+        .values(*CHAMPS_EXPEDITION)
+    }
+    evenements, vus = [], set()
+    for numero, valeurs in valides:
+        expedition = expeditions.get(valeurs.pop('numero_suivi'))
+        if expedition is None:
+            resultat['erreurs'].append({'ligne': numero, 'erreurs': {'numero_suivi': ['Numéro de suivi inconnu.']}})
+            continue
+        cle = (expedition['id'], valeurs['date_heure'], valeurs['lieu'], valeurs['statut'])
+        if cle in vus:
+            resultat['doublons'] += 1
+            continue
+        vus.add(cle)
+        evenements.append(TrackingHistorique(expedition_id=expedition['id'], **valeurs))
+    if not evenements:
+        return
+
+    # Scans identiques déjà en base : index (expedition, date_heure)
+    deja_enregistres = set(TrackingHistorique.objects.filter(
+        expedition_id__in={e.expedition_id for e in evenements},
+        date_heure__in={e.date_heure for e in evenements},
+    ).values_list('expedition_id', 'date_heure', 'lieu', 'statut'))
+    if deja_enregistres:
+        nouveaux = [e for e in evenements if (e.expedition_id, e.date_heure, e.lieu, e.statut) not in deja_enregistres]
+        resultat['doublons'] += len(evenements) - len(nouveaux)
+        evenements = nouveaux
+
+    TrackingHistorique.objects.bulk_create(evenements, batch_size=500)
+    resultat['crees'] += len(evenements)
+    _appliquer_derniers_evenements(evenements, expeditions, resultat)
+
+
+def enregistrer_evenement(evenement):
+    """Événement créé à l'unité (POST /api/tracking/, admin) : mêmes règles qu'un import"""
+    with transaction.atomic():
+        expeditions = {
+            e['numero_suivi']: e
+            for e in Expedition.objects.select_for_update()
+            .filter(pk=evenement.expedition_id)
+            .values(*CHAMPS_EXPEDITION)
+        }
+        _appliquer_derniers_evenements([evenement], expeditions, {'expeditions_modifiees': 0})
+
+
+def _appliquer_derniers_evenements(evenements, expeditions, resultat):
+    """Recopie du dernier événement et changements de statut (bulk_create n'envoie pas de signaux)"""
+    derniers = {}
+    for evenement in evenements:
+        dernier = derniers.get(evenement.expedition_id)
+        if dernier is None or evenement.date_heure >= dernier.date_heure:
+            derniers[evenement.expedition_id] = evenement
+
+    par_id = {e['id']: e for e in expeditions.values()}
+    recopies, par_statut, deltas = [], {}, None
+    for expedition_id, evenement in derniers.items():
+        avant = par_id[expedition_id]
+        # Un scan arrivé en retard complète l'historique sans changer l'état
+        if avant['date_dernier_evenement'] is not None and evenement.date_heure < avant['date_dernier_evenement']:
+            continue
+        if evenement.statut != avant['statut']:
+            # Transition refusée : le scan reste dans l'historique, dernier_statut_suivi suit statut
+            if not etats.autorise(Expedition, avant['statut'], evenement.statut):
+                continue
+            par_statut.setdefault(evenement.statut, []).append(expedition_id)
+            deltas = statistiques.deltas_statut(avant, evenement.statut, deltas)
+        # Le scan accepté lui-même : un scan refusé plus récent peut déjà être en base
+        recopies.append(evenement)
+
+    suivi.recopier_evenements(recopies)
+    for statut, ids in par_statut.items():
+        Expedition.objects.filter(pk__in=ids).update(statut=statut)
+        resultat['expeditions_modifiees'] += len(ids)
+    if deltas:
+        statistiques.appliquer_deltas(deltas)
+    suivi.invalider(*(par_id[pk]['numero_suivi'] for pk in {e.expedition_id for e in evenements}))
+
+
+def valider_evenement(ligne, maintenant):
+    """Retourne (valeurs d'un TrackingHistorique avec numero_suivi, erreurs par champ)"""
+    if not isinstance(ligne, dict):
+        return None, {'non_field_errors': [str(ligne) if isinstance(ligne, Exception) else 'Objet attendu.']}
+
+    valeurs, erreurs = {}, {}
+    for champ in ('numero_suivi', 'lieu'):
+        valeur = ligne.get(champ)
+        if not isinstance(valeur, str) or not valeur.strip():
+            erreurs[champ] = [OBLIGATOIRE]
+        else:
+            valeurs[champ] = valeur.strip()
+    if len(valeurs.get('lieu', '')) > LIEU_MAX:
+        erreurs['lieu'] = [f'Assurez-vous que ce champ comporte au plus {LIEU_MAX} caractères.']
+
+    statut = ligne.get('statut')
+    if statut in (None, ''):
+        erreurs['statut'] = [OBLIGATOIRE]
+    elif statut not in STATUTS:
+        erreurs['statut'] = [f"« {statut} » n'est pas un choix valide."]
+    else:
+        valeurs['statut'] = statut
+
+    valeurs['commentaire'] = str(ligne.get('commentaire') or '')
+
+    date_heure = ligne.get('date_heure')
+    if date_heure in (None, ''):
+        valeurs['date_heure'] = maintenant
+    else:
+        try:
+            date_heure = parse_datetime(date_heure) if isinstance(date_heure, str) else None
+        except ValueError:
+            date_heure = None
+        if date_heure is None:
+            erreurs['date_heure'] = [DATE_INVALIDE]
+        else:
+            valeurs['date_heure'] = date_heure if timezone.is_aware(date_heure) else timezone.make_aware(date_heure)
+    return valeurs, erreurs
@@ -0,0 +1,178 @@
+"""
+Authentification par jetons signés (django.core.signing), sans état.
+
+POST /api/login/ vérifie le mot de passe, une fois par session, et renvoie
+deux jetons signés (HMAC-SHA256, SECRET_KEY) :
+
+- accès, valable JETON_ACCES_DUREE : identifiant, nom, droits et numéro de
+  session. Chaque requête le présente (Authorization: Bearer ...) et
+  JetonAuthentication le vérifie sans lire la base : signature, âge, puis
+  session révoquée ou non, dans un dict en mémoire ;
+- rafraîchissement, valable JETON_RAFRAICHISSEMENT_DUREE : POST
+  /api/token/refresh/ relit l'utilisateur (actif, mot de passe inchangé) et
+  émet une nouvelle paire pour la même session.
+
+POST /api/logout/ révoque la session : dans ce processus immédiatement, et
+dans le cache partagé (JETONS_CACHE), par deux écritures sans
+lecture-modification-écriture :
+
+- une clé par session, jetons:revoque:<session>, valable autant que le
+  jeton de rafraîchissement, que rafraichir() consulte à chaque fois ;
+- une entrée numérotée par incr() dans un journal, que les autres
+  processus relisent au plus toutes les REVOCATIONS_SYNCHRO secondes pour
+  refuser aussi les jetons d'accès encore valides.
+
+Avec plusieurs workers, JETONS_CACHE doit être partagé et ne rien évincer
+(Redis en noeviction) : settings.py exige REDIS_URL et CoreConfig.ready()
+refuse un cache local.
+"""
+import secrets
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication
+
+ACCES_DUREE = getattr(settings, 'JETON_ACCES_DUREE', 15 * 60)
+RAFRAICHISSEMENT_DUREE = getattr(settings, 'JETON_RAFRAICHISSEMENT_DUREE', 7 * 24 * 3600)
+ALIAS = getattr(settings, 'JETONS_CACHE', 'default')
+REVOCATIONS_SYNCHRO = getattr(settings, 'REVOCATIONS_SYNCHRO', 5)
+# Entrées du journal relues au plus par synchronisation
+JOURNAL_MAX = 10_000
+
+SEL_ACCES = 'core.jetons.acces'
+SEL_RAFRAICHISSEMENT = 'core.jetons.rafraichissement'
+CLE_JOURNAL = 'jetons:journal'
+
+# Sessions révoquées connues de ce processus : {session: oubli (time.time())}
+_revoquees = {}
+_prochaine_synchro = 0.0
+_journal_lu = 0
+
+
+def cle_revocation(session):
+    return f'jetons:revoque:{session}'
+
+
+class UtilisateurJeton:
+    """request.user reconstruit depuis le jeton, sans requête"""
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+
+    def __init__(self, donnees):
+        self.id = self.pk = donnees['u']
+        self.username = donnees['n']
+        self.is_staff = donnees['st']
+        self.is_superuser = donnees['su']
+
+    def __str__(self):
+        return self.username
+
+    def utilisateur(self):
+        """User complet, pour les rares vues qui en ont besoin"""
+        return User.objects.get(pk=self.pk)
+
+
+def emettre(user, session=None):
+    """Paire de jetons pour `user` ; nouvelle session si `session` est None"""
+    session = session or secrets.token_urlsafe(12)
+    acces = {'u': user.pk, 'n': user.get_username(), 'st': user.is_staff, 'su': user.is_superuser, 's': session}
+    # Le hachage du mot de passe invalide les rafraîchissements après un changement
+    rafraichissement = {'u': user.pk, 's': session, 'h': user.get_session_auth_hash()}
+    return {
+        'acces': signing.dumps(acces, salt=SEL_ACCES),
+        'rafraichissement': signing.dumps(rafraichissement, salt=SEL_RAFRAICHISSEMENT),
+        'expire_dans': ACCES_DUREE,
+    }
+
+
+def verifier(jeton):
+    """Contenu du jeton d'accès, ou None s'il est invalide, expiré ou révoqué"""
+    try:
+        donnees = signing.loads(jeton, salt=SEL_ACCES, max_age=ACCES_DUREE)
+    except signing.BadSignature:
+        return None
+    _synchroniser()
+    if donnees['s'] in _revoquees:
+        return None
+    return donnees
+
+
+def rafraichir(jeton):
+    """Nouvelle paire de jetons, ou None (jeton invalide, session révoquée, compte changé)"""
+    try:
+        donnees = signing.loads(jeton or '', salt=SEL_RAFRAICHISSEMENT, max_age=RAFRAICHISSEMENT_DUREE)
+    except signing.BadSignature:
+        return None
+    session = donnees['s']
+    if session in _revoquees or caches[ALIAS].get(cle_revocation(session)) is not None:
+        return None
+    user = User.objects.filter(pk=donnees['u'], is_active=True).first()
+    if user is None or user.get_session_auth_hash() != donnees['h']:
+        return None
+    return emettre(user, session)
+
+
+def revoquer(session):
+    """Les jetons de `session` ne sont plus acceptés"""
+    maintenant = time.time()
+    # Gardée ici autant que le rafraîchissement : un cache local peut évincer la clé partagée
+    _revoquees[session] = maintenant + RAFRAICHISSEMENT_DUREE
+    cache = caches[ALIAS]
+    cache.add(cle_revocation(session), 1, RAFRAICHISSEMENT_DUREE)
+    cache.add(CLE_JOURNAL, 0, None)
+    numero = cache.incr(CLE_JOURNAL)
+    # Utile aux autres processus tant que des jetons d'accès de la session peuvent circuler
+    cache.set(f'{CLE_JOURNAL}:{numero}', session, ACCES_DUREE + REVOCATIONS_SYNCHRO)
+
+
+def _synchroniser():
+    """Sessions révoquées par les autres processus, lues dans le journal"""
+    global _prochaine_synchro, _journal_lu
+    maintenant = time.time()
+    if maintenant < _prochaine_synchro:
+        return
+    _prochaine_synchro = maintenant + REVOCATIONS_SYNCHRO
+    for session, oubli in list(_revoquees.items()):
+        if oubli <= maintenant:
+            _revoquees.pop(session, None)
+    cache = caches[ALIAS]
+    dernier = cache.get(CLE_JOURNAL) or 0
+    if dernier < _journal_lu:
+        # Journal recréé (cache vidé)
+        _journal_lu = 0
+    cles = [f'{CLE_JOURNAL}:{numero}' for numero in range(max(_journal_lu, dernier - JOURNAL_MAX) + 1, dernier + 1)]
+    for session in cache.get_many(cles).values():
+        _revoquees.setdefault(session, maintenant + ACCES_DUREE)
+    _journal_lu = dernier
+
+
+def verifier_cache(workers):
+    """Plusieurs workers : les révocations doivent passer par un cache partagé"""
+    if workers > 1 and isinstance(caches[ALIAS], LocMemCache):
+        raise ImproperlyConfigured(
+            f"JETONS_CACHE ({ALIAS}) est local au processus : une déconnexion ne serait pas vue des autres workers"
+        )
+
+
+class JetonAuthentication(BaseAuthentication):
+    """Authorization: Bearer <jeton d'accès> ; request.auth contient le jeton décodé"""
+    mot_cle = 'Bearer'
+
+    def authenticate(self, request):
+        mot, _, jeton = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+        if mot != self.mot_cle:
+            return None
+        donnees = verifier(jeton.strip())
+        if donnees is None:
+            raise exceptions.AuthenticationFailed('Jeton invalide ou expiré')
+        return UtilisateurJeton(donnees), donnees
+
+    def authenticate_header(self, request):
+        return self.mot_cle
@@ -0,0 +1,116 @@
+"""
+Limitation de débit par seau à jetons, par utilisateur (IP si anonyme).
+
+Chaque budget de LIMITATION_BUDGETS est un seau (capacité, jetons par
+seconde) : une rafale jusqu'à la capacité passe, ensuite le débit est
+plafonné. Une requête refusée reçoit 429 et Retry-After.
+
+- lourd : analytics/* et exports ;
+- standard : le reste de l'API, dont les listes (paginées, celles du
+  référentiel en cache) que l'interface relit page par page ;
+- leger : suivi public /api/track/<numero>/.
+
+Les seaux vivent en mémoire du processus, sans aller-retour réseau. Avec
+LIMITATION_CACHE (alias de CACHES), ils sont partagés entre processus ;
+la lecture puis l'écriture n'étant pas atomiques, deux processus peuvent
+ponctuellement consommer le même jeton.
+
+Un anonyme est identifié par son adresse : REMOTE_ADDR, ou l'entrée de
+X-Forwarded-For posée par le dernier des NUM_PROXIES proxys de confiance
+(REST_FRAMEWORK, 0 par défaut). Sans cela, changer l'en-tête donnerait un
+seau neuf à chaque requête.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+BUDGETS = getattr(settings, 'LIMITATION_BUDGETS', {
+    'lourd': (30, 1),
+    'standard': (120, 10),
+    'leger': (300, 50),
+})
+ALIAS = getattr(settings, 'LIMITATION_CACHE', None)
+# Au-delà, les seaux utilisés le moins récemment sont oubliés
+CLES_MAX = getattr(settings, 'LIMITATION_CLES_MAX', 100_000)
+
+# {clé: (jetons, instant)}, du moins au plus récemment utilisé
+_seaux = OrderedDict()
+_verrou = threading.Lock()
+
+
+def _remplir(etat, capacite, debit, maintenant):
+    if etat is None:
+        return capacite
+    jetons, instant = etat
+    return min(capacite, jetons + (maintenant - instant) * debit)
+
+
+def prendre(cle, capacite, debit, maintenant=None):
+    """Prend un jeton du seau `cle` : 0 si accordé, sinon secondes avant le prochain"""
+    if ALIAS:
+        return _prendre_partage(cle, capacite, debit, maintenant or time.time())
+    maintenant = maintenant or time.monotonic()
+    with _verrou:
+        jetons = _remplir(_seaux.get(cle), capacite, debit, maintenant)
+        attente = 0 if jetons >= 1 else (1 - jetons) / debit
+        jetons -= attente == 0
+        _seaux[cle] = (jetons, maintenant)
+        _seaux.move_to_end(cle)
+        if len(_seaux) > CLES_MAX:
+            _seaux.popitem(last=False)
+    return attente
+
+
+def _prendre_partage(cle, capacite, debit, maintenant):
+    cache = caches[ALIAS]
+    jetons = _remplir(cache.get(cle), capacite, debit, maintenant)
+    attente = 0 if jetons >= 1 else (1 - jetons) / debit
+    jetons -= attente == 0
+    # Expire quand le seau serait plein de toute façon
+    cache.set(cle, (jetons, maintenant), int((capacite - jetons) / debit) + 1)
+    return attente
+
+
+def vider():
+    with _verrou:
+        _seaux.clear()
+
+
+class SeauThrottle(BaseThrottle):
+    """Un jeton du seau (budget, utilisateur) par requête"""
+    budget = 'standard'
+
+    def get_budget(self, request, view):
+        return self.budget
+
+    def allow_request(self, request, view):
+        budget = self.get_budget(request, view)
+        if budget not in BUDGETS:
+            # Budget retiré des réglages : pas de limite
+            return True
+        user = request.user
+        ident = f'u{user.pk}' if user and user.is_authenticated else self.get_ident(request)
+        self.attente = prendre(f'limitation:{budget}:{ident}', *BUDGETS[budget])
+        return self.attente == 0
+
+    def wait(self):
+        return self.attente
+
+
+class LimitationParDefaut(SeauThrottle):
+    """Exports sur le budget lourd, le reste sur le budget standard"""
+
+    def get_budget(self, request, view):
+        return 'lourd' if getattr(view, 'action', None) == 'export' else 'standard'
+
+
+class LimitationLourde(SeauThrottle):
+    budget = 'lourd'
+
+
+class LimitationLegere(SeauThrottle):
+    budget = 'leger'
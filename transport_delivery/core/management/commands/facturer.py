@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core import facturation
+
+
+class Command(BaseCommand):
+    help = "Facture les expéditions livrées créées jusqu'à une date (reprend une exécution interrompue)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fin', required=True, help="Dernier jour inclus (AAAA-MM-JJ)")
+        parser.add_argument('--taille-lot', type=int, default=facturation.TAILLE_LOT,
+                            help="Nombre de clients facturés par transaction")
+
+    def handle(self, *args, **options):
+        fin = parse_date(options['fin'])
+        if fin is None:
+            raise CommandError('Date invalide (format AAAA-MM-JJ)')
+        try:
+            execution = facturation.facturer(fin, options['taille_lot'])
+        except facturation.FacturationEnCours as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f"{execution.factures_creees} factures, {execution.expeditions_facturees} expéditions, "
+            f"{execution.montant_ttc} TTC jusqu'au {fin}"
+        ))
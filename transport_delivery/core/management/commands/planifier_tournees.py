@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core import planification
+
+
+class Command(BaseCommand):
+    help = "Crée les tournées d'une journée à partir des expéditions en attente"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Jour à planifier (AAAA-MM-JJ), aujourd'hui par défaut")
+
+    def handle(self, *args, **options):
+        jour = parse_date(options['date']) if options['date'] else timezone.now().date()
+        if jour is None:
+            raise CommandError('Date invalide (format AAAA-MM-JJ)')
+
+        resultat = planification.planifier(jour)
+        for tournee in resultat['tournees']:
+            self.stdout.write(
+                f"{tournee['numero_tournee']} : {tournee['expeditions']} expéditions, "
+                f"{tournee['poids']} kg, {tournee['volume']} m3"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(resultat['tournees'])} tournées créées pour le {jour}, "
+            f"{resultat['affectees']} expéditions affectées, {len(resultat['non_affectees'])} en attente"
+        ))
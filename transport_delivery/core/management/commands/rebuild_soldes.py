@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core import comptabilite
+
+
+class Command(BaseCommand):
+    help = "Recalcule le solde de chaque client à partir du grand livre"
+
+    def handle(self, *args, **options):
+        clients = comptabilite.reconstruire()
+        self.stdout.write(self.style.SUCCESS(f"{clients} soldes clients recalculés"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core import statistiques
+
+
+class Command(BaseCommand):
+    help = "Recalcule entièrement les statistiques agrégées du dashboard"
+
+    def handle(self, *args, **options):
+        lignes, compteurs = statistiques.reconstruire()
+        self.stdout.write(self.style.SUCCESS(
+            f"{lignes} statistiques journalières et {compteurs} compteurs recalculés"
+        ))
@@ -0,0 +1,258 @@
+"""
+Instrumentation des requêtes HTTP, exposée au format Prometheus sur /metrics.
+
+MetriquesMiddleware mesure pour chaque requête, par vue et action
+(ExpeditionViewSet.list, AnalyticsViewSet.dashboard...) : la durée totale,
+le nombre de requêtes SQL et leur durée, le temps de rendu de la réponse
+(JSON, CSV) et sa taille. Les mesures vont dans des histogrammes en mémoire
+du processus : avec plusieurs workers, chacun expose les siens.
+
+Une requête plus lente que METRIQUES_SEUIL_LENT_MS, ou qui dépasse
+METRIQUES_SEUIL_REQUETES requêtes SQL, est journalisée (logger
+core.metriques) avec ses requêtes SQL les plus lentes et ses requêtes
+répétées regroupées par empreinte : un N+1 apparaît comme une même empreinte
+exécutée des centaines de fois.
+
+Le middleware fonctionne en WSGI comme en ASGI. Sous ASGI, l'ORM async
+exécute le SQL dans un thread : les requêtes sont attribuées à la requête
+HTTP par une ContextVar, que sync_to_async propage, et non par un
+execute_wrapper posé sur les connexions du thread courant.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+SEUIL_LENT_MS = getattr(settings, 'METRIQUES_SEUIL_LENT_MS', 1000)
+SEUIL_REQUETES = getattr(settings, 'METRIQUES_SEUIL_REQUETES', 200)
+IPS_AUTORISEES = getattr(settings, 'METRIQUES_IPS', None)
+CHEMIN = '/metrics'
+# Requêtes SQL citées dans le journal d'une requête lente
+REQUETES_CITEES = 5
+
+BORNES_DUREE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BORNES_REQUETES = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+BORNES_TAILLE = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+class Histogramme:
+    """Histogramme cumulatif par jeu de labels, au sens de Prometheus"""
+
+    def __init__(self, nom, aide, bornes, labels):
+        self.nom, self.aide, self.bornes, self.labels = nom, aide, bornes, labels
+        self._series = {}
+        self._verrou = threading.Lock()
+
+    def observer(self, valeur, *labels):
+        with self._verrou:
+            serie = self._series.get(labels)
+            if serie is None:
+                # compteurs par borne (+Inf en dernier), somme
+                serie = self._series[labels] = [[0] * (len(self.bornes) + 1), 0.0]
+            for i, borne in enumerate(self.bornes):
+                if valeur <= borne:
+                    serie[0][i] += 1
+                    break
+            else:
+                serie[0][-1] += 1
+            serie[1] += valeur
+
+    def exposer(self):
+        lignes = [f'# HELP {self.nom} {self.aide}', f'# TYPE {self.nom} histogram']
+        with self._verrou:
+            series = sorted((labels, list(comptes), somme) for labels, (comptes, somme) in self._series.items())
+        for labels, comptes, somme in series:
+            base = ','.join(f'{nom}="{_echapper(valeur)}"' for nom, valeur in zip(self.labels, labels))
+            cumul = 0
+            for borne, nombre in zip(self.bornes + ('+Inf',), comptes):
+                cumul += nombre
+                lignes.append(f'{self.nom}_bucket{{{base},le="{borne}"}} {cumul}')
+            lignes.append(f'{self.nom}_sum{{{base}}} {somme:.6g}')
+            lignes.append(f'{self.nom}_count{{{base}}} {cumul}')
+        return lignes
+
+    def vider(self):
+        with self._verrou:
+            self._series.clear()
+
+
+def _echapper(valeur):
+    return str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+DUREE = Histogramme('transport_http_request_duration_seconds', "Durée des requêtes HTTP",
+                    BORNES_DUREE, ('view', 'method', 'status'))
+REQUETES_SQL = Histogramme('transport_db_queries', "Requêtes SQL par requête HTTP",
+                           BORNES_REQUETES, ('view',))
+DUREE_SQL = Histogramme('transport_db_duration_seconds', "Temps passé en base par requête HTTP",
+                        BORNES_DUREE, ('view',))
+DUREE_RENDU = Histogramme('transport_render_duration_seconds', "Temps de rendu de la réponse (JSON, CSV...)",
+                          BORNES_DUREE, ('view',))
+TAILLE = Histogramme('transport_response_size_bytes', "Taille des réponses",
+                     BORNES_TAILLE, ('view',))
+HISTOGRAMMES = (DUREE, REQUETES_SQL, DUREE_SQL, DUREE_RENDU, TAILLE)
+
+
+def exposition():
+    """Toutes les séries au format texte Prometheus"""
+    lignes = []
+    for histogramme in HISTOGRAMMES:
+        lignes += histogramme.exposer()
+    return '\n'.join(lignes) + '\n'
+
+
+def nom_vue(view_func, methode):
+    """ExpeditionViewSet.list, AnalyticsViewSet.dashboard, devis_view..."""
+    classe = getattr(view_func, 'cls', None)
+    if classe is None:
+        return getattr(view_func, '__qualname__', view_func.__class__.__name__)
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        return f'{classe.__name__}.{actions.get(methode.lower(), methode.lower())}'
+    return classe.__name__
+
+
+# Empreinte d'une requête SQL : littéraux et listes IN remplacés par ?
+_CHAINES = re.compile(r"'(?:[^']|'')*'")
+_NOMBRES = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LISTES = re.compile(r'\((?:\s*(?:\?|%s)\s*,)+\s*(?:\?|%s)\s*\)')
+
+
+def empreinte(sql):
+    sql = _NOMBRES.sub('?', _CHAINES.sub('?', sql))
+    return _LISTES.sub('(...)', sql.replace('%s', '?'))
+
+
+class _Collecteur:
+    """Compte, chronomètre et garde le SQL des requêtes d'une requête HTTP"""
+
+    def __init__(self):
+        self.nombre, self.duree, self.requetes = 0, 0.0, []
+
+    def ajouter(self, duree, sql):
+        self.nombre += 1
+        self.duree += duree
+        self.requetes.append((duree, sql))
+
+
+_collecteur = ContextVar('metriques_collecteur', default=None)
+
+
+def _executer(execute, sql, params, many, context):
+    collecteur = _collecteur.get()
+    if collecteur is None:
+        return execute(sql, params, many, context)
+    debut = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        collecteur.ajouter(time.perf_counter() - debut, sql)
+
+
+def installer(sender, connection, **kwargs):
+    """connection_created : execute_wrapper permanent sur chaque connexion (core/apps.py)"""
+    if _executer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_executer)
+
+
+class MetriquesMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Sinon Django l'appellerait via sync_to_async, dans un thread
+            self.process_template_response = self._aprocess_template_response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request._metriques = {'rendu': 0.0}
+        if request.path_info == CHEMIN:
+            return self.get_response(request)
+
+        collecteur = _Collecteur()
+        jeton = _collecteur.set(collecteur)
+        debut = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _collecteur.reset(jeton)
+        self.enregistrer(request, response, time.perf_counter() - debut, collecteur)
+        return response
+
+    async def __acall__(self, request):
+        request._metriques = {'rendu': 0.0}
+        if request.path_info == CHEMIN:
+            return await self.get_response(request)
+
+        collecteur = _Collecteur()
+        jeton = _collecteur.set(collecteur)
+        debut = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _collecteur.reset(jeton)
+        self.enregistrer(request, response, time.perf_counter() - debut, collecteur)
+        return response
+
+    def process_template_response(self, request, response):
+        # Appelé juste avant response.render() : DRF sérialise en JSON à ce moment
+        debut = time.perf_counter()
+
+        def rendu_termine(response):
+            request._metriques['rendu'] = time.perf_counter() - debut
+        response.add_post_render_callback(rendu_termine)
+        return response
+
+    async def _aprocess_template_response(self, request, response):
+        return MetriquesMiddleware.process_template_response(self, request, response)
+
+    def enregistrer(self, request, response, duree, collecteur):
+        match = getattr(request, 'resolver_match', None)
+        vue = nom_vue(match.func, request.method) if match else 'non_resolue'
+        taille = 0 if response.streaming else len(response.content)
+        DUREE.observer(duree, vue, request.method, response.status_code)
+        REQUETES_SQL.observer(collecteur.nombre, vue)
+        DUREE_SQL.observer(collecteur.duree, vue)
+        DUREE_RENDU.observer(request._metriques['rendu'], vue)
+        if not response.streaming:
+            TAILLE.observer(taille, vue)
+
+        if duree * 1000 >= SEUIL_LENT_MS or collecteur.nombre >= SEUIL_REQUETES:
+            self.journaliser(request, vue, response, duree, collecteur)
+
+    @staticmethod
+    def journaliser(request, vue, response, duree, collecteur):
+        repetees = Counter(empreinte(sql) for _, sql in collecteur.requetes)
+        lignes = [
+            f"Requête lente {request.method} {request.get_full_path()} ({vue}) : {response.status_code}, "
+            f"{duree * 1000:.0f} ms, {collecteur.nombre} requêtes SQL en {collecteur.duree * 1000:.0f} ms"
+        ]
+        doublons = [(n, sql) for sql, n in repetees.most_common(REQUETES_CITEES) if n > 1]
+        if doublons:
+            lignes.append("Requêtes répétées :")
+            lignes += [f"  {n} x {sql}" for n, sql in doublons]
+        lignes.append("Requêtes les plus lentes :")
+        lignes += [
+            f"  {d * 1000:.1f} ms {sql}"
+            for d, sql in sorted(collecteur.requetes, key=lambda r: r[0], reverse=True)[:REQUETES_CITEES]
+        ]
+        logger.warning('\n'.join(lignes))
+
+
+def metriques_view(request):
+    """Exposition Prometheus (texte), réservée aux adresses de METRIQUES_IPS"""
+    if IPS_AUTORISEES is not None and request.META.get('REMOTE_ADDR') not in IPS_AUTORISEES:
+        return HttpResponseForbidden()
+    return HttpResponse(exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
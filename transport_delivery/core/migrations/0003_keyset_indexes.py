@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-18 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_facture_factureexpedition_paiement_reclamation_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expedition',
+            index=models.Index(fields=['-date_creation', '-id'], name='expedition_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trackinghistorique',
+            index=models.Index(fields=['-date_heure', '-id'], name='tracking_keyset_idx'),
+        ),
+    ]
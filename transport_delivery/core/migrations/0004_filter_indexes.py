@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-18 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expedition',
+            index=models.Index(fields=['statut', 'date_creation'], name='expedition_statut_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expedition',
+            index=models.Index(fields=['client', 'date_creation'], name='expedition_client_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='facture',
+            index=models.Index(fields=['client', 'statut'], name='facture_client_statut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tournee',
+            index=models.Index(fields=['date', 'statut'], name='tournee_date_statut_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-18 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompteurStatut',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modele', models.CharField(max_length=30)),
+                ('statut', models.CharField(max_length=20)),
+                ('nombre', models.IntegerField(default=0)),
+                ('montant', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('modele', 'statut'), name='compteur_statut_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StatistiqueExpedition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('dimension', models.CharField(choices=[('statut', 'Statut'), ('client', 'Client'), ('destination', 'Destination'), ('service', 'Service')], max_length=20)),
+                ('cle', models.CharField(max_length=30)),
+                ('nombre', models.IntegerField(default=0)),
+                ('montant', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'jour', 'cle'), name='statistique_expedition_unique')],
+            },
+        ),
+    ]
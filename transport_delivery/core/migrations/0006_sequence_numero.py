@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-18 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_statistiques'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SequenceNumero',
+            fields=[
+                ('prefixe', models.CharField(max_length=5, primary_key=True, serialize=False)),
+                ('valeur', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
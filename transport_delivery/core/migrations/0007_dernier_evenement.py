@@ -0,0 +1,46 @@
+# Generated by Django 6.0 on 2026-10-18 11:22
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def remplir_dernier_evenement(apps, schema_editor):
+    Expedition = apps.get_model('core', 'Expedition')
+    TrackingHistorique = apps.get_model('core', 'TrackingHistorique')
+    dernier = TrackingHistorique.objects.filter(expedition=OuterRef('pk')).order_by('-date_heure', '-id')
+    Expedition.objects.update(
+        dernier_lieu=Coalesce(Subquery(dernier.values('lieu')[:1]), Value('')),
+        dernier_statut_suivi=Coalesce(Subquery(dernier.values('statut')[:1]), Value('')),
+        date_dernier_evenement=Subquery(dernier.values('date_heure')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_sequence_numero'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expedition',
+            name='date_dernier_evenement',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='expedition',
+            name='dernier_lieu',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='expedition',
+            name='dernier_statut_suivi',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='trackinghistorique',
+            index=models.Index(fields=['expedition', '-date_heure', '-id'], name='tracking_expedition_date_idx'),
+        ),
+        migrations.RunPython(remplir_dernier_evenement, migrations.RunPython.noop),
+    ]
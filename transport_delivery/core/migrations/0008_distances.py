@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-18 11:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_dernier_evenement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='destination',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='destination',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='DistanceDestination',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance_km', models.FloatField()),
+                ('arrivee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.destination')),
+                ('origine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='distances', to='core.destination')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('origine', 'arrivee'), name='distance_destination_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_distances'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicule',
+            name='capacite_volume',
+            field=models.FloatField(blank=True, help_text='Volume utile en m3 (vide : non limité)', null=True),
+        ),
+    ]
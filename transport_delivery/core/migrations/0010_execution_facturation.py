@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_vehicule_capacite_volume'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExecutionFacturation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('debut', models.DateField()),
+                ('fin', models.DateField()),
+                ('statut', models.CharField(choices=[('EN_COURS', 'En cours'), ('TERMINEE', 'Terminée'), ('ECHEC', 'Échec')], default='EN_COURS', max_length=20)),
+                ('verrou', models.BooleanField(default=False)),
+                ('dernier_client', models.IntegerField(default=0)),
+                ('factures_creees', models.IntegerField(default=0)),
+                ('expeditions_facturees', models.IntegerField(default=0)),
+                ('montant_ttc', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('erreur', models.TextField(blank=True)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_maj', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('debut', 'fin'), name='execution_facturation_periode_unique'), models.UniqueConstraint(condition=models.Q(('verrou', True)), fields=('verrou',), name='execution_facturation_verrou_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 6.0 on 2026-10-18 11:32
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def ouvrir_grand_livre(apps, schema_editor):
+    """Écritures des factures émises et paiements existants, puis soldes recalculés"""
+    Client = apps.get_model('core', 'Client')
+    Facture = apps.get_model('core', 'Facture')
+    Paiement = apps.get_model('core', 'Paiement')
+    EcritureClient = apps.get_model('core', 'EcritureClient')
+
+    ecritures = [
+        EcritureClient(client_id=client_id, facture_id=pk, type_ecriture='FACTURE', debit=montant,
+                       libelle=f"Facture {numero}")
+        for pk, client_id, montant, numero in Facture.objects.filter(statut__in=('EMISE', 'PAYEE'))
+        .values_list('id', 'client_id', 'montant_ttc', 'numero_facture').iterator()
+    ]
+    ecritures += [
+        EcritureClient(client_id=client_id, facture_id=facture_id, paiement_id=pk, type_ecriture='PAIEMENT',
+                       credit=montant, libelle=f"Paiement {mode}")
+        for pk, facture_id, client_id, montant, mode in Paiement.objects
+        .values_list('id', 'facture_id', 'facture__client_id', 'montant', 'mode_paiement').iterator()
+    ]
+    EcritureClient.objects.bulk_create(ecritures, batch_size=1000)
+
+    soldes = dict(
+        EcritureClient.objects.values('client').annotate(solde=Sum('debit') - Sum('credit'))
+        .values_list('client', 'solde')
+    )
+    clients = list(Client.objects.only('id'))
+    for client in clients:
+        client.solde = soldes.get(client.id, Decimal('0'))
+    Client.objects.bulk_update(clients, ['solde'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_execution_facturation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='client',
+            name='solde',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=10),
+        ),
+        migrations.CreateModel(
+            name='EcritureClient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_ecriture', models.CharField(choices=[('FACTURE', 'Facture'), ('PAIEMENT', 'Paiement'), ('ANNULATION', 'Annulation'), ('AJUSTEMENT', 'Ajustement')], max_length=20)),
+                ('debit', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('credit', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('libelle', models.CharField(blank=True, max_length=200)),
+                ('date_ecriture', models.DateTimeField(auto_now_add=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ecritures', to='core.client')),
+                ('facture', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ecritures', to='core.facture')),
+                ('paiement', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ecritures', to='core.paiement')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['client', 'date_ecriture'], name='ecriture_client_date_idx')],
+            },
+        ),
+        migrations.RunPython(ouvrir_grand_livre, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 11:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_grand_livre'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='facture',
+            index=models.Index(fields=['statut', 'date_echeance'], name='facture_statut_echeance_idx'),
+        ),
+    ]
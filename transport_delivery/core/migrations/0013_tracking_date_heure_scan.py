@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 11:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_facture_echeance_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trackinghistorique',
+            name='date_heure',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-18 12:10
+
+from django.db import migrations
+
+
+# Tables FTS5 et triggers (SQLite) ou index GIN (PostgreSQL), décrits dans core/recherche.py
+def creer_index(apps, schema_editor):
+    from core import recherche
+    recherche.installer(schema_editor.connection)
+
+
+def supprimer_index(apps, schema_editor):
+    from core import recherche
+    recherche.supprimer(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_tracking_date_heure_scan'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_index, supprimer_index),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-18 12:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0014_recherche'),
+    ]
+
+    # auth_user appartient à django.contrib.auth : index posé en SQL pour la
+    # recherche par email de login_view
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS auth_user_email_idx ON auth_user (email)',
+            'DROP INDEX IF EXISTS auth_user_email_idx',
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-18 13:08
+
+from django.db import migrations, models
+
+
+def garder_la_derniere_par_fin(apps, schema_editor):
+    """Plusieurs exécutions de même fin (débuts différents) : la plus récente reste"""
+    ExecutionFacturation = apps.get_model('core', 'ExecutionFacturation')
+    vues = set()
+    for execution in ExecutionFacturation.objects.order_by('fin', '-date_maj', '-id'):
+        if execution.fin in vues:
+            execution.delete()
+        vues.add(execution.fin)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_auth_user_email_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(garder_la_derniere_par_fin, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='executionfacturation',
+            name='execution_facturation_periode_unique',
+        ),
+        migrations.RemoveField(
+            model_name='executionfacturation',
+            name='debut',
+        ),
+        migrations.AlterField(
+            model_name='executionfacturation',
+            name='fin',
+            field=models.DateField(unique=True),
+        ),
+    ]
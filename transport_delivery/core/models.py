@@ -1,12 +1,14 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from decimal import Decimal
 
 class Client(models.Model):
     nom = models.CharField(max_length=100)
     adresse = models.TextField()
     telephone = models.CharField(max_length=20)
-    solde = models.DecimalField(max_digits=10, decimal_places=2, default=0.0) # [cite: 36]
+    # Montant dû (factures émises - paiements), tenu à jour par core/comptabilite.py
+    solde = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'), editable=False) # [cite: 36]
 
     def __str__(self):
         return self.nom
@@ -20,12 +22,27 @@ class Vehicule(models.Model):
     matricule = models.CharField(max_length=20, unique=True) # [cite: 38]
     type_vehicule = models.CharField(max_length=50)
     capacite = models.FloatField(help_text="Capacité en kg ou m3")
+    capacite_volume = models.FloatField(null=True, blank=True, help_text="Volume utile en m3 (vide : non limité)")
     
 
 class Destination(models.Model):
     ville = models.CharField(max_length=100)
     pays = models.CharField(max_length=100)
     tarif_base = models.DecimalField(max_digits=10, decimal_places=2) # [cite: 39]
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+
+
+# Distances précalculées entre destinations (routier), utilisées par core/routage.py
+class DistanceDestination(models.Model):
+    origine = models.ForeignKey(Destination, on_delete=models.CASCADE, related_name='distances')
+    arrivee = models.ForeignKey(Destination, on_delete=models.CASCADE, related_name='+')
+    distance_km = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['origine', 'arrivee'], name='distance_destination_unique'),
+        ]
 
 class TypeService(models.Model):
     nom = models.CharField(max_length=50) # Ex: Standard, Express [cite: 40]
@@ -57,23 +74,38 @@ class Expedition(models.Model):
     statut = models.CharField(max_length=20, choices=STATUT_CHOIX, default='EN_TRANSIT')
     date_creation = models.DateTimeField(auto_now_add=True)
 
+    # Dernier événement de suivi, recopié à chaque écriture de TrackingHistorique
+    dernier_lieu = models.CharField(max_length=200, blank=True, editable=False)
+    dernier_statut_suivi = models.CharField(max_length=20, blank=True, editable=False)
+    date_dernier_evenement = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Pagination par curseur sur (date_creation, id)
+            models.Index(fields=['-date_creation', '-id'], name='expedition_keyset_idx'),
+            # Filtres ?statut= / ?client= combinés à une période
+            models.Index(fields=['statut', 'date_creation'], name='expedition_statut_date_idx'),
+            models.Index(fields=['client', 'date_creation'], name='expedition_client_date_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         # Génération automatique du prix selon la formule du PDF [cite: 48]
         # Montant = Tarif Base + (Poids * Tarif Poids) + (Volume * Tarif Volume)
         if not self.montant_total:
-            from decimal import Decimal
-            base = self.destination.tarif_base
-            cout_poids = Decimal(str(self.poids)) * self.service.tarif_poids
-            cout_volume = Decimal(str(self.volume)) * self.service.tarif_volume
-            self.montant_total = base + cout_poids + cout_volume
+            from .tarification import montant
+            self.montant_total = montant(self.destination_id, self.service_id, self.poids, self.volume)
         
         # Générer un ID unique simple si pas encore présent
         if not self.numero_suivi:
-            import uuid
-            self.numero_suivi = str(uuid.uuid4())[:8].upper()
+            self.numero_suivi = self.generer_numero_suivi()
             
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def generer_numero_suivi():
+        from .numerotation import numero
+        return numero('E')
+
 
 # Tournée - Regroupement d'expéditions avec chauffeur et véhicule
 class Tournee(models.Model):
@@ -91,11 +123,16 @@ class Tournee(models.Model):
     statut = models.CharField(max_length=20, choices=STATUT_TOURNEE, default='PLANIFIEE')
     commentaire = models.TextField(blank=True)
     date_creation = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'statut'], name='tournee_date_statut_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.numero_tournee:
-            import uuid
-            self.numero_tournee = f"T-{str(uuid.uuid4())[:6].upper()}"
+            from .numerotation import numero
+            self.numero_tournee = numero('T')
         super().save(*args, **kwargs)
     
     def __str__(self):
@@ -115,13 +152,19 @@ class TourneeExpedition(models.Model):
 # Tracking détaillé des expéditions
 class TrackingHistorique(models.Model):
     expedition = models.ForeignKey(Expedition, on_delete=models.CASCADE, related_name='tracking')
-    date_heure = models.DateTimeField(auto_now_add=True)
+    # Heure du scan, fournie par le terminal ou le hub (import en masse)
+    date_heure = models.DateTimeField(default=timezone.now)
     lieu = models.CharField(max_length=200)
     statut = models.CharField(max_length=20)
     commentaire = models.TextField(blank=True)
     
     class Meta:
         ordering = ['-date_heure']
+        indexes = [
+            models.Index(fields=['-date_heure', '-id'], name='tracking_keyset_idx'),
+            # Historique d'une expédition, du plus récent au plus ancien
+            models.Index(fields=['expedition', '-date_heure', '-id'], name='tracking_expedition_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.expedition.numero_suivi} - {self.lieu} - {self.date_heure}"
@@ -142,16 +185,23 @@ class Facture(models.Model):
     date_echeance = models.DateField()
     
     montant_ht = models.DecimalField(max_digits=10, decimal_places=2, default=0)
-    taux_tva = models.DecimalField(max_digits=4, decimal_places=2, default=19.0)
+    taux_tva = models.DecimalField(max_digits=4, decimal_places=2, default=Decimal('19.00'))
     montant_tva = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     montant_ttc = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     
     statut = models.CharField(max_length=20, choices=STATUT_FACTURE, default='BROUILLON')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['client', 'statut'], name='facture_client_statut_idx'),
+            # Balance âgée : factures émises par échéance
+            models.Index(fields=['statut', 'date_echeance'], name='facture_statut_echeance_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.numero_facture:
-            import uuid
-            self.numero_facture = f"F-{str(uuid.uuid4())[:8].upper()}"
+            from .numerotation import numero
+            self.numero_facture = numero('F')
         
         # Calculer TVA et TTC
         self.montant_tva = self.montant_ht * (self.taux_tva / Decimal('100'))
@@ -248,9 +298,119 @@ class Reclamation(models.Model):
     
     def save(self, *args, **kwargs):
         if not self.numero_reclamation:
-            import uuid
-            self.numero_reclamation = f"R-{str(uuid.uuid4())[:8].upper()}"
+            from .numerotation import numero
+            self.numero_reclamation = numero('R')
         super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.numero_reclamation} - {self.client.nom}"
+
+
+
+# Statistiques agrégées pour le dashboard (maintenues par core/statistiques.py)
+class StatistiqueExpedition(models.Model):
+    DIMENSIONS = [
+        ('statut', 'Statut'),
+        ('client', 'Client'),
+        ('destination', 'Destination'),
+        ('service', 'Service'),
+    ]
+
+    jour = models.DateField()
+    dimension = models.CharField(max_length=20, choices=DIMENSIONS)
+    cle = models.CharField(max_length=30)
+    nombre = models.IntegerField(default=0)
+    montant = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'jour', 'cle'], name='statistique_expedition_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.jour} {self.dimension}={self.cle} : {self.nombre}"
+
+
+class CompteurStatut(models.Model):
+    modele = models.CharField(max_length=30)
+    statut = models.CharField(max_length=20)
+    nombre = models.IntegerField(default=0)
+    montant = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['modele', 'statut'], name='compteur_statut_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.modele} {self.statut} : {self.nombre}"
+
+
+
+# Séquences de numérotation (numéros de suivi, tournées, factures, réclamations)
+class SequenceNumero(models.Model):
+    prefixe = models.CharField(max_length=5, primary_key=True)
+    valeur = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.prefixe} : {self.valeur}"
+
+
+# Exécutions de la facturation par lot (core/facturation.py) : verrou et point de reprise
+class ExecutionFacturation(models.Model):
+    STATUT_EXECUTION = [
+        ('EN_COURS', 'En cours'),
+        ('TERMINEE', 'Terminée'),
+        ('ECHEC', 'Échec'),
+    ]
+
+    # Dernier jour de création facturé (pas de date de début, core/facturation.py)
+    fin = models.DateField(unique=True)
+    statut = models.CharField(max_length=20, choices=STATUT_EXECUTION, default='EN_COURS')
+    # Posé pendant l'exécution ; une seule exécution verrouillée à la fois
+    verrou = models.BooleanField(default=False)
+    # Clients d'id <= dernier_client déjà facturés pour cette exécution
+    dernier_client = models.IntegerField(default=0)
+    factures_creees = models.IntegerField(default=0)
+    expeditions_facturees = models.IntegerField(default=0)
+    montant_ttc = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    erreur = models.TextField(blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_maj = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['verrou'], condition=models.Q(verrou=True),
+                                    name='execution_facturation_verrou_unique'),
+        ]
+
+    def __str__(self):
+        return f"Facturation jusqu'au {self.fin} ({self.statut})"
+
+
+# Grand livre client : une écriture par émission / annulation de facture et
+# par paiement. Client.solde est la somme courante (débit - crédit).
+class EcritureClient(models.Model):
+    TYPE_ECRITURE = [
+        ('FACTURE', 'Facture'),
+        ('PAIEMENT', 'Paiement'),
+        ('ANNULATION', 'Annulation'),
+        ('AJUSTEMENT', 'Ajustement'),
+    ]
+
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='ecritures')
+    facture = models.ForeignKey(Facture, on_delete=models.SET_NULL, null=True, blank=True, related_name='ecritures')
+    paiement = models.ForeignKey(Paiement, on_delete=models.SET_NULL, null=True, blank=True, related_name='ecritures')
+    type_ecriture = models.CharField(max_length=20, choices=TYPE_ECRITURE)
+    debit = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    credit = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    libelle = models.CharField(max_length=200, blank=True)
+    date_ecriture = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['client', 'date_ecriture'], name='ecriture_client_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.client.nom} {self.type_ecriture} +{self.debit} -{self.credit}"
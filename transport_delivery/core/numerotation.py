@@ -0,0 +1,78 @@
+"""
+Attribution des numéros uniques : E-/T-/F-/R- suivis d'une séquence sur 10
+chiffres et d'un chiffre de contrôle (Luhn), ex. E-00000012345.
+
+Chaque préfixe a un compteur en base (SequenceNumero). Un processus réserve
+des blocs de numéros en une seule écriture puis les distribue en mémoire :
+pas de collision entre workers, et des numéros croissants qui gardent les
+index uniques en ajout pur (pas de page splits comme avec des uuid4).
+"""
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import SequenceNumero
+
+TAILLE_BLOC = getattr(settings, 'NUMEROTATION_TAILLE_BLOC', 100)
+CHIFFRES = 10
+
+_blocs = {}
+_verrou = threading.Lock()
+
+
+def chiffre_controle(sequence):
+    """Chiffre de Luhn de la séquence (détecte les fautes de frappe simples)"""
+    total = 0
+    for i, chiffre in enumerate(reversed(f'{sequence:0{CHIFFRES}d}')):
+        n = int(chiffre)
+        if i % 2 == 0:
+            n *= 2
+            if n > 9:
+                n -= 9
+        total += n
+    return (10 - total % 10) % 10
+
+
+def formater(prefixe, sequence):
+    return f'{prefixe}-{sequence:0{CHIFFRES}d}{chiffre_controle(sequence)}'
+
+
+def valider(numero):
+    """True si le numéro a le bon format et un chiffre de contrôle correct"""
+    prefixe, _, chiffres = numero.rpartition('-')
+    if not prefixe or len(chiffres) != CHIFFRES + 1 or not chiffres.isdigit():
+        return False
+    return chiffre_controle(int(chiffres[:-1])) == int(chiffres[-1])
+
+
+def numero(prefixe):
+    return allouer(prefixe, 1)[0]
+
+
+def allouer(prefixe, n):
+    """Alloue n numéros consécutifs pour ce préfixe"""
+    if n <= 0:
+        return []
+    if connection.in_atomic_block:
+        # Une réservation faite dans une transaction peut être annulée avec
+        # elle : on ne garde donc aucun reliquat en mémoire dans ce cas.
+        debut, _ = _reserver(prefixe, n)
+        return [formater(prefixe, s) for s in range(debut, debut + n)]
+
+    with _verrou:
+        debut, fin = _blocs.get(prefixe, (0, 0))
+        if fin - debut < n:
+            debut, fin = _reserver(prefixe, max(n, TAILLE_BLOC))
+        _blocs[prefixe] = (debut + n, fin)
+    return [formater(prefixe, s) for s in range(debut, debut + n)]
+
+
+def _reserver(prefixe, taille):
+    """Réserve [debut, fin) dans le compteur en base"""
+    with transaction.atomic():
+        SequenceNumero.objects.get_or_create(prefixe=prefixe)
+        SequenceNumero.objects.filter(prefixe=prefixe).update(valeur=F('valeur') + taille)
+        fin = SequenceNumero.objects.filter(prefixe=prefixe).values_list('valeur', flat=True).get()
+    return fin - taille + 1, fin + 1
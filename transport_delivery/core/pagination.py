@@ -0,0 +1,174 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pagination par curseur (keyset) sur un ordre composite, par ex. (-date_creation, -id).
+
+    Contrairement à LIMIT/OFFSET, chaque page est une simple recherche dans
+    l'index : le coût ne dépend pas de la profondeur de la page. L'ordre est
+    lu sur l'attribut `ordering` de la vue et doit se terminer par une clé unique.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    ordering = ('-id',)
+    invalid_cursor_message = 'Curseur invalide'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, position, reverse = self._preparer(queryset, request, view)
+        return self._page(list(queryset[:self.page_size + 1]), position, reverse)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Variante async (ORM async) pour les vues ASGI"""
+        queryset, position, reverse = self._preparer(queryset, request, view)
+        return self._page([item async for item in queryset[:self.page_size + 1]], position, reverse)
+
+    def _preparer(self, queryset, request, view):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = tuple(getattr(view, 'ordering', None) or self.ordering)
+        self.base_url = request.build_absolute_uri()
+
+        position, reverse = self.decode_cursor(request, queryset.model)
+        ordering = self._reversed(self.ordering) if reverse else self.ordering
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+        return queryset, position, reverse
+
+    def _page(self, results, position, reverse):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        # En marche arrière, "has_more" concerne les pages précédentes
+        if reverse:
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = position is not None, has_more
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self._position(self.page[0]), reverse=True)
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, model=None):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+            position, reverse = payload['p'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        if model is not None:
+            position = self._convertir(model, position)
+        return position, reverse
+
+    def _convertir(self, model, position):
+        """Valeurs du curseur converties par les champs de l'ordre ; NotFound si l'une est invalide"""
+        valeurs = []
+        for field, value in zip(self.ordering, position):
+            # Curseur forgé : pas de None, de liste ni de dict dans un filtre
+            if value is None or isinstance(value, bool) or not isinstance(value, (int, float, str)):
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                champ = model._meta.get_field(field.lstrip('-'))
+            except FieldDoesNotExist:
+                valeurs.append(value)
+                continue
+            if champ.is_relation:
+                champ = champ.target_field
+            try:
+                value = champ.to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            valeurs.append(value)
+        return valeurs
+
+    def _position(self, item):
+        position = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            value = item[name] if isinstance(item, dict) else getattr(item, name)
+            if hasattr(value, 'pk'):
+                value = value.pk
+            elif hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            elif value is not None and not isinstance(value, (int, float, str)):
+                value = str(value)
+            position.append(value)
+        return position
+
+    @staticmethod
+    def _reversed(ordering):
+        return tuple(f[1:] if f.startswith('-') else '-' + f for f in ordering)
+
+    @staticmethod
+    def _after(ordering, position):
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y), en respectant le sens de chaque clé
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
@@ -0,0 +1,49 @@
+import codecs
+import csv
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+def _lignes(stream, parser_context):
+    """Décode le corps de la requête ligne par ligne, sans le charger en entier"""
+    parser_context = parser_context or {}
+    encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for ligne in stream:
+        yield decoder.decode(ligne)
+    reste = decoder.decode(b'', final=True)
+    if reste:
+        yield reste
+
+
+class NDJSONParser(BaseParser):
+    """
+    Un objet JSON par ligne. Renvoie un itérateur : les lignes sont lues au
+    fur et à mesure. Une ligne mal formée produit une ParseError à sa place,
+    pour que l'appelant puisse la signaler sans interrompre le lot.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        for texte in _lignes(stream, parser_context):
+            texte = texte.strip()
+            if not texte:
+                continue
+            try:
+                yield json.loads(texte)
+            except ValueError as exc:
+                yield ParseError(f'JSON invalide : {exc}')
+
+
+class CSVParser(BaseParser):
+    """CSV avec ligne d'en-tête ; renvoie un itérateur de dicts"""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        lecteur = csv.DictReader(_lignes(stream, parser_context))
+        for ligne in lecteur:
+            # Les cellules vides valent "non renseigné"
+            yield {cle: valeur for cle, valeur in ligne.items() if cle and valeur not in ('', None)}
@@ -0,0 +1,191 @@
+"""
+Planification automatique des tournées d'une journée.
+
+Les expéditions en attente (pas encore livrées ni placées sur une tournée
+active) sont réparties entre les véhicules libres ce jour-là, chacun associé à
+un chauffeur disponible :
+
+1. first-fit decreasing : les colis, du plus encombrant au plus petit, vont
+   dans le premier véhicule où ils tiennent, en préférant un véhicule dont la
+   destination de référence (ancre) est proche de la leur ;
+2. recherche locale : les colis d'une même destination sont déplacés vers la
+   tournée dont l'ancre est plus proche, tant que la capacité le permet ;
+3. les tournées et leurs arrêts sont créés en bulk, arrêts ordonnés par
+   core/routage.py.
+
+Deux planifications simultanées (action de l'API, commande) prennent d'abord
+le verrou des véhicules : la seconde attend le commit de la première et voit
+ses tournées. SQLite sérialise déjà les transactions (mode IMMEDIATE).
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from . import numerotation, routage
+from .models import Chauffeur, Expedition, Tournee, TourneeExpedition, Vehicule
+
+# Au-delà de cette distance de l'ancre, on préfère ouvrir un nouveau véhicule
+RAYON_KM = getattr(settings, 'PLANIFICATION_RAYON_KM', 50.0)
+STATUTS_A_PLANIFIER = ('EN_TRANSIT', 'CENTRE_TRI')
+PASSES_MAX = 20
+EPSILON = 1e-9
+
+
+def repartir(poids, volumes, destinations, capacites, capacites_volume, matrice, rayon=RAYON_KM):
+    """
+    Affecte chaque colis à un véhicule.
+
+    `destinations` indexe `matrice` ; un volume utile à inf n'est pas limité.
+    Retourne un tableau donnant pour chaque colis l'indice du véhicule, ou -1
+    s'il ne tient nulle part.
+    """
+    poids = np.asarray(poids, dtype=float)
+    volumes = np.asarray(volumes, dtype=float)
+    destinations = np.asarray(destinations, dtype=int)
+    reste_poids = np.array(capacites, dtype=float)
+    reste_volume = np.array(capacites_volume, dtype=float)
+    n, m = len(poids), len(reste_poids)
+    affectation = np.full(n, -1)
+    ancres = np.full(m, -1)
+    if not n or not m:
+        return affectation
+
+    # Encombrement relatif : part du plus grand véhicule occupée par le colis
+    encombrement = poids / max(reste_poids.max(), EPSILON)
+    volume_max = reste_volume[np.isfinite(reste_volume)]
+    if volume_max.size:
+        encombrement = np.maximum(encombrement, volumes / max(volume_max.max(), EPSILON))
+
+    for i in np.argsort(-encombrement, kind='stable'):
+        tient = (reste_poids >= poids[i]) & (reste_volume >= volumes[i])
+        if not tient.any():
+            continue
+        cout = np.where(ancres >= 0, matrice[destinations[i]][ancres], rayon)
+        b = int(np.argmin(np.where(tient, cout, np.inf)))  # à égalité : le premier
+        if ancres[b] < 0:
+            ancres[b] = destinations[i]
+        affectation[i] = b
+        reste_poids[b] -= poids[i]
+        reste_volume[b] -= volumes[i]
+
+    _regrouper(affectation, poids, volumes, destinations, reste_poids, reste_volume, ancres, matrice)
+    return affectation
+
+
+def _regrouper(affectation, poids, volumes, destinations, reste_poids, reste_volume, ancres, matrice):
+    """Déplace des groupes (véhicule, destination) vers une ancre plus proche"""
+    groupes = {}
+    for i in np.flatnonzero(affectation >= 0):
+        groupes.setdefault((int(affectation[i]), int(destinations[i])), []).append(i)
+    presents = np.zeros((len(ancres), len(matrice)), dtype=int)
+    for (b, d), colis in groupes.items():
+        presents[b, d] = len(colis)
+    ouverts = ancres >= 0
+
+    for _ in range(PASSES_MAX):
+        ameliore = False
+        for (a, d) in list(groupes):
+            colis = groupes.get((a, d))
+            if not colis or d == ancres[a]:
+                continue
+            p, v = poids[colis].sum(), volumes[colis].sum()
+            cout = np.where(presents[:, d] > 0, 0.0, matrice[d][ancres])
+            cout = np.where(ouverts & (reste_poids >= p) & (reste_volume >= v), cout, np.inf)
+            cout[a] = np.inf
+            b = int(np.argmin(cout))
+            if cout[b] >= matrice[d, ancres[a]] - EPSILON:
+                continue
+            affectation[colis] = b
+            reste_poids[a] += p
+            reste_volume[a] += v
+            reste_poids[b] -= p
+            reste_volume[b] -= v
+            presents[a, d], presents[b, d] = 0, presents[b, d] + len(colis)
+            groupes.setdefault((b, d), []).extend(groupes.pop((a, d)))
+            ameliore = True
+        if not ameliore:
+            break
+
+
+def planifier(jour):
+    """
+    Crée les tournées de `jour` pour les expéditions en attente.
+
+    Retourne {'date', 'tournees': [...], 'affectees': n, 'non_affectees': [ids]}
+    """
+    with transaction.atomic():
+        # Requête à part et avant toute lecture : après l'attente, les suivantes voient les tournées créées
+        list(Vehicule.objects.select_for_update().filter(capacite__gt=0).order_by('id').values_list('id'))
+        occupees = Tournee.objects.filter(date=jour).exclude(statut='ANNULEE')
+        vehicules = list(
+            Vehicule.objects.filter(capacite__gt=0)
+            .exclude(id__in=occupees.filter(vehicule__isnull=False).values('vehicule'))
+            .order_by('-capacite', 'id')
+            .values_list('id', 'capacite', 'capacite_volume')
+        )
+        chauffeurs = list(
+            Chauffeur.objects.filter(disponible=True)
+            .exclude(id__in=occupees.filter(chauffeur__isnull=False).values('chauffeur'))
+            .order_by('id').values_list('id', flat=True)
+        )
+        vehicules = vehicules[:len(chauffeurs)]
+        colis = list(
+            Expedition.objects.select_for_update()
+            .filter(statut__in=STATUTS_A_PLANIFIER, date_creation__date__lte=jour)
+            .exclude(id__in=TourneeExpedition.objects.exclude(tournee__statut='ANNULEE').values('expedition'))
+            .order_by('id')
+            .values_list('id', 'poids', 'volume', 'destination_id')
+        )
+        resultat = {'date': jour, 'tournees': [], 'affectees': 0, 'non_affectees': []}
+        if not colis:
+            return resultat
+
+        ids, poids, volumes, destination_ids = (np.array(colonne) for colonne in zip(*colis))
+        liste_destinations = sorted(set(destination_ids.tolist()))
+        index = {pk: i for i, pk in enumerate(liste_destinations)}
+        destinations = np.array([index[pk] for pk in destination_ids.tolist()], dtype=int)
+        matrice = routage.matrice_distances(liste_destinations)
+
+        affectation = repartir(
+            poids.astype(float), volumes.astype(float), destinations,
+            [capacite for _, capacite, _ in vehicules],
+            [np.inf if volume is None else volume for _, _, volume in vehicules],
+            matrice,
+        )
+        utilises = [b for b in range(len(vehicules)) if (affectation == b).any()]
+        numeros = numerotation.allouer('T', len(utilises))
+        tournees = Tournee.objects.bulk_create([
+            Tournee(numero_tournee=numero, date=jour, chauffeur_id=chauffeurs[b],
+                    vehicule_id=vehicules[b][0], commentaire="Planification automatique")
+            for b, numero in zip(utilises, numeros)
+        ])
+
+        liens = []
+        for b, tournee in zip(utilises, tournees):
+            membres = np.flatnonzero(affectation == b)
+            rangs = _rangs_destinations(destinations[membres], matrice)
+            membres = sorted(membres, key=lambda i: (rangs[destinations[i]], ids[i]))
+            liens += [
+                TourneeExpedition(tournee=tournee, expedition_id=int(ids[i]), ordre=ordre)
+                for ordre, i in enumerate(membres)
+            ]
+            resultat['tournees'].append({
+                'id': tournee.id, 'numero_tournee': tournee.numero_tournee,
+                'vehicule': tournee.vehicule_id, 'chauffeur': tournee.chauffeur_id,
+                'expeditions': len(membres),
+                'poids': round(float(poids[membres].sum()), 3),
+                'volume': round(float(volumes[membres].sum()), 3),
+            })
+        TourneeExpedition.objects.bulk_create(liens, batch_size=1000)
+
+    resultat['affectees'] = len(liens)
+    resultat['non_affectees'] = ids[affectation < 0].tolist()
+    return resultat
+
+
+def _rangs_destinations(destinations, matrice):
+    """Ordre de passage des destinations d'une tournée, en partant de la plus chargée"""
+    depart = int(np.bincount(destinations).argmax())
+    distinctes = [depart] + sorted(set(destinations.tolist()) - {depart})
+    ordre = routage.optimiser(matrice[np.ix_(distinctes, distinctes)])
+    return {distinctes[position]: rang for rang, position in enumerate(ordre)}
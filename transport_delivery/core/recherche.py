@@ -0,0 +1,261 @@
+"""
+Recherche plein texte : clients (nom, téléphone), expéditions (numéro de
+suivi, description), destinations (ville).
+
+SQLite : une table FTS5 « external content » par modèle (core_<modèle>_fts),
+qui n'indexe que les colonnes d'INDEX et se remplit par triggers : les
+bulk_create et update() des imports et des transitions sont indexés comme
+les save(), et un changement de statut ne touche pas l'index. Les préfixes
+de 1 à 8 caractères ont leur propre index, une frappe d'autocomplétion ne
+fusionne donc pas les listes de tous les mots qui commencent pareil.
+PostgreSQL : index GIN sur to_tsvector('simple', ...), la condition de
+recherche reprend exactement l'expression indexée.
+
+Chaque mot saisi est un préfixe (« colis frag » -> colis* ET frag*). Un
+numéro de suivi, même partiel (« E-0000012 », « 0000012 »), est cherché dans
+l'index unique de numero_suivi : découpé en mots, « e » et « 0000012 »
+préfixeraient presque tout. Les anciens numéros (8 caractères hexadécimaux
+en majuscules, « 8540CA7A ») y sont cherchés tels quels, par préfixe.
+
+?q= sur les listes filtre sans changer leur ordre (pagination par curseur).
+GET /api/search/?q= classe les CANDIDATS correspondances les plus récentes
+(mot entier avant préfixe, premier champ avant les suivants, texte court,
+puis récent) : bm25 compterait d'abord toutes les correspondances de chaque
+mot, soit des dizaines de millisecondes pour « colis » sur 1M expéditions.
+"""
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Client, Destination, Expedition
+
+INDEX = {
+    Client: ('nom', 'telephone'),
+    Expedition: ('description',),
+    Destination: ('ville',),
+}
+
+# Colonne du numéro et sa lettre (core/numerotation.py)
+NUMEROS = {Expedition: ('numero_suivi', 'E')}
+NUMERO = re.compile(r'(?:([A-Z])-)?(\d*)')
+# Numéros d'avant core/numerotation.py : uuid4()[:8].upper(), au moins un chiffre
+# pour ne pas prendre « cafe » ou « bac » pour un numéro
+ANCIEN = re.compile(r'(?=.*\d)[0-9A-F]{1,8}')
+
+# Types de l'autocomplétion : modèle et colonnes renvoyées
+TYPES = {
+    'clients': (Client, ('id', 'nom', 'telephone')),
+    'expeditions': (Expedition, ('id', 'numero_suivi', 'description', 'statut')),
+    'destinations': (Destination, ('id', 'ville', 'pays')),
+}
+
+LIMITE = 20
+LIMITE_MAX = 50
+MOTS_MAX = 8
+CANDIDATS = getattr(settings, 'RECHERCHE_CANDIDATS', 200)
+
+# Mêmes séparateurs que le tokenizer unicode61 : tout sauf lettres et chiffres
+MOT = re.compile(r'[^\W_]+')
+
+
+def mots(texte):
+    return MOT.findall(str(texte).lower())[:MOTS_MAX]
+
+
+def _normaliser(texte):
+    """Minuscules sans accents, comme remove_diacritics"""
+    decompose = unicodedata.normalize('NFKD', str(texte or '').lower())
+    return ''.join(c for c in decompose if not unicodedata.combining(c))
+
+
+def _table(model):
+    return f'{model._meta.db_table}_fts'
+
+
+def _prefixe(champ, debut):
+    # Bornes [E-0000012, E-0000013[ : parcours de l'index, sans LIKE
+    return Q(**{f'{champ}__gte': debut, f'{champ}__lt': debut[:-1] + chr(ord(debut[-1]) + 1)})
+
+
+def _numero(model, texte):
+    """Condition sur le numéro si `texte` en est un début pour ce modèle, sinon None"""
+    if model not in NUMEROS:
+        return None
+    champ, lettre = NUMEROS[model]
+    texte = str(texte).strip().upper()
+    condition = Q()
+    trouve = NUMERO.fullmatch(texte)
+    if trouve and trouve.group(1) in (None, lettre) and (trouve.group(1) or trouve.group(2)):
+        condition |= _prefixe(champ, f'{lettre}-{trouve.group(2)}')
+    # « 8540 » peut aussi bien commencer un ancien numéro
+    if ANCIEN.fullmatch(texte):
+        condition |= _prefixe(champ, texte)
+    return condition or None
+
+
+def _vecteur(model, qualifier=True):
+    """Expression tsvector indexée sous PostgreSQL"""
+    prefixe = f'"{model._meta.db_table}".' if qualifier else ''
+    colonnes = " || ' ' || ".join(f"coalesce({prefixe}\"{colonne}\", '')" for colonne in INDEX[model])
+    return f"to_tsvector('simple', {colonnes})"
+
+
+def _requete(termes, vendor):
+    if vendor == 'postgresql':
+        return ' & '.join(f'{terme}:*' for terme in termes)
+    # Entre guillemets : AND, OR, NOT... restent des mots
+    return ' '.join(f'"{terme}"*' for terme in termes)
+
+
+def filtrer(queryset, texte):
+    """Lignes de `queryset` dont l'index contient tous les mots de `texte` (préfixes)"""
+    model = queryset.model
+    numero = _numero(model, texte)
+    if numero is not None:
+        return queryset.filter(numero)
+    termes = mots(texte)
+    if not termes:
+        return queryset.none()
+    vendor = connections[queryset.db].vendor
+    requete = _requete(termes, vendor)
+    if vendor == 'postgresql':
+        return queryset.filter(RawSQL(
+            f"{_vecteur(model)} @@ to_tsquery('simple', %s)", [requete], output_field=BooleanField(),
+        ))
+    table = _table(model)
+    return queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [requete]))
+
+
+def _candidats(model, termes, connexion):
+    """ids des CANDIDATS correspondances les plus récentes"""
+    requete = _requete(termes, connexion.vendor)
+    if connexion.vendor == 'postgresql':
+        sql = (f"SELECT id FROM {model._meta.db_table} WHERE {_vecteur(model)} @@ to_tsquery('simple', %s) "
+               f"ORDER BY id DESC LIMIT %s")
+    else:
+        table = _table(model)
+        sql = f'SELECT rowid FROM {table} WHERE {table} MATCH %s ORDER BY rowid DESC LIMIT %s'
+    with connexion.cursor() as curseur:
+        curseur.execute(sql, [requete, CANDIDATS])
+        return [ligne[0] for ligne in curseur.fetchall()]
+
+
+def _pertinence(termes, valeurs):
+    """Par mot saisi : 2 s'il est un mot entier du texte, 1 s'il en préfixe un ; premier champ compté double"""
+    score = 0
+    for terme in termes:
+        meilleur = 0
+        for rang, valeur in enumerate(valeurs):
+            poids = 2 if rang == 0 else 1
+            for mot in MOT.findall(_normaliser(valeur)):
+                if mot == terme:
+                    meilleur = max(meilleur, 2 * poids)
+                elif mot.startswith(terme):
+                    meilleur = max(meilleur, poids)
+        score += meilleur
+    return score
+
+
+def classer(model, texte, limite=LIMITE, using='default'):
+    """ids des `limite` meilleures correspondances, la plus pertinente d'abord"""
+    numero = _numero(model, texte)
+    if numero is not None:
+        # Numéros les plus récents d'abord
+        return list(model.objects.using(using).filter(numero).order_by(f'-{NUMEROS[model][0]}')
+                    .values_list('pk', flat=True)[:limite])
+    termes = mots(texte)
+    if not termes:
+        return []
+    ids = _candidats(model, termes, connections[using])
+    lignes = model.objects.using(using).filter(pk__in=ids).values_list('pk', *INDEX[model])
+    normalises = [_normaliser(terme) for terme in termes]
+    lignes = sorted(lignes, key=lambda ligne: (
+        -_pertinence(normalises, ligne[1:]), sum(len(valeur or '') for valeur in ligne[1:]), -ligne[0],
+    ))
+    return [ligne[0] for ligne in lignes[:limite]]
+
+
+def suggestions(texte, types=tuple(TYPES), limite=LIMITE):
+    """{type: [lignes]} par pertinence décroissante"""
+    resultats = {}
+    for nom in types:
+        model, champs = TYPES[nom]
+        ids = classer(model, texte, limite)
+        lignes = {ligne['id']: ligne for ligne in model.objects.filter(pk__in=ids).values(*champs)}
+        resultats[nom] = [lignes[pk] for pk in ids if pk in lignes]
+    return resultats
+
+
+# Index : migration 0014, puis post_migrate (core/apps.py)
+
+def _ddl_sqlite(model):
+    table, fts, colonnes = model._meta.db_table, _table(model), INDEX[model]
+    liste = ', '.join(colonnes)
+    nouvelles = ', '.join(f'new.{colonne}' for colonne in colonnes)
+    anciennes = ', '.join(f'old.{colonne}' for colonne in colonnes)
+    change = ' OR '.join(f'old.{colonne} IS NOT new.{colonne}' for colonne in colonnes)
+    inserer = f'INSERT INTO {fts}(rowid, {liste}) VALUES (new.id, {nouvelles});'
+    retirer = f"INSERT INTO {fts}({fts}, rowid, {liste}) VALUES ('delete', old.id, {anciennes});"
+    return {
+        fts: (
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({liste}, content='{table}', "
+            f"content_rowid='id', prefix='1 2 3 4 5 6 7 8', tokenize='unicode61 remove_diacritics 2')"
+        ),
+        f'{fts}_ai': f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {inserer} END',
+        f'{fts}_ad': f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {retirer} END',
+        f'{fts}_au': (
+            f'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {liste} ON {table} '
+            f'WHEN {change} BEGIN {retirer} {inserer} END'
+        ),
+    }
+
+
+def installer(connexion):
+    """Crée les index de recherche absents et indexe les lignes existantes"""
+    with connexion.cursor() as curseur:
+        for model in INDEX:
+            if connexion.vendor == 'postgresql':
+                curseur.execute(
+                    f'CREATE INDEX IF NOT EXISTS {_table(model)} ON {model._meta.db_table} '
+                    f'USING GIN (({_vecteur(model, qualifier=False)}))'
+                )
+            elif connexion.vendor == 'sqlite':
+                for sql in _ddl_sqlite(model).values():
+                    curseur.execute(sql)
+                curseur.execute(f"INSERT INTO {_table(model)}({_table(model)}) VALUES ('rebuild')")
+
+
+def supprimer(connexion):
+    with connexion.cursor() as curseur:
+        for model in INDEX:
+            if connexion.vendor == 'postgresql':
+                curseur.execute(f'DROP INDEX IF EXISTS {_table(model)}')
+            elif connexion.vendor == 'sqlite':
+                for nom in reversed(list(_ddl_sqlite(model))):
+                    genre = 'TABLE' if nom == _table(model) else 'TRIGGER'
+                    curseur.execute(f'DROP {genre} IF EXISTS {nom}')
+
+
+def reinstaller(sender, using='default', **kwargs):
+    """
+    post_migrate : sous SQLite, une migration qui reconstruit une table
+    (ALTER TABLE émulé) supprime ses triggers. On les recrée et on réindexe.
+    """
+    connexion = connections[using]
+    if connexion.vendor != 'sqlite':
+        return
+    with connexion.cursor() as curseur:
+        curseur.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existants = {ligne[0] for ligne in curseur.fetchall()}
+        for model in INDEX:
+            ddl = _ddl_sqlite(model)
+            # Index pas encore créé (ou migration 0014 annulée) : rien à réparer
+            if _table(model) not in existants or set(ddl) <= existants:
+                continue
+            for sql in ddl.values():
+                curseur.execute(sql)
+            curseur.execute(f"INSERT INTO {_table(model)}({_table(model)}) VALUES ('rebuild')")
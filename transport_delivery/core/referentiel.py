@@ -0,0 +1,127 @@
+"""
+Cache HTTP des données de référence (destinations, services, véhicules,
+chauffeurs), qui changent rarement mais sont relues à chaque formulaire.
+
+Chaque table a un numéro de version dans le cache : l'horodatage (ms) de sa
+dernière modification, relevé par les signaux post_save / post_delete. Les
+réponses list/retrieve sont mises en cache sous une clé qui contient cette
+version : modifier une ligne rend toutes les anciennes entrées inaccessibles,
+sans avoir à les énumérer.
+
+La version sert aussi d'ETag et de Last-Modified : un client qui renvoie
+If-None-Match / If-Modified-Since reçoit un 304 sans requête SQL ni
+sérialisation.
+
+Le cache utilisé est REFERENTIEL_CACHE (alias de CACHES, 'default' par
+défaut). Avec LocMemCache chaque processus a ses propres versions : en
+déploiement multi-processus, configurer un cache partagé (Redis).
+
+Sous ASGI, list/retrieve sont asynchrones (adrf) : une réponse en cache ou
+un 304 ne mobilise aucun thread. Seul le calcul d'une nouvelle version passe
+par la vue DRF synchrone, dans un thread.
+"""
+import hashlib
+import time
+
+from adrf.viewsets import GenericViewSet
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework import mixins, status
+from rest_framework.response import Response
+
+ALIAS = getattr(settings, 'REFERENTIEL_CACHE', 'default')
+DUREE_CACHE = getattr(settings, 'REFERENTIEL_CACHE_TIMEOUT', 3600)
+
+
+def _cache():
+    return caches[ALIAS]
+
+
+def cle_version(model):
+    return f'ref:version:{model._meta.label_lower}'
+
+
+def version(model):
+    """Version courante de la table (créée à la première lecture)"""
+    cle = cle_version(model)
+    valeur = _cache().get(cle)
+    if valeur is None:
+        valeur = int(time.time() * 1000)
+        if not _cache().add(cle, valeur, None):
+            valeur = _cache().get(cle, valeur)
+    return valeur
+
+
+async def aversion(model):
+    """version(), sans bloquer la boucle d'événements"""
+    cle = cle_version(model)
+    valeur = await _cache().aget(cle)
+    if valeur is None:
+        valeur = int(time.time() * 1000)
+        if not await _cache().aadd(cle, valeur, None):
+            valeur = await _cache().aget(cle, valeur)
+    return valeur
+
+
+def invalider(model):
+    """Nouvelle version pour la table, maintenant et à la validation de la transaction"""
+    def incrementer():
+        cle = cle_version(model)
+        _cache().set(cle, max(int(time.time() * 1000), (_cache().get(cle) or 0) + 1), None)
+    incrementer()
+    # Une lecture concurrente avant le commit a pu remettre l'ancien état en cache
+    transaction.on_commit(incrementer)
+
+
+class ReferentielCacheMixin:
+    """ViewSet dont list/retrieve sont servis depuis le cache, avec ETag et Last-Modified"""
+
+    async def list(self, request, *args, **kwargs):
+        return await self._reponse_en_cache(request, super().list, *args, **kwargs)
+
+    async def retrieve(self, request, *args, **kwargs):
+        return await self._reponse_en_cache(request, super().retrieve, *args, **kwargs)
+
+    async def _reponse_en_cache(self, request, calculer, *args, **kwargs):
+        model = self.get_queryset().model
+        courante = await aversion(model)
+        requete = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        etag = quote_etag(f'{model._meta.model_name}-{courante}-{requete[:12]}')
+        derniere_modif = courante // 1000
+
+        if self._non_modifie(request, etag, derniere_modif):
+            reponse = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            cle = f'ref:{model._meta.label_lower}:{courante}:{requete}'
+            donnees = await _cache().aget(cle)
+            if donnees is None:
+                # Vue DRF synchrone (sérialiseurs, pagination), une fois par version
+                reponse = await sync_to_async(calculer)(request, *args, **kwargs)
+                if reponse.status_code != status.HTTP_200_OK:
+                    return reponse
+                await _cache().aset(cle, reponse.data, DUREE_CACHE)
+            else:
+                reponse = Response(donnees)
+        reponse['ETag'] = etag
+        reponse['Last-Modified'] = http_date(derniere_modif)
+        # Le navigateur garde la réponse mais revalide à chaque fois (304 si inchangée)
+        reponse['Cache-Control'] = 'private, no-cache'
+        return reponse
+
+    @staticmethod
+    def _non_modifie(request, etag, derniere_modif):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            etags = {e.strip().removeprefix('W/') for e in if_none_match.split(',')}
+            return etag in etags or '*' in etags
+        depuis = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        return depuis is not None and derniere_modif <= depuis
+
+
+class ReferentielViewSet(ReferentielCacheMixin, mixins.CreateModelMixin, mixins.ListModelMixin,
+                         mixins.RetrieveModelMixin, mixins.UpdateModelMixin, mixins.DestroyModelMixin,
+                         GenericViewSet):
+    """ModelViewSet de référence : lectures asynchrones en cache, écritures synchrones"""
@@ -0,0 +1,64 @@
+"""
+Regroupement des requêtes identiques simultanées (« single flight »).
+
+N chargements simultanés du dashboard exécutent les agrégats une fois :
+la première requête calcule, les suivantes, même URL et mêmes paramètres,
+attendent son résultat. Rien n'est gardé après la réponse, ce n'est pas
+un cache.
+
+Le résultat est partagé par un concurrent.futures.Future : sous WSGI,
+adrf exécute chaque vue asynchrone dans sa propre boucle d'événements.
+Le calcul tourne dans une tâche détachée de la requête qui l'a lancé :
+si ce client se déconnecte, les autres reçoivent quand même le résultat.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future
+
+from rest_framework.response import Response
+
+# {clé: Future du calcul en cours}
+_en_cours = {}
+_verrou = threading.Lock()
+# Références fortes des calculs en cours (la boucle ne garde que des références faibles)
+_taches = set()
+
+
+def _publier(cle, futur, tache):
+    """Résultat de la tâche vers le Future partagé ; jamais CancelledError"""
+    _taches.discard(tache)
+    with _verrou:
+        del _en_cours[cle]
+    if tache.cancelled():
+        futur.set_exception(RuntimeError(f"calcul de {cle} interrompu"))
+    elif tache.exception() is not None:
+        futur.set_exception(tache.exception())
+    else:
+        futur.set_result(tache.result())
+
+
+async def partager(cle, calcul):
+    """Résultat de `await calcul()`, calculé une fois pour les appels simultanés de même clé"""
+    with _verrou:
+        futur = _en_cours.get(cle)
+        if futur is None:
+            futur = _en_cours[cle] = Future()
+            tache = asyncio.ensure_future(calcul())
+            _taches.add(tache)
+            tache.add_done_callback(functools.partial(_publier, cle, futur))
+    # shield : une requête abandonnée n'annule pas le calcul des autres
+    return await asyncio.shield(asyncio.wrap_future(futur))
+
+
+def regrouper(methode):
+    """Action asynchrone de viewset regroupée par URL complète (chemin et paramètres)"""
+    @functools.wraps(methode)
+    async def enveloppe(self, request, *args, **kwargs):
+        async def calcul():
+            reponse = await methode(self, request, *args, **kwargs)
+            return reponse.data, reponse.status_code
+
+        donnees, code = await partager(request.get_full_path(), calcul)
+        return Response(donnees, status=code)
+    return enveloppe
@@ -0,0 +1,39 @@
+import csv
+import io
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+
+class CSVRenderer(BaseRenderer):
+    """?format=csv ; les exports sont diffusés par core/exports.py, ce rendu ne sert qu'aux erreurs"""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        lignes = data if isinstance(data, list) else [data]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for ligne in lignes:
+            if isinstance(ligne, dict):
+                writer.writerow([f'{cle}: {valeur}' for cle, valeur in ligne.items()])
+            else:
+                writer.writerow([ligne])
+        return buffer.getvalue().encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """?format=ndjson : un objet JSON par ligne"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        lignes = data if isinstance(data, list) else [data]
+        return ''.join(json.dumps(ligne, cls=DjangoJSONEncoder) + '\n' for ligne in lignes).encode(self.charset)
@@ -0,0 +1,201 @@
+"""
+Ordonnancement des arrêts d'une tournée.
+
+Plus proche voisin pour la solution initiale, puis amélioration locale par
+2-opt (inversion d'un segment) et Or-opt (déplacement d'un segment de 1 à 3
+arrêts). Chaque passe évalue tous les mouvements d'un coup avec NumPy et
+applique le meilleur. Le premier arrêt reste en tête (point de départ choisi
+par le dispatcher) et le trajet est ouvert : pas de retour au départ.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import DistanceDestination, Destination, TourneeExpedition
+
+# Distance retenue quand ni la table ni les coordonnées ne la donnent
+DISTANCE_INCONNUE = getattr(settings, 'ROUTAGE_DISTANCE_INCONNUE_KM', 1000.0)
+RAYON_TERRE_KM = 6371.0
+EPSILON = 1e-9
+
+
+def haversine(latitudes, longitudes):
+    """Matrice des distances à vol d'oiseau (km) entre des points"""
+    lat = np.radians(latitudes)[:, None]
+    lon = np.radians(longitudes)[:, None]
+    dlat = lat - lat.T
+    dlon = lon - lon.T
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin(dlon / 2) ** 2
+    return 2 * RAYON_TERRE_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def matrice_distances(destination_ids):
+    """
+    Matrice des distances entre destinations (dans l'ordre de `destination_ids`).
+
+    Priorité à DistanceDestination (dans un sens ou dans l'autre), puis
+    haversine si les deux destinations ont des coordonnées.
+    """
+    ids = list(destination_ids)
+    index = {pk: i for i, pk in enumerate(ids)}
+    n = len(ids)
+    matrice = np.full((n, n), np.nan)
+
+    coords = Destination.objects.filter(pk__in=ids).values_list('pk', 'latitude', 'longitude')
+    latitudes = np.full(n, np.nan)
+    longitudes = np.full(n, np.nan)
+    for pk, latitude, longitude in coords:
+        if latitude is not None and longitude is not None:
+            latitudes[index[pk]] = latitude
+            longitudes[index[pk]] = longitude
+    connues = ~np.isnan(latitudes)
+    if connues.any():
+        sous = np.ix_(connues, connues)
+        matrice[sous] = haversine(latitudes[connues], longitudes[connues])
+
+    distances = DistanceDestination.objects.filter(
+        origine__in=ids, arrivee__in=ids
+    ).values_list('origine', 'arrivee', 'distance_km')
+    table = np.full((n, n), np.nan)
+    for origine, arrivee, distance in distances:
+        table[index[origine], index[arrivee]] = distance
+    table = np.where(np.isnan(table), table.T, table)
+    matrice = np.where(np.isnan(table), matrice, table)
+
+    matrice[np.isnan(matrice)] = DISTANCE_INCONNUE
+    np.fill_diagonal(matrice, 0.0)
+    return matrice
+
+
+def longueur(matrice, ordre):
+    ordre = np.asarray(ordre)
+    return float(matrice[ordre[:-1], ordre[1:]].sum()) if len(ordre) > 1 else 0.0
+
+
+def plus_proche_voisin(matrice, depart=0):
+    n = len(matrice)
+    visite = np.zeros(n, dtype=bool)
+    ordre = [depart]
+    visite[depart] = True
+    for _ in range(n - 1):
+        distances = np.where(visite, np.inf, matrice[ordre[-1]])
+        suivant = int(np.argmin(distances))
+        ordre.append(suivant)
+        visite[suivant] = True
+    return np.array(ordre)
+
+
+def _avec_fin(matrice):
+    """Ajoute un nœud fictif « fin de trajet » à distance nulle de tous les autres"""
+    n = len(matrice)
+    etendue = np.zeros((n + 1, n + 1))
+    etendue[:n, :n] = matrice
+    return etendue
+
+
+def meilleur_deux_opt(d, ordre):
+    """Meilleur 2-opt : (gain, i, j) pour l'inversion de ordre[i:j+1], avec i >= 1"""
+    n = len(ordre)
+    suite = np.append(ordre, len(d) - 1)  # ordre[j+1] vaut « fin » pour le dernier arrêt
+    i = np.arange(1, n - 1)[:, None]
+    j = np.arange(2, n)[None, :]
+    a, b = suite[i - 1], suite[i]
+    c, e = suite[j], suite[j + 1]
+    delta = d[a, c] + d[b, e] - d[a, b] - d[c, e]
+    delta = np.where(j > i, delta, np.inf)
+    k = np.unravel_index(np.argmin(delta), delta.shape)
+    return delta[k], int(i[k[0], 0]), int(j[0, k[1]])
+
+
+def meilleur_or_opt(d, ordre, longueur_max=3):
+    """Meilleur déplacement d'un segment ordre[i:i+L] entre ordre[k] et ordre[k+1] (éventuellement inversé)"""
+    n = len(ordre)
+    suite = np.append(ordre, len(d) - 1)
+    meilleur = (np.inf, 0, 0, 0, False)
+    for taille in range(1, min(longueur_max, n - 2) + 1):
+        i = np.arange(1, n - taille + 1)[:, None]
+        debut, fin = suite[i], suite[i + taille - 1]
+        avant, apres = suite[i - 1], suite[i + taille]
+        retrait = d[avant, debut] + d[fin, apres] - d[avant, apres]
+
+        k = np.arange(0, n)[None, :]
+        u, v = suite[k], suite[k + 1]
+        direct = d[u, debut] + d[fin, v] - d[u, v]
+        inverse = d[u, fin] + d[debut, v] - d[u, v]
+        # L'arête (u, v) ne doit pas toucher le segment déplacé
+        valide = (k < i - 1) | (k >= i + taille)
+        for inverser, insertion in ((False, direct), (True, inverse)):
+            delta = np.where(valide, insertion - retrait, np.inf)
+            pos = np.unravel_index(np.argmin(delta), delta.shape)
+            if delta[pos] < meilleur[0]:
+                meilleur = (delta[pos], int(i[pos[0], 0]), taille, int(k[0, pos[1]]), inverser)
+    return meilleur
+
+
+def _deplacer(ordre, i, taille, k, inverser):
+    segment = ordre[i:i + taille]
+    if inverser:
+        segment = segment[::-1]
+    reste = np.concatenate([ordre[:i], ordre[i + taille:]])
+    position = k + 1 if k < i else k + 1 - taille
+    return np.concatenate([reste[:position], segment, reste[position:]])
+
+
+def ameliorer(matrice, ordre, iterations_max=10000):
+    """Applique 2-opt et Or-opt tant qu'un mouvement raccourcit le trajet"""
+    ordre = np.array(ordre)
+    if len(ordre) < 3:
+        return ordre
+    d = _avec_fin(matrice)
+    for _ in range(iterations_max):
+        gain, i, j = meilleur_deux_opt(d, ordre)
+        if gain < -EPSILON:
+            ordre[i:j + 1] = ordre[i:j + 1][::-1]
+            continue
+        gain, i, taille, k, inverser = meilleur_or_opt(d, ordre)
+        if gain < -EPSILON:
+            ordre = _deplacer(ordre, i, taille, k, inverser)
+            continue
+        break
+    return ordre
+
+
+def optimiser(matrice, depart=0):
+    """Ordre de visite des nœuds de `matrice`, en partant de `depart`"""
+    if len(matrice) == 0:
+        return np.array([], dtype=int)
+    return ameliorer(matrice, plus_proche_voisin(matrice, depart))
+
+
+def optimiser_tournee(tournee):
+    """Réordonne les arrêts d'une tournée et enregistre le nouvel `ordre`"""
+    arrets = list(
+        TourneeExpedition.objects.filter(tournee=tournee)
+        .order_by('ordre', 'id')
+        .values_list('id', 'expedition__destination_id', named=True)
+    )
+    destinations = list(dict.fromkeys(a.expedition__destination_id for a in arrets))
+    index = {pk: i for i, pk in enumerate(destinations)}
+    par_destination = matrice_distances(destinations)
+    noeuds = np.array([index[a.expedition__destination_id] for a in arrets], dtype=int)
+    matrice = par_destination[np.ix_(noeuds, noeuds)] if len(noeuds) else np.zeros((0, 0))
+
+    initial = np.arange(len(arrets))
+    longueur_initiale = longueur(matrice, initial)
+    # Recherche locale depuis le plus proche voisin et depuis l'ordre actuel : le plus court des deux
+    ordre, longueur_optimisee = initial, longueur_initiale
+    for candidat in (optimiser(matrice), ameliorer(matrice, initial)):
+        if longueur(matrice, candidat) < longueur_optimisee - EPSILON:
+            ordre, longueur_optimisee = candidat, longueur(matrice, candidat)
+
+    # Ordre actuel déjà le meilleur trouvé : rien à écrire
+    if ordre is not initial:
+        liens = [TourneeExpedition(id=arrets[position].id, ordre=rang) for rang, position in enumerate(ordre)]
+        with transaction.atomic():
+            TourneeExpedition.objects.bulk_update(liens, ['ordre'], batch_size=500)
+    return {
+        'longueur_initiale': round(longueur_initiale, 3),
+        'longueur_optimisee': round(longueur_optimisee, 3),
+        'gain': round(longueur_initiale - longueur_optimisee, 3),
+        'ordre': [arrets[position].id for position in ordre],
+    }
@@ -1,10 +1,64 @@
 from rest_framework import serializers
+from . import etats
 from .models import (
     Client, Chauffeur, Vehicule, Destination, TypeService, Expedition,
     Tournee, TourneeExpedition, TrackingHistorique, Facture, FactureExpedition,
     Paiement, Incident, Reclamation
 )
 
+
+def _liste_param(query_params, nom):
+    """Noms séparés par des virgules, ou None si le paramètre est absent"""
+    valeur = query_params.get(nom)
+    if valeur is None:
+        return None
+    return {champ.strip() for champ in valeur.split(',') if champ.strip()}
+
+
+class ChampsDynamiquesMixin:
+    """
+    Représentation réduite à la demande, en lecture :
+    - ?fields=id,statut ne garde que ces champs ;
+    - ?expand=expeditions ne garde que les champs imbriqués listés
+      (Meta.champs_imbriques), ?expand= vide les retire tous.
+    Sans paramètre, la représentation complète est renvoyée.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return
+        imbriques = set(getattr(self.Meta, 'champs_imbriques', ()))
+        gardes = _liste_param(request.query_params, 'fields')
+        retires = imbriques - self.imbriques_demandes(request)
+        for nom in list(self.fields):
+            if nom in retires or (gardes is not None and nom not in gardes):
+                self.fields.pop(nom)
+
+    @classmethod
+    def imbriques_demandes(cls, request):
+        """Champs imbriqués à sérialiser pour cette requête (pour adapter les prefetch)"""
+        imbriques = set(getattr(cls.Meta, 'champs_imbriques', ()))
+        if request.method not in ('GET', 'HEAD'):
+            return imbriques
+        for nom in ('fields', 'expand'):
+            liste = _liste_param(request.query_params, nom)
+            if liste is not None:
+                imbriques &= liste
+        return imbriques
+
+
+class StatutMixin:
+    """Changement de statut limité aux transitions de core/etats.py (statut libre à la création)"""
+
+    def validate_statut(self, valeur):
+        instance = self.instance
+        if instance is not None and valeur != instance.statut and not etats.autorise(type(instance), instance.statut, valeur):
+            raise serializers.ValidationError(f"Transition {instance.statut} → {valeur} non autorisée.")
+        return valeur
+
+
 class ClientSerializer(serializers.ModelSerializer):
     class Meta:
         model = Client
@@ -30,7 +84,7 @@ class TypeServiceSerializer(serializers.ModelSerializer):
         model = TypeService
         fields = '__all__'
 
-class ExpeditionSerializer(serializers.ModelSerializer):
+class ExpeditionSerializer(StatutMixin, serializers.ModelSerializer):
     # Ces champs permettent d'afficher les noms au lieu des ID dans le JSON (lecture seule)
     nom_client = serializers.ReadOnlyField(source='client.nom')
     ville_destination = serializers.ReadOnlyField(source='destination.ville')
@@ -50,7 +104,7 @@ class TourneeExpeditionSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class TourneeSerializer(serializers.ModelSerializer):
+class TourneeSerializer(StatutMixin, ChampsDynamiquesMixin, serializers.ModelSerializer):
     chauffeur_nom = serializers.ReadOnlyField(source='chauffeur.nom')
     vehicule_matricule = serializers.ReadOnlyField(source='vehicule.matricule')
     expeditions = TourneeExpeditionSerializer(many=True, read_only=True)
@@ -58,6 +112,7 @@ class TourneeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tournee
         fields = '__all__'
+        champs_imbriques = ('expeditions',)
 
 
 class TrackingHistoriqueSerializer(serializers.ModelSerializer):
@@ -76,13 +131,14 @@ class FactureExpeditionSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class FactureSerializer(serializers.ModelSerializer):
+class FactureSerializer(StatutMixin, ChampsDynamiquesMixin, serializers.ModelSerializer):
     client_nom = serializers.ReadOnlyField(source='client.nom')
     expeditions = FactureExpeditionSerializer(many=True, read_only=True)
     
     class Meta:
         model = Facture
         fields = '__all__'
+        champs_imbriques = ('expeditions',)
 
 
 class PaiementSerializer(serializers.ModelSerializer):
@@ -93,7 +149,7 @@ class PaiementSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class IncidentSerializer(serializers.ModelSerializer):
+class IncidentSerializer(StatutMixin, serializers.ModelSerializer):
     expedition_numero = serializers.ReadOnlyField(source='expedition.numero_suivi')
     tournee_numero = serializers.ReadOnlyField(source='tournee.numero_tournee')
     
@@ -102,7 +158,7 @@ class IncidentSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class ReclamationSerializer(serializers.ModelSerializer):
+class ReclamationSerializer(StatutMixin, serializers.ModelSerializer):
     client_nom = serializers.ReadOnlyField(source='client.nom')
     expedition_numero = serializers.ReadOnlyField(source='expedition.numero_suivi')
     facture_numero = serializers.ReadOnlyField(source='facture.numero_facture')
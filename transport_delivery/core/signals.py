@@ -0,0 +1,160 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import comptabilite, etats, ingestion, referentiel, statistiques, suivi
+from .models import (
+    Client, Chauffeur, Vehicule, Destination, TypeService, Expedition, Tournee, TrackingHistorique, Facture,
+    Paiement, Incident, Reclamation,
+)
+
+
+# Statistiques du dashboard : on relit l'état précédent avant chaque
+# sauvegarde pour appliquer la différence après coup.
+
+@receiver(pre_save, sender=Expedition)
+def memoriser_expedition(sender, instance, **kwargs):
+    instance._etat_precedent = None
+    if instance.pk:
+        instance._etat_precedent = (
+            Expedition.objects.filter(pk=instance.pk).values(*statistiques.CHAMPS_EXPEDITION).first()
+        )
+
+
+@receiver(post_save, sender=Expedition)
+def statistiques_expedition(sender, instance, **kwargs):
+    avant = getattr(instance, '_etat_precedent', None)
+    statistiques.appliquer_deltas(
+        statistiques.deltas_expedition(avant, statistiques.etat_expedition(instance))
+    )
+
+
+@receiver(post_delete, sender=Expedition)
+def statistiques_expedition_supprimee(sender, instance, **kwargs):
+    statistiques.appliquer_deltas(
+        statistiques.deltas_expedition(statistiques.etat_expedition(instance), None)
+    )
+
+
+@receiver(pre_save, sender=Facture)
+@receiver(pre_save, sender=Incident)
+@receiver(pre_save, sender=Reclamation)
+def memoriser_statut(sender, instance, **kwargs):
+    instance._etat_precedent = sender.objects.filter(pk=instance.pk).first() if instance.pk else None
+
+
+@receiver(post_save, sender=Facture)
+@receiver(post_save, sender=Incident)
+@receiver(post_save, sender=Reclamation)
+def compteur_statut(sender, instance, **kwargs):
+    avant = getattr(instance, '_etat_precedent', None)
+    statistiques.appliquer_deltas(statistiques.deltas_compteur(sender, avant, instance))
+
+
+@receiver(post_delete, sender=Facture)
+@receiver(post_delete, sender=Incident)
+@receiver(post_delete, sender=Reclamation)
+def compteur_statut_supprime(sender, instance, **kwargs):
+    statistiques.appliquer_deltas(statistiques.deltas_compteur(sender, instance, None))
+
+
+# Grand livre client : écritures et solde à chaque facture / paiement
+
+def _cascade_depuis(kwargs, *modeles):
+    """True si la suppression découle de celle d'une instance de `modeles`"""
+    origine = kwargs.get('origin')
+    return getattr(origine, 'model', type(origine)) in modeles
+
+
+@receiver(post_save, sender=Facture)
+def grand_livre_facture(sender, instance, **kwargs):
+    avant = getattr(instance, '_etat_precedent', None)
+    comptabilite.ecrire(comptabilite.ecritures_facture(avant, instance))
+
+
+@receiver(post_delete, sender=Facture)
+def grand_livre_facture_supprimee(sender, instance, **kwargs):
+    if not _cascade_depuis(kwargs, Client):
+        comptabilite.ecrire(comptabilite.ecritures_facture(instance, None))
+
+
+@receiver(pre_save, sender=Paiement)
+def memoriser_paiement(sender, instance, **kwargs):
+    instance._etat_precedent = Paiement.objects.filter(pk=instance.pk).first() if instance.pk else None
+
+
+@receiver(post_save, sender=Paiement)
+def grand_livre_paiement(sender, instance, **kwargs):
+    avant = getattr(instance, '_etat_precedent', None)
+    if avant is not None and avant.facture_id != instance.facture_id:
+        # Paiement réaffecté : retiré de l'ancienne facture, porté sur la nouvelle
+        comptabilite.ecrire(comptabilite.ecritures_paiement(avant, None, avant.facture.client_id))
+        comptabilite.actualiser_statut(avant.facture_id)
+        avant = None
+    comptabilite.ecrire(comptabilite.ecritures_paiement(avant, instance, instance.facture.client_id))
+    comptabilite.actualiser_statut(instance.facture_id)
+
+
+@receiver(post_delete, sender=Paiement)
+def grand_livre_paiement_supprime(sender, instance, **kwargs):
+    if _cascade_depuis(kwargs, Client):
+        return
+    avec_facture = _cascade_depuis(kwargs, Facture)
+    comptabilite.ecrire(comptabilite.ecritures_paiement(
+        instance, None, instance.facture.client_id, lier_facture=not avec_facture,
+    ))
+    if not avec_facture:
+        comptabilite.actualiser_statut(instance.facture_id)
+
+
+# Suivi : dernier événement recopié sur l'expédition et cache de consultation
+
+@receiver(post_save, sender=TrackingHistorique)
+def evenement_suivi(sender, instance, created, **kwargs):
+    if created:
+        # Transition vérifiée (core/etats.py) comme pour les scans importés
+        ingestion.enregistrer_evenement(instance)
+    else:
+        suivi.recalculer_dernier_evenement(instance.expedition_id)
+        suivi.invalider(instance.expedition.numero_suivi)
+
+
+@receiver(post_delete, sender=TrackingHistorique)
+def evenement_suivi_supprime(sender, instance, **kwargs):
+    suivi.recalculer_dernier_evenement(instance.expedition_id)
+    suivi.invalider(instance.expedition.numero_suivi)
+
+
+@receiver(post_save, sender=Expedition)
+@receiver(post_delete, sender=Expedition)
+def invalider_suivi(sender, instance, **kwargs):
+    suivi.invalider(instance.numero_suivi)
+
+
+# Tournée : ses expéditions suivent son statut (core/etats.py)
+
+@receiver(pre_save, sender=Tournee)
+def memoriser_statut_tournee(sender, instance, **kwargs):
+    instance._statut_precedent = (
+        Tournee.objects.filter(pk=instance.pk).values_list('statut', flat=True).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Tournee)
+def cascade_tournee(sender, instance, **kwargs):
+    precedent = getattr(instance, '_statut_precedent', None)
+    if precedent is not None and precedent != instance.statut:
+        etats.cascade_tournees([{'id': instance.pk, 'numero_tournee': instance.numero_tournee}], instance.statut)
+
+
+# Données de référence : nouvelle version de la table à chaque écriture
+
+@receiver(post_save, sender=Chauffeur)
+@receiver(post_save, sender=Vehicule)
+@receiver(post_save, sender=Destination)
+@receiver(post_save, sender=TypeService)
+@receiver(post_delete, sender=Chauffeur)
+@receiver(post_delete, sender=Vehicule)
+@receiver(post_delete, sender=Destination)
+@receiver(post_delete, sender=TypeService)
+def referentiel_modifie(sender, **kwargs):
+    referentiel.invalider(sender)
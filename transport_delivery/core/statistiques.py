@@ -0,0 +1,278 @@
+"""
+Statistiques agrégées lues par le dashboard.
+
+Tenues à jour de façon incrémentale par core/signals.py ; les écritures en
+masse (bulk_create, update) doivent appeler `appliquer_deltas` elles-mêmes.
+Les lectures ont une variante async (atotaux_par_cle, atop...) sur l'ORM
+async, pour les vues servies en ASGI.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import Trunc, TruncDate
+from django.utils import timezone
+
+from .models import (
+    Expedition, Facture, Incident, Reclamation, StatistiqueExpedition, CompteurStatut
+)
+
+# Champs d'une expédition dont dépendent les statistiques
+CHAMPS_EXPEDITION = ('statut', 'client_id', 'destination_id', 'service_id', 'montant_total', 'date_creation')
+DIMENSIONS = {
+    'statut': 'statut',
+    'client': 'client_id',
+    'destination': 'destination_id',
+    'service': 'service_id',
+}
+
+# Modèles comptés par statut, avec le champ montant associé
+COMPTEURS = {
+    Facture: ('facture', 'montant_ttc'),
+    Incident: ('incident', None),
+    Reclamation: ('reclamation', None),
+}
+
+
+def etat_expedition(expedition):
+    """Photographie des champs utiles d'une expédition (instance ou dict)"""
+    if expedition is None:
+        return None
+    if isinstance(expedition, dict):
+        return {champ: expedition[champ] for champ in CHAMPS_EXPEDITION}
+    return {champ: getattr(expedition, champ) for champ in CHAMPS_EXPEDITION}
+
+
+def deltas_expedition(avant, apres, deltas=None):
+    """
+    Accumule dans `deltas` les variations induites par le passage d'une
+    expédition de l'état `avant` à l'état `apres` (None = inexistante).
+    Les clés sont (dimension, jour, cle) et les valeurs [nombre, montant].
+    """
+    if deltas is None:
+        deltas = defaultdict(lambda: [0, Decimal('0')])
+    for etat, signe in ((avant, -1), (apres, 1)):
+        if etat is None or etat['date_creation'] is None:
+            continue
+        jour = timezone.localdate(etat['date_creation'])
+        montant = etat['montant_total'] or Decimal('0')
+        for dimension, champ in DIMENSIONS.items():
+            delta = deltas[(dimension, jour, str(etat[champ]))]
+            delta[0] += signe
+            delta[1] += signe * montant
+    return deltas
+
+
+def deltas_statut(etat, statut, deltas=None):
+    """Variante de deltas_expedition quand seul le statut change (imports de suivi)"""
+    if deltas is None:
+        deltas = defaultdict(lambda: [0, Decimal('0')])
+    if etat['date_creation'] is not None:
+        jour = timezone.localdate(etat['date_creation'])
+        montant = etat['montant_total'] or Decimal('0')
+        for cle, signe in ((str(etat['statut']), -1), (statut, 1)):
+            delta = deltas[('statut', jour, cle)]
+            delta[0] += signe
+            delta[1] += signe * montant
+    return deltas
+
+
+def deltas_compteur(model, avant, apres, deltas=None):
+    """Idem pour CompteurStatut : `avant`/`apres` sont des instances ou None"""
+    if deltas is None:
+        deltas = defaultdict(lambda: [0, Decimal('0')])
+    modele, champ_montant = COMPTEURS[model]
+    for instance, signe in ((avant, -1), (apres, 1)):
+        if instance is None:
+            continue
+        montant = getattr(instance, champ_montant) if champ_montant else Decimal('0')
+        delta = deltas[(modele, instance.statut)]
+        delta[0] += signe
+        delta[1] += signe * (montant or Decimal('0'))
+    return deltas
+
+
+def appliquer_deltas(deltas):
+    """Applique les deltas avec des UPDATE atomiques (F()), en créant les lignes manquantes"""
+    for cle, (nombre, montant) in deltas.items():
+        if not nombre and not montant:
+            continue
+        if len(cle) == 3:
+            model = StatistiqueExpedition
+            filtre = dict(zip(('dimension', 'jour', 'cle'), cle))
+        else:
+            model = CompteurStatut
+            filtre = dict(zip(('modele', 'statut'), cle))
+        _incrementer(model, filtre, nombre, montant)
+
+
+def _incrementer(model, filtre, nombre, montant):
+    valeurs = {'nombre': F('nombre') + nombre, 'montant': F('montant') + montant}
+    if model.objects.filter(**filtre).update(**valeurs):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(nombre=nombre, montant=montant, **filtre)
+    except IntegrityError:
+        # Ligne créée entre-temps par une écriture concurrente
+        model.objects.filter(**filtre).update(**valeurs)
+
+
+@transaction.atomic
+def reconstruire():
+    """Recalcule toutes les statistiques à partir des tables sources"""
+    StatistiqueExpedition.objects.all().delete()
+    CompteurStatut.objects.all().delete()
+
+    lignes = []
+    for dimension, champ in DIMENSIONS.items():
+        groupes = (
+            Expedition.objects
+            .annotate(jour=TruncDate('date_creation'))
+            .values('jour', champ)
+            .annotate(nombre=Count('id'), montant=Sum('montant_total'))
+            .order_by()
+        )
+        lignes += [
+            StatistiqueExpedition(
+                jour=g['jour'], dimension=dimension, cle=str(g[champ]),
+                nombre=g['nombre'], montant=g['montant'] or 0,
+            )
+            for g in groupes
+        ]
+    StatistiqueExpedition.objects.bulk_create(lignes, batch_size=1000)
+
+    compteurs = []
+    for model, (modele, champ_montant) in COMPTEURS.items():
+        agregats = {'nombre': Count('id')}
+        if champ_montant:
+            agregats['montant'] = Sum(champ_montant)
+        for g in model.objects.values('statut').annotate(**agregats).order_by():
+            compteurs.append(CompteurStatut(
+                modele=modele, statut=g['statut'],
+                nombre=g['nombre'], montant=g.get('montant') or 0,
+            ))
+    CompteurStatut.objects.bulk_create(compteurs)
+    return len(lignes), len(compteurs)
+
+
+def _requete_totaux(dimension, depuis):
+    qs = StatistiqueExpedition.objects.filter(dimension=dimension)
+    if depuis is not None:
+        qs = qs.filter(jour__gte=depuis)
+    return qs.values('cle').annotate(nombre=Sum('nombre'), montant=Sum('montant')).order_by()
+
+
+def totaux_par_cle(dimension, depuis=None):
+    """{cle: (nombre, montant)} pour une dimension, éventuellement depuis une date"""
+    return {g['cle']: (g['nombre'], g['montant'] or Decimal('0')) for g in _requete_totaux(dimension, depuis)}
+
+
+async def atotaux_par_cle(dimension, depuis=None):
+    return {g['cle']: (g['nombre'], g['montant'] or Decimal('0')) async for g in _requete_totaux(dimension, depuis)}
+
+
+def _requete_top(dimension, limite):
+    return (
+        StatistiqueExpedition.objects
+        .filter(dimension=dimension)
+        .values('cle')
+        .annotate(total=Sum('nombre'))
+        .filter(total__gt=0)
+        .order_by('-total', 'cle')[:limite]
+    )
+
+
+def top(dimension, limite=5):
+    """[(id, nombre)] des clés les plus fréquentes d'une dimension"""
+    return [(int(g['cle']), g['total']) for g in _requete_top(dimension, limite)]
+
+
+async def atop(dimension, limite=5):
+    return [(int(g['cle']), g['total']) async for g in _requete_top(dimension, limite)]
+
+
+def compteurs():
+    """{modele: {statut: (nombre, montant)}}"""
+    resultat = defaultdict(dict)
+    for c in CompteurStatut.objects.all():
+        resultat[c.modele][c.statut] = (c.nombre, c.montant)
+    return resultat
+
+
+async def acompteurs():
+    resultat = defaultdict(dict)
+    async for c in CompteurStatut.objects.all():
+        resultat[c.modele][c.statut] = (c.nombre, c.montant)
+    return resultat
+
+
+GRANULARITES = ('day', 'week', 'month')
+# Bornes d'une tendance : dates plausibles, et au plus dix ans de points par jour
+DATE_MIN, DATE_MAX = date(1900, 1, 1), date(2999, 12, 31)
+PERIODES_MAX = 3660
+
+
+def debut_periode(jour, granularite):
+    """Premier jour de la période (jour, semaine ISO ou mois) contenant `jour`"""
+    if granularite == 'week':
+        return jour - timedelta(days=jour.weekday())
+    if granularite == 'month':
+        return jour.replace(day=1)
+    return jour
+
+
+def nombre_periodes(debut, fin, granularite):
+    if granularite == 'month':
+        return (fin.year - debut.year) * 12 + fin.month - debut.month + 1
+    return (fin - debut_periode(debut, granularite)).days // (7 if granularite == 'week' else 1) + 1
+
+
+def periodes(debut, fin, granularite):
+    """Débuts de toutes les périodes entre deux dates, bornes incluses"""
+    courant = debut_periode(debut, granularite)
+    while courant <= fin:
+        yield courant
+        if granularite == 'month':
+            courant = (courant + timedelta(days=32)).replace(day=1)
+        else:
+            courant += timedelta(days=7 if granularite == 'week' else 1)
+
+
+def _requete_tendance(debut, fin, granularite, dimension):
+    return (
+        StatistiqueExpedition.objects
+        .filter(dimension=dimension, jour__gte=debut_periode(debut, granularite), jour__lte=fin)
+        .annotate(periode=Trunc('jour', granularite, output_field=DateField()))
+        .values('periode', 'cle')
+        .annotate(total=Sum('nombre'))
+        .values_list('periode', 'cle', 'total')
+        .order_by()
+    )
+
+
+def _series(lignes, debut, fin, granularite):
+    repartition = defaultdict(dict)
+    for periode, cle, total in lignes:
+        if total:
+            repartition[periode][cle] = total
+    return [
+        (periode, sum(repartition[periode].values()), repartition[periode])
+        for periode in periodes(debut, fin, granularite)
+    ]
+
+
+def tendance(debut, fin, granularite='month', dimension='statut'):
+    """
+    Nombre d'expéditions créées par période, en une seule requête GROUP BY
+    sur la table agrégée. Retourne [(periode, total, {cle: nombre})], les
+    périodes vides étant complétées à zéro.
+    """
+    return _series(_requete_tendance(debut, fin, granularite, dimension), debut, fin, granularite)
+
+
+async def atendance(debut, fin, granularite='month', dimension='statut'):
+    lignes = [ligne async for ligne in _requete_tendance(debut, fin, granularite, dimension)]
+    return _series(lignes, debut, fin, granularite)
@@ -0,0 +1,131 @@
+"""
+Suivi public d'une expédition par numéro de suivi.
+
+La réponse est mise en cache (clé `suivi:2:<numero>`) et invalidée par
+core/signals.py dès qu'un événement de suivi ou l'expédition change.
+Route publique, numéros séquentiels : les commentaires internes des
+événements n'y figurent pas.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Expedition, TrackingHistorique
+
+EVENEMENTS_MAX = 50
+DUREE_CACHE = getattr(settings, 'SUIVI_CACHE_TIMEOUT', 300)
+
+
+def cle_cache(numero_suivi):
+    # 2 : format sans commentaire, les anciennes entrées ne sont plus lues
+    return f'suivi:2:{numero_suivi}'
+
+
+def invalider(*numeros_suivi):
+    """
+    Supprime les entrées tout de suite, puis à nouveau au commit : une
+    lecture concurrente pourrait sinon remettre en cache l'état d'avant.
+    """
+    cles = [cle_cache(numero) for numero in numeros_suivi]
+    cache.delete_many(cles)
+    transaction.on_commit(lambda: cache.delete_many(cles))
+
+
+def consulter(numero_suivi):
+    """Expédition et ses derniers événements, ou None si le numéro est inconnu"""
+    cle = cle_cache(numero_suivi)
+    suivi = cache.get(cle)
+    if suivi is None:
+        suivi = _charger(numero_suivi)
+        if suivi is not None:
+            cache.set(cle, suivi, DUREE_CACHE)
+    return suivi
+
+
+async def aconsulter(numero_suivi):
+    """Variante async de consulter (vue ASGI)"""
+    cle = cle_cache(numero_suivi)
+    suivi = await cache.aget(cle)
+    if suivi is None:
+        suivi = await _acharger(numero_suivi)
+        if suivi is not None:
+            await cache.aset(cle, suivi, DUREE_CACHE)
+    return suivi
+
+
+# Une seule requête : index unique sur numero_suivi puis index
+# (expedition, -date_heure) pour les événements
+def _requete_evenements(numero_suivi):
+    return (
+        TrackingHistorique.objects
+        .filter(expedition__numero_suivi=numero_suivi)
+        .select_related('expedition__destination')
+        .defer('commentaire')
+        .order_by('-date_heure', '-id')[:EVENEMENTS_MAX]
+    )
+
+
+def _requete_expedition(numero_suivi):
+    return Expedition.objects.select_related('destination').filter(numero_suivi=numero_suivi)
+
+
+def _charger(numero_suivi):
+    evenements = list(_requete_evenements(numero_suivi))
+    if evenements:
+        expedition = evenements[0].expedition
+    else:
+        expedition = _requete_expedition(numero_suivi).first()
+    return _representation(expedition, evenements)
+
+
+async def _acharger(numero_suivi):
+    evenements = [e async for e in _requete_evenements(numero_suivi)]
+    if evenements:
+        expedition = evenements[0].expedition
+    else:
+        expedition = await _requete_expedition(numero_suivi).afirst()
+    return _representation(expedition, evenements)
+
+
+def _representation(expedition, evenements):
+    if expedition is None:
+        return None
+    return {
+        'numero_suivi': expedition.numero_suivi,
+        'statut': expedition.statut,
+        'statut_libelle': expedition.get_statut_display(),
+        'ville_destination': expedition.destination.ville,
+        'pays_destination': expedition.destination.pays,
+        'date_creation': expedition.date_creation,
+        'dernier_lieu': expedition.dernier_lieu,
+        'dernier_statut_suivi': expedition.dernier_statut_suivi,
+        'date_dernier_evenement': expedition.date_dernier_evenement,
+        'evenements': [{
+            'date_heure': e.date_heure,
+            'lieu': e.lieu,
+            'statut': e.statut,
+        } for e in evenements],
+    }
+
+
+def recopier_evenements(evenements):
+    """Événements acceptés recopiés tels quels sur leurs expéditions (imports en masse)"""
+    Expedition.objects.bulk_update([
+        Expedition(
+            pk=evenement.expedition_id, dernier_lieu=evenement.lieu,
+            dernier_statut_suivi=evenement.statut, date_dernier_evenement=evenement.date_heure,
+        )
+        for evenement in evenements
+    ], ['dernier_lieu', 'dernier_statut_suivi', 'date_dernier_evenement'], batch_size=500)
+
+
+def recalculer_dernier_evenement(expedition_id):
+    """Après suppression ou modification d'un événement"""
+    dernier = (
+        TrackingHistorique.objects.filter(expedition_id=expedition_id).order_by('-date_heure', '-id').first()
+    )
+    Expedition.objects.filter(pk=expedition_id).update(
+        dernier_lieu=dernier.lieu if dernier else '',
+        dernier_statut_suivi=dernier.statut if dernier else '',
+        date_dernier_evenement=dernier.date_heure if dernier else None,
+    )
@@ -0,0 +1,81 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Subquery
+
+
+# Formule du PDF : Montant = Tarif Base + (Poids * Tarif Poids) + (Volume * Tarif Volume)
+# Les flottants passent par str() comme dans Expedition.save() pour obtenir
+# exactement les mêmes centimes qu'une création unitaire.
+
+# Les grilles (Destination.tarif_base, TypeService.tarif_poids/tarif_volume)
+# sont gardées en mémoire dans chaque processus pour les devis et les imports,
+# et rechargées quand la version de l'une des deux tables change
+# (core/referentiel.py). DUREE_MAX borne l'écart entre processus quand le
+# cache des versions n'est pas partagé. Expedition.save(), qui fixe le prix
+# enregistré, lit toujours les tarifs en base (montant).
+DUREE_MAX = getattr(settings, 'TARIFICATION_MEMO_TIMEOUT', 60)
+
+_grilles = None  # (versions, charge_le, tarifs_base, tarifs_service)
+_verrou = threading.Lock()
+
+
+def calculer_montant(tarif_base, tarif_poids, tarif_volume, poids, volume):
+    cout_poids = Decimal(str(poids)) * tarif_poids
+    cout_volume = Decimal(str(volume)) * tarif_volume
+    return tarif_base + cout_poids + cout_volume
+
+
+def calculer_montants(lignes, tarifs_base, tarifs_service):
+    """
+    Montants d'un lot de lignes (destination_id, service_id, poids, volume).
+
+    `tarifs_base` : {destination_id: tarif_base}
+    `tarifs_service` : {service_id: (tarif_poids, tarif_volume)}
+    """
+    montants = []
+    for destination_id, service_id, poids, volume in lignes:
+        tarif_poids, tarif_volume = tarifs_service[service_id]
+        montants.append(calculer_montant(
+            tarifs_base[destination_id], tarif_poids, tarif_volume, poids, volume
+        ))
+    return montants
+
+
+def grilles(recharger=False):
+    """(tarifs_base, tarifs_service) au format de calculer_montants, depuis la mémoire si à jour"""
+    global _grilles
+    from . import referentiel
+    from .models import Destination, TypeService
+
+    versions = (referentiel.version(Destination), referentiel.version(TypeService))
+    memo = _grilles
+    if recharger or memo is None or memo[0] != versions or time.monotonic() - memo[1] > DUREE_MAX:
+        with _verrou:
+            tarifs_base = dict(Destination.objects.values_list('id', 'tarif_base'))
+            tarifs_service = {
+                pk: (tarif_poids, tarif_volume)
+                for pk, tarif_poids, tarif_volume in TypeService.objects.values_list('id', 'tarif_poids', 'tarif_volume')
+            }
+            # Versions lues avant le chargement : une écriture pendant celui-ci
+            # provoquera un nouveau chargement à l'appel suivant
+            memo = _grilles = (versions, time.monotonic(), tarifs_base, tarifs_service)
+    return memo[2], memo[3]
+
+
+def montant(destination_id, service_id, poids, volume):
+    """Prix d'une expédition avec les tarifs actuels, lus en base en une requête"""
+    from .models import Destination, TypeService
+
+    tarif_base = Destination.objects.filter(pk=destination_id).values('tarif_base')
+    tarif_poids, tarif_volume, base = (
+        TypeService.objects.filter(pk=service_id)
+        .annotate(base=Subquery(tarif_base))
+        .values_list('tarif_poids', 'tarif_volume', 'base')
+        .get()
+    )
+    if base is None:
+        raise Destination.DoesNotExist(f'Destination {destination_id} introuvable')
+    return calculer_montant(base, tarif_poids, tarif_volume, poids, volume)
@@ -1,3 +1,1282 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+import asyncio
+import base64
+import csv
+import json
+import threading
+import time
+from unittest import mock
+
+import numpy as np
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from .models import (
+    Client, Chauffeur, Vehicule, Destination, TypeService, Expedition,
+    Tournee, TourneeExpedition, TrackingHistorique, Facture, FactureExpedition,
+    Paiement, Incident, Reclamation, DistanceDestination, ExecutionFacturation, CompteurStatut,
+    EcritureClient
+)
+from . import (
+    comptabilite, facturation, jetons, limitation, metriques, numerotation, planification, recherche, regroupement,
+    routage, statistiques,
+)
+
+
+class DonneesMixin:
+    """Jeu de données minimal partagé par les tests de l'API"""
+
+    def setUp(self):
+        # Le cache et les seaux de limitation survivent au rollback de chaque test
+        cache.clear()
+        limitation.vider()
+        super().setUp()
+        self.entete = {'Authorization': f"Bearer {jetons.emettre(self.utilisateur)['acces']}"}
+        self.client.credentials(HTTP_AUTHORIZATION=self.entete['Authorization'])
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.utilisateur = User.objects.create(username="agent", email="agent@example.com")
+        cls.client_a = Client.objects.create(nom="Client A", adresse="1 rue A", telephone="0100000000")
+        cls.client_b = Client.objects.create(nom="Client B", adresse="2 rue B", telephone="0200000000")
+        cls.chauffeur = Chauffeur.objects.create(nom="Jean", permis="B1")
+        cls.vehicule = Vehicule.objects.create(matricule="AA-1", type_vehicule="Fourgon", capacite=1000)
+        cls.paris = Destination.objects.create(ville="Paris", pays="France", tarif_base=Decimal("10.00"))
+        cls.lyon = Destination.objects.create(ville="Lyon", pays="France", tarif_base=Decimal("12.00"))
+        cls.standard = TypeService.objects.create(nom="Standard", tarif_poids=Decimal("2.00"), tarif_volume=Decimal("5.00"))
+
+    @classmethod
+    def creer_expedition(cls, **kwargs):
+        valeurs = {
+            'client': cls.client_a, 'destination': cls.paris, 'service': cls.standard,
+            'poids': 1.5, 'volume': 0.2, 'description': "Colis",
+        }
+        valeurs.update(kwargs)
+        return Expedition.objects.create(**valeurs)
+
+    @classmethod
+    def peupler(cls, n):
+        """Crée n lignes dans chaque table listée par l'API"""
+        for i in range(n):
+            client = Client.objects.create(nom=f"C{i}", adresse="x", telephone="0")
+            Chauffeur.objects.create(nom=f"Ch{i}", permis="B")
+            vehicule = Vehicule.objects.create(matricule=f"V-{i}-{n}", type_vehicule="Fourgon", capacite=500)
+            destination = Destination.objects.create(ville=f"Ville{i}", pays="FR", tarif_base=Decimal("5.00"))
+            service = TypeService.objects.create(nom=f"S{i}", tarif_poids=Decimal("1.00"), tarif_volume=Decimal("1.00"))
+            expedition = cls.creer_expedition(client=client, destination=destination, service=service)
+            tournee = Tournee.objects.create(date=date.today(), chauffeur=cls.chauffeur, vehicule=vehicule)
+            TourneeExpedition.objects.create(tournee=tournee, expedition=expedition, ordre=i)
+            TrackingHistorique.objects.create(expedition=expedition, lieu="Hub", statut="CENTRE_TRI")
+            facture = Facture.objects.create(client=client, date_echeance=date.today() + timedelta(days=30),
+                                             montant_ht=Decimal("100.00"), taux_tva=Decimal("19.00"))
+            FactureExpedition.objects.create(facture=facture, expedition=expedition)
+            Paiement.objects.create(facture=facture, montant=Decimal("10.00"), mode_paiement='CARTE')
+            Incident.objects.create(expedition=expedition, tournee=tournee, type_incident='RETARD', description="x")
+            Reclamation.objects.create(client=client, expedition=expedition, facture=facture,
+                                       type_reclamation='RETARD', description="x")
+
+
+class PaginationTests(DonneesMixin, APITestCase):
+    endpoints = [
+        '/api/clients/', '/api/chauffeurs/', '/api/vehicules/', '/api/destinations/',
+        '/api/types-service/', '/api/expeditions/', '/api/tournees/', '/api/tracking/',
+        '/api/factures/', '/api/paiements/', '/api/incidents/', '/api/reclamations/',
+    ]
+
+    def compter_requetes(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(ctx.captured_queries)
+
+    def test_nombre_de_requetes_constant(self):
+        self.peupler(2)
+        petit = {url: self.compter_requetes(url + '?page_size=2') for url in self.endpoints}
+        self.peupler(8)
+        for url in self.endpoints:
+            self.assertEqual(self.compter_requetes(url + '?page_size=10'), petit[url], url)
+
+    def test_parcours_par_curseur_sans_doublon(self):
+        # Même date_creation partout : seul l'id départage les lignes
+        expeditions = [self.creer_expedition() for _ in range(7)]
+        Expedition.objects.update(date_creation=expeditions[0].date_creation)
+
+        vus, url = [], '/api/expeditions/?page_size=3'
+        while url:
+            response = self.client.get(url)
+            vus += [e['id'] for e in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(vus, sorted((e.id for e in expeditions), reverse=True))
+
+        # Retour en arrière depuis la dernière page
+        derniere = self.client.get(response.data['previous'].replace('http://testserver', ''))
+        self.assertEqual([e['id'] for e in derniere.data['results']], vus[3:6])
+
+    def test_curseur_invalide(self):
+        response = self.client.get('/api/expeditions/?cursor=pas-un-curseur')
+        self.assertEqual(response.status_code, 404)
+        # Curseurs forgés : valeurs converties par les champs de l'ordre
+        for position in (["abc", 1], [{"a": 1}, 1], ["2020-01-01T00:00:00", "x"], [None, None], [[1], True]):
+            jeton = base64.urlsafe_b64encode(json.dumps({'p': position, 'r': 0}).encode()).decode()
+            response = self.client.get('/api/expeditions/', {'cursor': jeton})
+            self.assertEqual(response.status_code, 404, position)
+
+
+class FiltrageTests(DonneesMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.livree = cls.creer_expedition(statut='LIVRE')
+        cls.echec = cls.creer_expedition(statut='ECHEC', client=cls.client_b)
+        cls.transit = cls.creer_expedition(client=cls.client_b)
+        Expedition.objects.filter(pk=cls.transit.pk).update(date_creation='2020-01-15T10:00:00Z')
+
+    def ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return {e['id'] for e in response.data['results']}
+
+    def test_egalite(self):
+        self.assertEqual(self.ids('/api/expeditions/?statut=LIVRE'), {self.livree.id})
+        self.assertEqual(self.ids(f'/api/expeditions/?statut=ECHEC&client={self.client_b.id}'), {self.echec.id})
+
+    def test_in(self):
+        self.assertEqual(self.ids('/api/expeditions/?statut__in=LIVRE,ECHEC'), {self.livree.id, self.echec.id})
+        self.assertEqual(self.ids(f'/api/expeditions/?client__in={self.client_b.id}'), {self.echec.id, self.transit.id})
+
+    def test_periode(self):
+        self.assertEqual(self.ids('/api/expeditions/?date_creation__lt=2021-01-01'), {self.transit.id})
+        self.assertEqual(self.ids('/api/expeditions/?date_creation__gte=2021-01-01'), {self.livree.id, self.echec.id})
+
+    def test_filtre_par_index(self):
+        plan = Expedition.objects.filter(statut='LIVRE', date_creation__gte='2021-01-01T00:00:00Z').explain()
+        self.assertIn('expedition_statut_date_idx', plan)
+
+
+class StatistiquesTests(DonneesMixin, APITestCase):
+
+    def dashboard(self):
+        response = self.client.get('/api/analytics/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_maintenance_incrementale(self):
+        e1 = self.creer_expedition()
+        e2 = self.creer_expedition(client=self.client_b, destination=self.lyon)
+        e3 = self.creer_expedition(client=self.client_b)
+        e2.statut = 'LIVRE'
+        e2.save()
+        e3.delete()
+        facture = Facture.objects.create(client=self.client_a, date_echeance=date.today(),
+                                         montant_ht=Decimal("100.00"), taux_tva=Decimal("19.00"))
+        Incident.objects.create(expedition=e1, type_incident='RETARD', description="x")
+        Reclamation.objects.create(client=self.client_a, type_reclamation='RETARD', description="x")
+
+        data = self.dashboard()
+        self.assertEqual(data['expeditions'], {'total': 2, 'en_cours': 1, 'livrees': 1, 'ce_mois': 2})
+        self.assertEqual(data['financier']['chiffre_affaires'], float(e2.montant_total))
+        self.assertEqual(data['financier']['factures_impayees'], float(facture.montant_ttc))
+        self.assertEqual(data['incidents_ouverts'], 1)
+        self.assertEqual(data['reclamations_nouvelles'], 1)
+
+        # Une reconstruction complète donne le même résultat
+        statistiques.reconstruire()
+        self.assertEqual(self.dashboard(), data)
+
+    def test_distribution_et_tendance(self):
+        self.creer_expedition()
+        self.creer_expedition(statut='LIVRE')
+        self.creer_expedition(statut='LIVRE')
+
+        distribution = self.client.get('/api/analytics/status_distribution/').data
+        self.assertEqual([(d['statut'], d['value']) for d in distribution], [('LIVRE', 2), ('EN_TRANSIT', 1)])
+
+        trend = self.client.get('/api/analytics/expedition_trend/').data
+        self.assertEqual(len(trend), 6)
+        self.assertEqual(trend[-1]['expeditions'], 3)
+
+    def test_nombres_par_table(self):
+        self.creer_expedition()
+        self.creer_expedition(statut='LIVRE')
+        self.assertEqual(self.client.get('/api/analytics/counts/').data, {
+            'clients': 2, 'chauffeurs': 1, 'vehicules': 1, 'destinations': 2, 'types_service': 1, 'expeditions': 2,
+        })
+
+    def test_dashboard_sans_parcours_des_expeditions(self):
+        for _ in range(5):
+            self.creer_expedition()
+        with CaptureQueriesContext(connection) as ctx:
+            self.dashboard()
+        self.assertFalse([q for q in ctx.captured_queries if '"core_expedition"' in q['sql']])
+
+
+class TendanceTests(DonneesMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for jour, statut in [('2024-01-03', 'LIVRE'), ('2024-01-03', 'ECHEC'), ('2024-01-20', 'LIVRE'),
+                             ('2024-03-10', 'EN_TRANSIT')]:
+            expedition = cls.creer_expedition(statut=statut)
+            Expedition.objects.filter(pk=expedition.pk).update(date_creation=f'{jour}T12:00:00Z')
+        statistiques.reconstruire()
+
+    def tendance(self, params):
+        response = self.client.get('/api/analytics/expedition_trend/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_mois_avec_trous(self):
+        data = self.tendance({'from': '2024-01-01', 'to': '2024-04-30'})
+        self.assertEqual([(p['periode'], p['expeditions']) for p in data],
+                         [('2024-01-01', 3), ('2024-02-01', 0), ('2024-03-01', 1), ('2024-04-01', 0)])
+        self.assertEqual(data[0]['mois_complet'], 'January 2024')
+
+    def test_jour_sur_deux_ans_en_une_requete(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.tendance({'granularity': 'day', 'from': '2023-01-01', 'to': '2024-12-31'})
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(len(data), 731)
+        self.assertEqual(sum(p['expeditions'] for p in data), 4)
+
+    def test_semaine_et_repartition(self):
+        data = self.tendance({'granularity': 'week', 'from': '2024-01-01', 'to': '2024-01-21',
+                              'breakdown': 'statut'})
+        self.assertEqual([p['periode'] for p in data], ['2024-01-01', '2024-01-08', '2024-01-15'])
+        self.assertEqual(data[0]['statut'], {'LIVRE': 1, 'ECHEC': 1})
+        self.assertEqual(data[2]['statut'], {'LIVRE': 1})
+
+    def test_parametres_invalides(self):
+        for params in ({'granularity': 'year'}, {'breakdown': 'client'}, {'from': '2024-13-01'},
+                       {'from': 'hier'}, {'from': '2024-02-01', 'to': '2024-01-01'},
+                       {'from': '0001-01-01', 'granularity': 'day'}, {'to': '9999-12-31'},
+                       {'from': '2000-01-01', 'to': '2020-01-01', 'granularity': 'day'}):
+            response = self.client.get('/api/analytics/expedition_trend/', params)
+            self.assertEqual(response.status_code, 400, params)
+
+
+class ImportMasseTests(DonneesMixin, APITestCase):
+    url = '/api/expeditions/bulk/'
+
+    def ligne(self, **kwargs):
+        valeurs = {'client': self.client_a.id, 'destination': self.lyon.id, 'service': self.standard.id,
+                   'poids': 2.35, 'volume': 0.15, 'description': "Colis"}
+        valeurs.update(kwargs)
+        return valeurs
+
+    def test_tableau_json_avec_erreurs_par_ligne(self):
+        lignes = [self.ligne(), self.ligne(poids='lourd'), self.ligne(client=999), self.ligne(statut='LIVRE')]
+        response = self.client.post(self.url, lignes, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['crees'], 2)
+        self.assertEqual([e['ligne'] for e in response.data['erreurs']], [2, 3])
+        self.assertIn('poids', response.data['erreurs'][0]['erreurs'])
+        self.assertEqual(Expedition.objects.count(), 2)
+        self.assertEqual(statistiques.totaux_par_cle('statut')['LIVRE'][0], 1)
+
+    def test_prix_identique_a_save(self):
+        for poids, volume in [(2.35, 0.15), (0.1, 0.7), (12.345, 3.3)]:
+            unitaire = self.creer_expedition(destination=self.lyon, poids=poids, volume=volume)
+            self.client.post(self.url, [self.ligne(poids=poids, volume=volume)], format='json')
+            importee = Expedition.objects.latest('id')
+            importee.refresh_from_db()
+            unitaire.refresh_from_db()
+            self.assertEqual(importee.montant_total, unitaire.montant_total)
+
+    def test_ndjson(self):
+        corps = '\n'.join([
+            '{"client": %d, "destination": %d, "service": %d, "poids": 1, "volume": 1, "description": "a"}'
+            % (self.client_a.id, self.paris.id, self.standard.id),
+            '{pas du json',
+            '',
+        ])
+        response = self.client.post(self.url, corps, content_type='application/x-ndjson')
+        self.assertEqual(response.data['crees'], 1)
+        self.assertEqual(response.data['erreurs'][0]['ligne'], 2)
+
+    def test_csv(self):
+        corps = (
+            'client,destination,service,poids,volume,description\n'
+            f'{self.client_a.id},{self.paris.id},{self.standard.id},1.5,0.2,"Colis, fragile"\n'
+            f'{self.client_a.id},{self.paris.id},{self.standard.id},,0.2,Sans poids\n'
+        )
+        response = self.client.post(self.url, corps, content_type='text/csv')
+        self.assertEqual(response.data['crees'], 1)
+        self.assertEqual(response.data['erreurs'], [{'ligne': 2, 'erreurs': {'poids': ['Ce champ est obligatoire.']}}])
+        self.assertEqual(Expedition.objects.get().description, "Colis, fragile")
+
+    def test_corps_invalide(self):
+        for corps in ({'client': 1}, 5, None, "texte"):
+            response = self.client.post(self.url, json.dumps(corps), content_type='application/json')
+            self.assertEqual(response.status_code, 400, corps)
+        # Même contrôle pour les scans
+        response = self.client.post('/api/tracking/bulk/', '5', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class NumerotationTests(DonneesMixin, APITestCase):
+
+    def test_format_et_controle(self):
+        numero = numerotation.formater('E', 12345)
+        self.assertEqual(numero, 'E-00000123455')
+        self.assertTrue(numerotation.valider(numero))
+        self.assertFalse(numerotation.valider('E-00000123456'))
+        self.assertFalse(numerotation.valider('E-00000213455'))
+        self.assertFalse(numerotation.valider('ABCD1234'))
+
+    def test_numeros_croissants_par_prefixe(self):
+        e1, e2 = self.creer_expedition(), self.creer_expedition()
+        self.assertTrue(e1.numero_suivi.startswith('E-'))
+        self.assertLess(e1.numero_suivi, e2.numero_suivi)
+        tournee = Tournee.objects.create(date=date.today())
+        self.assertTrue(numerotation.valider(tournee.numero_tournee))
+        self.assertTrue(tournee.numero_tournee.startswith('T-'))
+
+    def test_allocation_groupee(self):
+        numeros = numerotation.allouer('X', 5)
+        self.assertEqual(len(set(numeros)), 5)
+        self.assertEqual(numeros, sorted(numeros))
+        self.assertGreater(numerotation.numero('X'), numeros[-1])
+
+
+class NumerotationConcurrenteTests(TransactionTestCase):
+
+    def test_workers_concurrents_sans_collision(self):
+        numeros, erreurs = [], []
+
+        def worker():
+            try:
+                for _ in range(40):
+                    numeros.append(numerotation.numero('C'))
+            except Exception as exc:  # pragma: no cover - remonté par l'assertion
+                erreurs.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(erreurs, [])
+        self.assertEqual(len(set(numeros)), 240)
+        # Un autre worker (cache vidé) repart après tous les blocs déjà réservés
+        numerotation._blocs.clear()
+        self.assertGreater(numerotation.numero('C'), max(numeros))
+
+
+class ExportTests(DonneesMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.e1 = cls.creer_expedition(description='Colis, "fragile"')
+        cls.e2 = cls.creer_expedition(statut='LIVRE', client=cls.client_b)
+        cls.facture = Facture.objects.create(client=cls.client_a, date_echeance=date.today(),
+                                             montant_ht=Decimal("50.00"), taux_tva=Decimal("19.00"))
+        FactureExpedition.objects.create(facture=cls.facture, expedition=cls.e1)
+        FactureExpedition.objects.create(facture=cls.facture, expedition=cls.e2)
+
+    def contenu(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_filtre(self):
+        response = self.client.get('/api/expeditions/export/', {'format': 'csv', 'client': self.client_a.id})
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        lignes = list(csv.DictReader(self.contenu(response).splitlines()))
+        self.assertEqual([l['numero_suivi'] for l in lignes], [self.e1.numero_suivi])
+        self.assertEqual(lignes[0]['description'], 'Colis, "fragile"')
+        self.assertEqual(lignes[0]['nom_client'], 'Client A')
+
+    def test_ndjson_facture_avec_lignes(self):
+        response = self.client.get('/api/factures/export/', {'format': 'ndjson'})
+        lignes = [json.loads(l) for l in self.contenu(response).splitlines()]
+        self.assertEqual(sorted(l['expedition_numero'] for l in lignes),
+                         sorted([self.e1.numero_suivi, self.e2.numero_suivi]))
+        self.assertEqual({l['numero_facture'] for l in lignes}, {self.facture.numero_facture})
+
+    def test_suivi_et_format_inconnu(self):
+        TrackingHistorique.objects.create(expedition=self.e1, lieu="Hub", statut="CENTRE_TRI")
+        lignes = self.contenu(self.client.get('/api/tracking/export/?format=csv')).splitlines()
+        self.assertEqual(len(lignes), 2)
+        self.assertEqual(self.client.get('/api/tracking/export/?format=xml').status_code, 404)
+
+    async def test_asgi_par_paquets(self):
+        with mock.patch('core.exports.TAILLE_CHUNK', 1):
+            response = await self.async_client.get('/api/expeditions/export/', {'format': 'ndjson'},
+                                                   headers=self.entete)
+            self.assertTrue(response.is_async)
+            paquets = [paquet async for paquet in response.streaming_content]
+        self.assertEqual([json.loads(p)['numero_suivi'] for p in paquets],
+                         [self.e1.numero_suivi, self.e2.numero_suivi])
+
+
+class SuiviTests(DonneesMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.expedition = self.creer_expedition()
+        self.url = f'/api/track/{self.expedition.numero_suivi}/'
+
+    def test_dernier_evenement_denormalise(self):
+        TrackingHistorique.objects.create(expedition=self.expedition, lieu="Alger", statut="CENTRE_TRI")
+        TrackingHistorique.objects.create(expedition=self.expedition, lieu="Oran", statut="LIVRAISON")
+        self.expedition.refresh_from_db()
+        self.assertEqual((self.expedition.dernier_lieu, self.expedition.dernier_statut_suivi), ("Oran", "LIVRAISON"))
+
+        TrackingHistorique.objects.filter(lieu="Oran").get().delete()
+        self.expedition.refresh_from_db()
+        self.assertEqual(self.expedition.dernier_lieu, "Alger")
+
+    def test_evenement_unitaire_suit_les_transitions(self):
+        response = self.client.post('/api/tracking/', {
+            'expedition': self.expedition.id, 'lieu': "Oran", 'statut': 'LIVRE',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.expedition.refresh_from_db()
+        self.assertEqual((self.expedition.statut, self.expedition.dernier_statut_suivi), ('LIVRE', 'LIVRE'))
+        self.assertEqual(statistiques.totaux_par_cle('statut')['LIVRE'][0], 1)
+
+        # LIVRE est final : le scan est gardé dans l'historique, sans effet sur l'expédition
+        TrackingHistorique.objects.create(expedition=self.expedition, lieu="Alger", statut="EN_TRANSIT")
+        self.expedition.refresh_from_db()
+        self.assertEqual((self.expedition.statut, self.expedition.dernier_statut_suivi, self.expedition.dernier_lieu),
+                         ('LIVRE', 'LIVRE', "Oran"))
+        self.assertEqual(self.expedition.tracking.count(), 2)
+
+    def test_consultation_et_cache(self):
+        self.assertEqual(self.client.get(self.url).data['evenements'], [])
+        TrackingHistorique.objects.create(expedition=self.expedition, lieu="Alger", statut="CENTRE_TRI",
+                                          commentaire="Client absent, rappeler le 0600000000")
+
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(self.url).data
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(data['evenements'][0].keys(), {'date_heure', 'lieu', 'statut'})
+        self.assertEqual([e['lieu'] for e in data['evenements']], ["Alger"])
+        self.assertEqual(data['dernier_lieu'], "Alger")
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        self.expedition.statut = 'LIVRE'
+        self.expedition.save()
+        self.assertEqual(self.client.get(self.url).data['statut'], 'LIVRE')
+
+    def test_limite_et_inconnu(self):
+        for i in range(5):
+            TrackingHistorique.objects.create(expedition=self.expedition, lieu=f"L{i}", statut="CENTRE_TRI")
+        self.assertEqual(len(self.client.get(self.url, {'limit': 2}).data['evenements']), 2)
+        self.assertEqual(self.client.get('/api/track/INCONNU/').status_code, 404)
+
+    def test_filtre_liste_par_expedition(self):
+        autre = self.creer_expedition()
+        TrackingHistorique.objects.create(expedition=self.expedition, lieu="A", statut="CENTRE_TRI")
+        TrackingHistorique.objects.create(expedition=autre, lieu="B", statut="CENTRE_TRI")
+        response = self.client.get('/api/tracking/', {'expedition': autre.id})
+        self.assertEqual([t['lieu'] for t in response.data['results']], ["B"])
+
+
+class ImportSuiviTests(DonneesMixin, APITestCase):
+    url = '/api/tracking/bulk/'
+
+    def setUp(self):
+        super().setUp()
+        self.a, self.b = self.creer_expedition(), self.creer_expedition(destination=self.lyon)
+
+    def scan(self, expedition, statut, heure, lieu="Hub Alger"):
+        return {'numero_suivi': expedition.numero_suivi, 'lieu': lieu, 'statut': statut,
+                'date_heure': f'2026-03-01T{heure}:00Z'}
+
+    def test_statuts_doublons_et_erreurs(self):
+        self.client.get(f'/api/track/{self.a.numero_suivi}/')  # mis en cache
+        lignes = [
+            self.scan(self.a, 'CENTRE_TRI', '08:00'),
+            self.scan(self.a, 'LIVRAISON', '10:00', lieu="Oran"),
+            self.scan(self.a, 'CENTRE_TRI', '08:00'),
+            self.scan(self.b, 'CENTRE_TRI', '09:00'),
+            {'numero_suivi': 'INCONNU', 'lieu': "x", 'statut': 'LIVRE'},
+            self.scan(self.b, 'PERDU', '09:30'),
+        ]
+        response = self.client.post(self.url, lignes, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['crees'], response.data['doublons'], response.data['expeditions_modifiees']),
+                         (3, 1, 2))
+        self.assertEqual([e['ligne'] for e in response.data['erreurs']], [5, 6])
+
+        self.a.refresh_from_db()
+        self.assertEqual((self.a.statut, self.a.dernier_lieu), ('LIVRAISON', "Oran"))
+        par_statut = statistiques.totaux_par_cle('statut')
+        self.assertEqual((par_statut['LIVRAISON'][0], par_statut['CENTRE_TRI'][0], par_statut['EN_TRANSIT'][0]),
+                         (1, 1, 0))
+        self.assertEqual(self.client.get(f'/api/track/{self.a.numero_suivi}/').data['statut'], 'LIVRAISON')
+
+        # Lot renvoyé par le terminal : rien de nouveau
+        response = self.client.post(self.url, lignes[:4], format='json')
+        self.assertEqual((response.status_code, response.data['crees'], response.data['doublons']), (200, 0, 4))
+        self.assertEqual(TrackingHistorique.objects.count(), 3)
+
+    def test_scan_en_retard_et_requetes_par_lot(self):
+        self.client.post(self.url, [self.scan(self.a, 'LIVRE', '12:00')], format='json')
+        corps = json.dumps(self.scan(self.a, 'CENTRE_TRI', '07:00')) + '\n'
+        self.client.post(self.url, corps, content_type='application/x-ndjson')
+        self.a.refresh_from_db()
+        self.assertEqual((self.a.statut, self.a.tracking.count()), ('LIVRE', 2))
+
+        # LIVRE est final (core/etats.py) : le scan est gardé, le statut et le suivi affiché non
+        self.client.post(self.url, [self.scan(self.a, 'ECHEC', '12:30')], format='json')
+        self.a.refresh_from_db()
+        self.assertEqual((self.a.statut, self.a.dernier_statut_suivi, self.a.tracking.count()), ('LIVRE', 'LIVRE', 3))
+
+        # Scan refusé plus récent qu'un scan accepté : le suivi affiché reste celui du scan accepté
+        d = self.creer_expedition()
+        self.client.post(self.url, [self.scan(d, 'LIVRAISON', '10:00')], format='json')
+        self.client.post(self.url, [self.scan(d, 'EN_TRANSIT', '12:30', lieu="Oran")], format='json')
+        self.client.post(self.url, [self.scan(d, 'LIVRE', '11:00', lieu="Blida")], format='json')
+        d.refresh_from_db()
+        self.assertEqual(
+            (d.statut, d.dernier_statut_suivi, d.dernier_lieu, d.date_dernier_evenement.hour),
+            ('LIVRE', 'LIVRE', "Blida", 11),
+        )
+
+        c = self.creer_expedition()
+
+        def requetes(n, heure, statut_b, statut_c):
+            lignes = [self.scan(expedition, statut, f'{heure}:{i:02d}')
+                      for i in range(n) for expedition, statut in ((self.b, statut_b), (c, statut_c))]
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.post(self.url, lignes, format='json')
+            return len(ctx.captured_queries)
+        requetes(1, 13, 'CENTRE_TRI', 'LIVRAISON')
+        self.assertEqual(requetes(5, 14, 'LIVRAISON', 'CENTRE_TRI'), requetes(50, 15, 'CENTRE_TRI', 'LIVRAISON'))
+
+
+class TransitionTests(DonneesMixin, APITestCase):
+
+    def test_transition_en_masse_expeditions(self):
+        expeditions = [self.creer_expedition() for _ in range(3)]
+        livree = self.creer_expedition(statut='LIVRE')
+        ids = [e.id for e in expeditions] + [livree.id, 999999]
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/expeditions/transition/',
+                                        {'ids': ids, 'statut': 'LIVRAISON', 'lieu': "Hub Oran"}, format='json')
+        mises_a_jour = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "core_expedition"')]
+        self.assertEqual(len(mises_a_jour), 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['modifies'], [e.id for e in expeditions])
+        self.assertEqual(response.data['refuses'], [{'id': livree.id, 'statut': 'LIVRE'}])
+        self.assertEqual(response.data['inconnus'], [999999])
+
+        self.assertEqual(TrackingHistorique.objects.filter(statut='LIVRAISON', lieu="Hub Oran").count(), 3)
+        self.assertEqual(statistiques.totaux_par_cle('statut')['LIVRAISON'][0], 3)
+        suivi = self.client.get(f'/api/track/{expeditions[0].numero_suivi}/').data
+        self.assertEqual((suivi['statut'], suivi['dernier_lieu']), ('LIVRAISON', "Hub Oran"))
+
+        response = self.client.post('/api/expeditions/transition/', {'ids': [livree.id], 'statut': 'ECHEC'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        response = self.client.patch(f'/api/expeditions/{livree.id}/', {'statut': 'EN_TRANSIT'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('statut', response.data)
+
+    def test_tournee_entraine_ses_expeditions(self):
+        tournee = Tournee.objects.create(date=date.today(), chauffeur=self.chauffeur, vehicule=self.vehicule)
+        a, b, livree = self.creer_expedition(), self.creer_expedition(), self.creer_expedition(statut='LIVRE')
+        for ordre, expedition in enumerate((a, b, livree)):
+            TourneeExpedition.objects.create(tournee=tournee, expedition=expedition, ordre=ordre)
+
+        response = self.client.post('/api/tournees/transition/', {'ids': [tournee.id], 'statut': 'EN_COURS'},
+                                    format='json')
+        self.assertEqual((response.data['modifies'], response.data['expeditions']), ([tournee.id], 2))
+        self.assertEqual(set(Expedition.objects.values_list('statut', flat=True)), {'LIVRAISON', 'LIVRE'})
+        self.assertEqual(a.tracking.get().commentaire, f"Tournée {tournee.numero_tournee}")
+
+        # Même cascade par PATCH de la tournée
+        Expedition.objects.filter(pk=a.pk).update(statut='LIVRE')
+        self.client.patch(f'/api/tournees/{tournee.id}/', {'statut': 'TERMINEE'}, format='json')
+        self.assertEqual(Expedition.objects.get(pk=b.pk).statut, 'ECHEC')
+        self.assertEqual(Expedition.objects.get(pk=a.pk).statut, 'LIVRE')
+
+    def test_factures_grand_livre(self):
+        factures = [Facture.objects.create(client=self.client_a, date_echeance=date.today(),
+                                           montant_ht=Decimal("100.00")) for _ in range(2)]
+        ids = [f.id for f in factures]
+        self.client.post('/api/factures/transition/', {'ids': ids, 'statut': 'EMISE'}, format='json')
+        self.client_a.refresh_from_db()
+        self.assertEqual(self.client_a.solde, Decimal("238.00"))
+        self.assertEqual(CompteurStatut.objects.get(modele='facture', statut='EMISE').nombre, 2)
+
+        response = self.client.post('/api/factures/transition/', {'ids': ids[:1], 'statut': 'ANNULEE'}, format='json')
+        self.assertEqual(response.data['modifies'], ids[:1])
+        self.client_a.refresh_from_db()
+        self.assertEqual(self.client_a.solde, Decimal("119.00"))
+        self.assertEqual(comptabilite.reconstruire(), 2)
+        self.client_a.refresh_from_db()
+        self.assertEqual(self.client_a.solde, Decimal("119.00"))
+
+        response = self.client.post('/api/factures/transition/', {'ids': ids, 'statut': 'PAYEE'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        response = self.client.post('/api/factures/transition/', {'ids': 'x', 'statut': 'EMISE'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class RechercheTests(DonneesMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.societe = Client.objects.create(nom="Société Benali Frères", adresse="x", telephone="0661 23 45 67")
+        self.frigo = self.creer_expedition(client=self.societe, description="Réfrigérateur fragile, réfrigérateur")
+        self.carton = self.creer_expedition(description="Carton de réfrigérants")
+
+    def resultats(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [ligne['id'] for ligne in response.data['results']]
+
+    def test_prefixes_accents_et_mises_a_jour(self):
+        self.assertEqual(self.resultats('/api/clients/?q=societe ben'), [self.societe.id])
+        self.assertEqual(self.resultats('/api/clients/?q=0661'), [self.societe.id])
+        self.assertEqual(self.resultats('/api/destinations/?q=lyo'), [self.lyon.id])
+        self.assertEqual(self.resultats(f'/api/expeditions/?q={self.frigo.numero_suivi.lower()}'), [self.frigo.id])
+        self.assertEqual(self.resultats(f'/api/expeditions/?q={self.frigo.numero_suivi[:-1]}'), [self.frigo.id])
+        self.assertEqual(self.resultats(f'/api/expeditions/?q={self.frigo.numero_suivi[2:]}'), [self.frigo.id])
+        self.assertEqual(self.resultats('/api/expeditions/?q=E-'), [self.carton.id, self.frigo.id])
+        self.assertEqual(self.resultats('/api/expeditions/?q=refrig&statut=EN_TRANSIT'),
+                         [self.carton.id, self.frigo.id])
+        self.assertEqual(self.resultats('/api/expeditions/?q=NOT'), [])
+
+        # Index tenu par triggers : save(), update() en masse, suppression
+        self.societe.nom = "Transports Kaci"
+        self.societe.save()
+        Expedition.objects.filter(pk=self.carton.pk).update(description="Palette")
+        Destination.objects.filter(pk=self.lyon.pk).delete()
+        self.assertEqual(self.resultats('/api/clients/?q=benali'), [])
+        self.assertEqual(self.resultats('/api/clients/?q=kaci'), [self.societe.id])
+        self.assertEqual(self.resultats('/api/expeditions/?q=refrig'), [self.frigo.id])
+        self.assertEqual(self.resultats('/api/destinations/?q=lyo'), [])
+
+    def test_anciens_numeros_de_suivi(self):
+        Expedition.objects.filter(pk=self.carton.pk).update(numero_suivi='8540CA7A')
+        for texte in ('8540CA7A', '8540', '8540ca7a'):
+            self.assertEqual([e['id'] for e in recherche.suggestions(texte)['expeditions']], [self.carton.id])
+        self.assertEqual(self.resultats('/api/expeditions/?q=8540CA7A'), [self.carton.id])
+        # Sans chiffre, un mot reste cherché dans les descriptions
+        self.assertEqual(self.resultats('/api/expeditions/?q=fac'), [])
+
+    def test_autocompletion_classee(self):
+        colissimo = self.creer_expedition(description="Colissimo")
+        colis = self.creer_expedition(description="Petit colis")
+        response = self.client.get('/api/search/', {'q': 'colis'})
+        self.assertEqual(response.status_code, 200)
+        # Mot entier avant simple préfixe, même dans un texte plus long
+        self.assertEqual([e['id'] for e in response.data['expeditions']], [colis.id, colissimo.id])
+        self.assertEqual(response.data['clients'], [])
+
+        response = self.client.get('/api/search/', {'q': 'ben', 'types': 'clients', 'limit': 1})
+        self.assertEqual(list(response.data), ['clients', 'q'])
+        self.assertEqual(response.data['clients'], [
+            {'id': self.societe.id, 'nom': "Société Benali Frères", 'telephone': "0661 23 45 67"},
+        ])
+
+        self.assertEqual(self.client.get('/api/search/', {'q': ' - '}).status_code, 400)
+        self.assertEqual(self.client.get('/api/search/', {'q': 'x', 'types': 'factures'}).status_code, 400)
+
+class RoutageTests(DonneesMixin, APITestCase):
+
+    def test_matrice_table_puis_coordonnees(self):
+        alger = Destination.objects.create(ville="Alger", pays="DZ", tarif_base=Decimal("1.00"),
+                                           latitude=36.75, longitude=3.06)
+        oran = Destination.objects.create(ville="Oran", pays="DZ", tarif_base=Decimal("1.00"),
+                                          latitude=35.70, longitude=-0.63)
+        DistanceDestination.objects.create(origine=self.paris, arrivee=self.lyon, distance_km=465)
+        matrice = routage.matrice_distances([self.paris.id, self.lyon.id, alger.id, oran.id])
+        self.assertEqual(matrice[1, 0], 465)  # symétrique
+        self.assertAlmostEqual(matrice[2, 3], 354, delta=5)
+        self.assertEqual(matrice[0, 2], routage.DISTANCE_INCONNUE)
+        self.assertTrue((np.diag(matrice) == 0).all())
+
+    def test_optimiser_points_alignes(self):
+        # Points sur une droite visités dans le désordre : l'optimum est 0, 1, 2, ...
+        positions = np.array([0, 7, 2, 9, 1, 5, 3, 8, 4, 6], dtype=float)
+        matrice = np.abs(positions[:, None] - positions[None, :])
+        ordre = routage.optimiser(matrice)
+        self.assertEqual(ordre[0], 0)
+        self.assertEqual(sorted(ordre), list(range(10)))
+        self.assertEqual(routage.longueur(matrice, ordre), 9)
+
+    def test_endpoint_optimize(self):
+        villes = []
+        for i, x in enumerate([0, 3, 1, 2]):
+            villes.append(Destination.objects.create(ville=f"V{i}", pays="FR", tarif_base=Decimal("1.00"),
+                                                     latitude=45.0, longitude=float(x)))
+        tournee = Tournee.objects.create(date=date.today(), chauffeur=self.chauffeur, vehicule=self.vehicule)
+        for i, ville in enumerate(villes):
+            TourneeExpedition.objects.create(tournee=tournee, expedition=self.creer_expedition(destination=ville),
+                                             ordre=i)
+
+        response = self.client.post(f'/api/tournees/{tournee.id}/optimize/')
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(response.data['longueur_optimisee'], response.data['longueur_initiale'])
+        ordre = TourneeExpedition.objects.filter(tournee=tournee).order_by('ordre')
+        self.assertEqual([te.expedition.destination.ville for te in ordre], ["V0", "V2", "V3", "V1"])
+
+        # Déjà optimale : gain nul, rien n'est réécrit
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(f'/api/tournees/{tournee.id}/optimize/')
+        self.assertEqual(response.data['gain'], 0)
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')])
+
+
+class PlanificationTests(DonneesMixin, APITestCase):
+
+    def test_repartir_capacite_et_proximite(self):
+        # Deux zones éloignées, deux véhicules de 10 kg : une zone par véhicule
+        matrice = np.array([[0, 5, 500], [5, 0, 500], [500, 500, 0]], dtype=float)
+        poids = [5, 5, 4, 4, 3]
+        destinations = [0, 2, 1, 2, 0]
+        affectation = planification.repartir(poids, [0] * 5, destinations, [10, 10], [np.inf, np.inf], matrice)
+        self.assertEqual(affectation[4], -1)  # ne tient plus nulle part
+        self.assertEqual(affectation[0], affectation[2])
+        self.assertEqual(affectation[1], affectation[3])
+        self.assertNotEqual(affectation[0], affectation[1])
+
+    def test_endpoint_planifier(self):
+        occupe = Chauffeur.objects.create(nom="Occupé", permis="B")
+        Chauffeur.objects.create(nom="Absent", permis="B", disponible=False)
+        Vehicule.objects.create(matricule="AA-2", type_vehicule="Camion", capacite=5)
+        Tournee.objects.create(date=date.today(), chauffeur=occupe, vehicule=None)
+        expeditions = [self.creer_expedition(poids=2) for _ in range(3)]
+        self.creer_expedition(statut='LIVRE')
+
+        response = self.client.post('/api/tournees/planifier/', {'date': str(date.today())}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['affectees'], 3)
+        [tournee] = response.data['tournees']
+        self.assertEqual(tournee['chauffeur'], self.chauffeur.id)
+        self.assertEqual(tournee['vehicule'], self.vehicule.id)
+        liens = TourneeExpedition.objects.filter(tournee_id=tournee['id'])
+        self.assertEqual(sorted(liens.values_list('expedition', flat=True)), [e.id for e in expeditions])
+
+        # Rien de plus à planifier
+        response = self.client.post('/api/tournees/planifier/', {'date': str(date.today())}, format='json')
+        self.assertEqual(response.data['tournees'], [])
+
+
+class ImbricationTests(DonneesMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for i in range(3):
+            tournee = Tournee.objects.create(date=date.today(), chauffeur=cls.chauffeur, vehicule=cls.vehicule)
+            facture = Facture.objects.create(client=cls.client_a, date_echeance=date.today(),
+                                             montant_ht=Decimal("10.00"), taux_tva=Decimal("19.00"))
+            for ordre in range(i + 2):
+                expedition = cls.creer_expedition(destination=cls.lyon if ordre % 2 else cls.paris)
+                TourneeExpedition.objects.create(tournee=tournee, expedition=expedition, ordre=ordre)
+                FactureExpedition.objects.create(facture=facture, expedition=expedition)
+
+    def get(self, url, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(ctx.captured_queries)
+
+    def test_requetes_constantes(self):
+        for url in ('/api/tournees/', '/api/factures/'):
+            data, requetes = self.get(url)
+            self.assertEqual(requetes, 2, url)
+            self.assertEqual(sum(len(o['expeditions']) for o in data['results']), 2 + 3 + 4)
+            self.assertEqual(data['results'][0]['expeditions'][0]['expedition_detail']['nom_client'], "Client A")
+
+    def test_expand_et_fields(self):
+        data, requetes = self.get('/api/tournees/', {'expand': ''})
+        self.assertEqual(requetes, 1)
+        self.assertNotIn('expeditions', data['results'][0])
+        self.assertIn('chauffeur_nom', data['results'][0])
+
+        data, requetes = self.get('/api/factures/', {'fields': 'id,numero_facture'})
+        self.assertEqual(requetes, 1)
+        self.assertEqual(set(data['results'][0]), {'id', 'numero_facture'})
+
+        data, requetes = self.get('/api/tournees/', {'fields': 'id,expeditions'})
+        self.assertEqual(requetes, 2)
+        self.assertEqual(set(data['results'][0]), {'id', 'expeditions'})
+
+
+class FacturationTests(DonneesMixin, APITestCase):
+    url = '/api/factures/generer/'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.jour = date.today()
+        cls.a1 = cls.creer_expedition(statut='LIVRE', montant_total=Decimal("100.00"))
+        cls.a2 = cls.creer_expedition(statut='LIVRE', montant_total=Decimal("50.00"))
+        cls.b1 = cls.creer_expedition(statut='LIVRE', client=cls.client_b, montant_total=Decimal("20.00"))
+        cls.creer_expedition(statut='EN_TRANSIT')
+        # Créée le mois dernier, livrée depuis : facturée maintenant ; créée après la période : non
+        cls.a3 = cls.creer_expedition(statut='LIVRE')
+        Expedition.objects.filter(pk=cls.a3.pk).update(date_creation=cls.a3.date_creation - timedelta(days=40),
+                                                       montant_total=Decimal("30.00"))
+        future = cls.creer_expedition(statut='LIVRE', client=cls.client_b)
+        Expedition.objects.filter(pk=future.pk).update(date_creation=future.date_creation + timedelta(days=2))
+
+    def periode(self):
+        return {'fin': str(self.jour)}
+
+    def test_generation_idempotente(self):
+        response = self.client.post(self.url, self.periode(), format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['factures_creees'], response.data['expeditions_facturees']), (2, 4))
+
+        facture_a = Facture.objects.get(client=self.client_a)
+        self.assertEqual((facture_a.statut, facture_a.montant_ht, facture_a.montant_ttc),
+                         ('EMISE', Decimal("180.00"), Decimal("214.20")))
+        self.assertEqual(sorted(facture_a.expeditions.values_list('expedition', flat=True)),
+                         [self.a1.id, self.a2.id, self.a3.id])
+        self.assertEqual(CompteurStatut.objects.get(modele='facture', statut='EMISE').nombre, 2)
+
+        # Relance : rien de nouveau, sauf une livraison arrivée entre-temps
+        self.client.post(self.url, self.periode(), format='json')
+        self.assertEqual(Facture.objects.count(), 2)
+        self.creer_expedition(statut='LIVRE', client=self.client_b, montant_total=Decimal("5.00"))
+        response = self.client.post(self.url, self.periode(), format='json')
+        self.assertEqual(Facture.objects.count(), 3)
+        self.assertEqual(FactureExpedition.objects.count(), 5)
+        self.assertEqual(ExecutionFacturation.objects.count(), 1)
+
+    def test_reprise_apres_echec(self):
+        lot = facturation._facturer_lot
+        appels = []
+
+        def echoue_au_second(*args):
+            appels.append(args)
+            if len(appels) == 2:
+                raise RuntimeError("coupure")
+            return lot(*args)
+
+        with mock.patch.object(facturation, '_facturer_lot', echoue_au_second):
+            with self.assertRaises(RuntimeError):
+                facturation.facturer(self.jour, taille_lot=1)
+        execution = ExecutionFacturation.objects.get()
+        self.assertEqual((execution.statut, execution.verrou, execution.dernier_client),
+                         ('ECHEC', False, self.client_a.id))
+
+        execution = facturation.facturer(self.jour, taille_lot=1)
+        self.assertEqual((execution.statut, execution.factures_creees), ('TERMINEE', 2))
+        self.assertEqual(Facture.objects.filter(client=self.client_a).count(), 1)
+        self.assertEqual(FactureExpedition.objects.count(), 4)
+
+    def test_verrou(self):
+        ExecutionFacturation.objects.create(fin=self.jour - timedelta(days=1), verrou=True)
+        self.assertEqual(self.client.post(self.url, self.periode(), format='json').status_code, 409)
+        self.assertFalse(Facture.objects.exists())
+
+
+class GrandLivreTests(DonneesMixin, APITestCase):
+
+    def solde(self):
+        self.client_a.refresh_from_db()
+        return self.client_a.solde
+
+    def test_emission_paiements_et_statut(self):
+        facture = Facture.objects.create(client=self.client_a, date_echeance=date.today(),
+                                         montant_ht=Decimal("100.00"))
+        self.assertEqual(self.solde(), 0)  # brouillon : rien de dû
+        facture.statut = 'EMISE'
+        facture.save()
+        self.assertEqual(self.solde(), Decimal("119.00"))
+
+        response = self.client.post('/api/paiements/', {'facture': facture.id, 'montant': '19.00',
+                                                        'mode_paiement': 'CARTE'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        paiement = Paiement.objects.create(facture=facture, montant=Decimal("100.00"), mode_paiement='VIREMENT')
+        facture.refresh_from_db()
+        self.assertEqual((facture.statut, self.solde()), ('PAYEE', Decimal("0.00")))
+
+        paiement.delete()
+        facture.refresh_from_db()
+        self.assertEqual((facture.statut, self.solde()), ('EMISE', Decimal("100.00")))
+        self.assertEqual(
+            list(EcritureClient.objects.filter(client=self.client_a).order_by('id')
+                 .values_list('type_ecriture', 'debit', 'credit')),
+            [('FACTURE', Decimal("119.00"), 0), ('PAIEMENT', 0, Decimal("19.00")),
+             ('PAIEMENT', 0, Decimal("100.00")), ('ANNULATION', Decimal("100.00"), 0)],
+        )
+        self.assertEqual(CompteurStatut.objects.get(modele='facture', statut='PAYEE').nombre, 0)
+
+    def test_annulation_suppression_et_reconstruction(self):
+        facture = Facture.objects.create(client=self.client_a, date_echeance=date.today(),
+                                         montant_ht=Decimal("10.00"), statut='EMISE')
+        Paiement.objects.create(facture=facture, montant=Decimal("5.00"), mode_paiement='CARTE')
+        self.assertEqual(self.solde(), Decimal("6.90"))
+        facture.delete()
+        self.assertEqual(self.solde(), 0)
+
+        facture = Facture.objects.create(client=self.client_a, date_echeance=date.today(),
+                                         montant_ht=Decimal("10.00"), statut='EMISE')
+        facture.statut = 'ANNULEE'
+        facture.save()
+        self.assertEqual(self.solde(), 0)
+
+        Client.objects.filter(pk=self.client_a.pk).update(solde=Decimal("999"))
+        comptabilite.reconstruire()
+        self.assertEqual(self.solde(), 0)
+
+        facture_b = Facture.objects.create(client=self.client_b, date_echeance=date.today(),
+                                           montant_ht=Decimal("10.00"), statut='EMISE')
+        Paiement.objects.create(facture=facture_b, montant=Decimal("1.00"), mode_paiement='CARTE')
+        self.client_b.delete()  # cascade sans écriture orpheline
+        self.assertFalse(EcritureClient.objects.filter(client_id=self.client_b.id).exists())
+
+
+class CreancesTests(DonneesMixin, APITestCase):
+    url = '/api/analytics/receivables/'
+
+    def facture(self, client, jours_retard, montant_ht, statut='EMISE'):
+        return Facture.objects.create(client=client, date_echeance=date.today() - timedelta(days=jours_retard),
+                                      montant_ht=Decimal(montant_ht), statut=statut)
+
+    def test_tranches_et_pagination(self):
+        self.facture(self.client_a, -5, "100.00")      # 119 non échu
+        f = self.facture(self.client_a, 45, "100.00")  # 119 - 19 en 31-60
+        Paiement.objects.create(facture=f, montant=Decimal("19.00"), mode_paiement='CARTE')
+        self.facture(self.client_a, 120, "10.00")      # 11.90 au-delà de 90 jours
+        self.facture(self.client_a, 10, "10.00", statut='BROUILLON')
+        self.facture(self.client_b, 0, "10.00")        # 11.90 en 0-30
+
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(self.url, {'page_size': 1}).data
+        self.assertEqual(len(ctx.captured_queries), 2)  # page de clients + agrégat
+        [ligne] = data['results']
+        self.assertEqual(ligne['client'], self.client_a.id)
+        self.assertEqual(
+            [ligne[c] for c in ('nombre_factures', 'non_echu', 'jours_0_30', 'jours_31_60', 'jours_61_90',
+                                'jours_90_plus', 'paye', 'reste_du')],
+            [3, Decimal("119.00"), 0, Decimal("100.00"), 0, Decimal("11.90"), Decimal("19.00"), Decimal("230.90")],
+        )
+        self.assertEqual(ligne['solde'], ligne['reste_du'])
+
+        suivante = self.client.get(data['next']).data
+        self.assertEqual([(l['client'], l['jours_0_30']) for l in suivante['results']],
+                         [(self.client_b.id, Decimal("11.90"))])
+
+        # Réponse mise en cache quelques secondes
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url, {'page_size': 1})
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+
+class ReferentielCacheTests(DonneesMixin, APITestCase):
+    url = '/api/destinations/'
+
+    def get(self, url, **headers):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, headers=headers)
+        return response, len(ctx.captured_queries)
+
+    def test_cache_etag_et_invalidation(self):
+        premiere, requetes = self.get(self.url)
+        self.assertEqual(requetes, 1)
+        etag = premiere['ETag']
+        self.assertIn('Last-Modified', premiere)
+
+        seconde, requetes = self.get(self.url)
+        self.assertEqual((requetes, seconde['ETag']), (0, etag))
+        self.assertEqual(seconde.data, premiere.data)
+
+        reponse, requetes = self.get(self.url, if_none_match=etag)
+        self.assertEqual((reponse.status_code, requetes), (304, 0))
+        reponse, _ = self.get(f'{self.url}{self.paris.id}/', if_none_match=etag)
+        self.assertEqual(reponse.status_code, 200)  # autre ressource, autre ETag
+
+        self.client.patch(f'{self.url}{self.paris.id}/', {'ville': "Paris 15"}, format='json')
+        reponse, requetes = self.get(self.url, if_none_match=etag)
+        self.assertEqual((reponse.status_code, requetes), (200, 1))
+        self.assertNotEqual(reponse['ETag'], etag)
+        self.assertIn("Paris 15", [d['ville'] for d in reponse.data['results']])
+
+    def test_tables_independantes(self):
+        self.get('/api/types-service/')
+        Chauffeur.objects.create(nom="Nouveau", permis="C")
+        _, requetes = self.get('/api/types-service/')
+        self.assertEqual(requetes, 0)
+        reponse, _ = self.get('/api/chauffeurs/')
+        self.assertEqual(len(reponse.data['results']), 2)
+
+
+class DevisTests(DonneesMixin, APITestCase):
+    url = '/api/quotes/'
+
+    def test_devis_egal_au_prix_enregistre(self):
+        reponse = self.client.post(self.url, {
+            'destination': self.lyon.id, 'service': self.standard.id, 'poids': 2.35, 'volume': 0.15,
+        }, format='json')
+        self.assertEqual(reponse.status_code, 200)
+        expedition = self.creer_expedition(destination=self.lyon, poids=2.35, volume=0.15)
+        expedition.refresh_from_db()
+        self.assertEqual(Decimal(reponse.data['montant_total']), expedition.montant_total)
+        self.assertEqual(expedition.montant_total, Decimal('17.45'))
+
+        reponse = self.client.post(self.url, {'destination': self.lyon.id, 'poids': 'x'}, format='json')
+        self.assertEqual(reponse.status_code, 400)
+        self.assertEqual(set(reponse.data), {'service', 'poids', 'volume'})
+
+    def test_lot_et_grilles_en_memoire(self):
+        lignes = [
+            {'destination': self.paris.id, 'service': self.standard.id, 'poids': 1, 'volume': 1},
+            {'destination': 999999, 'service': self.standard.id, 'poids': 1, 'volume': 1},
+            'texte',
+            {'destination': self.lyon.id, 'service': self.standard.id, 'poids': 0.5, 'volume': 0},
+        ]
+        self.client.post(self.url, lignes[:1], format='json')
+        with CaptureQueriesContext(connection) as ctx:
+            reponse = self.client.post(self.url, lignes[:1] * 500, format='json')
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(len(reponse.data['resultats']), 500)
+
+        reponse = self.client.post(self.url, lignes, format='json')
+        self.assertEqual([r['montant_total'] for r in reponse.data['resultats']], ['17.00', '13.00'])
+        self.assertEqual([e['ligne'] for e in reponse.data['erreurs']], [2, 3])
+
+        # Modifier une grille invalide la mémoire
+        self.client.patch(f'/api/destinations/{self.paris.id}/', {'tarif_base': '20.00'}, format='json')
+        reponse = self.client.post(self.url, lignes[:1], format='json')
+        self.assertEqual(reponse.data['resultats'][0]['montant_total'], '27.00')
+
+    def test_save_lit_les_tarifs_en_base(self):
+        self.client.post(self.url, {'destination': self.paris.id, 'service': self.standard.id, 'poids': 1, 'volume': 1},
+                         format='json')
+        # Tarif changé par un autre processus : version locale inchangée, mémoire périmée
+        Destination.objects.filter(pk=self.paris.pk).update(tarif_base=Decimal("40.00"))
+        expedition = self.creer_expedition(poids=1, volume=1)
+        self.assertEqual(expedition.montant_total, Decimal("47.00"))
+
+
+class MetriquesTests(DonneesMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        for histogramme in metriques.HISTOGRAMMES:
+            histogramme.vider()
+
+    def test_exposition_par_vue(self):
+        self.creer_expedition()
+        self.client.get('/api/expeditions/')
+        self.client.get('/api/analytics/dashboard/')
+        self.client.post('/api/quotes/', {}, format='json')
+
+        reponse = self.client.get('/metrics')
+        self.assertEqual(reponse.status_code, 200)
+        texte = reponse.content.decode()
+        self.assertIn('transport_http_request_duration_seconds_count'
+                      '{view="ExpeditionViewSet.list",method="GET",status="200"} 1', texte)
+        self.assertIn('transport_db_queries_count{view="AnalyticsViewSet.dashboard"} 1', texte)
+        self.assertIn('view="devis_view",method="POST",status="400"', texte)
+        self.assertIn('transport_db_queries_bucket{view="ExpeditionViewSet.list",le="1"} 1', texte)
+        self.assertNotIn('metriques_view', texte)
+
+        reponse = self.client.get('/metrics', REMOTE_ADDR='10.0.0.8')
+        self.assertEqual(reponse.status_code, 403)
+
+    def test_journal_des_requetes_lentes(self):
+        self.assertEqual(
+            metriques.empreinte("SELECT * FROM t WHERE id IN (%s, %s, %s) AND nom = 'x' LIMIT 21"),
+            "SELECT * FROM t WHERE id IN (...) AND nom = ? LIMIT ?",
+        )
+        for i in range(3):
+            self.creer_expedition()
+        with mock.patch.object(metriques, 'SEUIL_REQUETES', 1), self.assertLogs('core.metriques') as journal:
+            self.client.get('/api/expeditions/')
+        self.assertIn('ExpeditionViewSet.list', journal.output[0])
+        self.assertIn('Requêtes les plus lentes', journal.output[0])
+
+
+class AsgiTests(DonneesMixin, APITestCase):
+    """Lectures servies par le gestionnaire ASGI (vues asynchrones)"""
+
+    def setUp(self):
+        super().setUp()
+        for histogramme in metriques.HISTOGRAMMES:
+            histogramme.vider()
+        self.expedition = self.creer_expedition()
+        TrackingHistorique.objects.create(expedition=self.expedition, lieu="Alger", statut="CENTRE_TRI")
+
+    async def test_suivi_dashboard_et_referentiel(self):
+        reponse = await self.async_client.get(f'/api/track/{self.expedition.numero_suivi}/')
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual([e['lieu'] for e in reponse.json()['evenements']], ["Alger"])
+        inconnu = await self.async_client.get('/api/track/INCONNU/')
+        self.assertEqual(inconnu.status_code, 404)
+
+        dashboard = (await self.async_client.get('/api/analytics/dashboard/', headers=self.entete)).json()
+        self.assertEqual(dashboard['expeditions']['total'], 1)
+        self.assertEqual(dashboard['top_clients'][0]['nom'], "Client A")
+        self.assertEqual(dashboard['top_destinations'][0]['ville'], "Paris")
+
+        liste = await self.async_client.get('/api/destinations/', headers=self.entete)
+        self.assertEqual(len(liste.json()['results']), 2)
+        reponse = await self.async_client.get('/api/destinations/',
+                                              headers={**self.entete, 'If-None-Match': liste['ETag']})
+        self.assertEqual(reponse.status_code, 304)
+
+        # Le SQL exécuté dans les threads de l'ORM async est attribué à sa requête
+        texte = (await self.async_client.get('/metrics')).content.decode()
+        self.assertIn('transport_db_queries_bucket{view="suivi_view",le="1"} 1', texte)
+        self.assertIn('transport_db_queries_count{view="AnalyticsViewSet.dashboard"} 1', texte)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class JetonsTests(DonneesMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.utilisateur.set_password("secret")
+        self.utilisateur.save()
+        self.client.credentials()
+
+    def connecter(self):
+        response = self.client.post('/api/login/', {'email': "agent@example.com", 'password': "secret"}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_connexion_rafraichissement_deconnexion(self):
+        self.assertEqual(self.client.get('/api/clients/').status_code, 401)
+        faux = self.client.post('/api/login/', {'email': "agent@example.com", 'password': "faux"}, format='json')
+        self.assertEqual(faux.status_code, 401)
+
+        paire = self.connecter()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {paire['acces']}")
+        # Jeton vérifié sans lecture de la base
+        requete = APIRequestFactory().get('/api/clients/', HTTP_AUTHORIZATION=f"Bearer {paire['acces']}")
+        with CaptureQueriesContext(connection) as requetes:
+            user, _ = jetons.JetonAuthentication().authenticate(requete)
+        self.assertEqual((user.pk, len(requetes)), (self.utilisateur.pk, 0))
+        self.assertEqual(self.client.get('/api/clients/').status_code, 200)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {paire['acces']}x")
+        self.assertEqual(self.client.get('/api/clients/').status_code, 401)
+        with mock.patch('time.time', return_value=time.time() + jetons.ACCES_DUREE + 1):
+            self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {paire['acces']}")
+            self.assertEqual(self.client.get('/api/clients/').status_code, 401)
+            # Un jeton d'accès expiré n'empêche ni le rafraîchissement ni le suivi public
+            nouvelle = self.client.post('/api/token/refresh/', {'rafraichissement': paire['rafraichissement']},
+                                        format='json')
+            self.assertEqual(nouvelle.status_code, 200)
+            numero = self.creer_expedition().numero_suivi
+            self.assertEqual(self.client.get(f'/api/track/{numero}/').status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {nouvelle.data['acces']}")
+        self.assertEqual(self.client.get('/api/clients/').status_code, 200)
+
+        self.assertEqual(self.client.post('/api/logout/').status_code, 204)
+        self.assertEqual(self.client.get('/api/clients/').status_code, 401)
+        self.client.credentials()
+        refus = self.client.post('/api/token/refresh/', {'rafraichissement': nouvelle.data['rafraichissement']},
+                                 format='json')
+        self.assertEqual(refus.status_code, 401)
+
+    def test_changement_de_mot_de_passe(self):
+        paire = self.connecter()
+        self.utilisateur.set_password("nouveau")
+        self.utilisateur.save()
+        response = self.client.post('/api/token/refresh/', {'rafraichissement': paire['rafraichissement']},
+                                    format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_revocations_vues_des_autres_processus(self):
+        paires = [self.connecter() for _ in range(2)]
+        sessions = [jetons.verifier(paire['acces'])['s'] for paire in paires]
+        for session in sessions:
+            jetons.revoquer(session)
+        # Un autre processus : rien en mémoire, seulement le cache partagé
+        with mock.patch.dict(jetons._revoquees, clear=True), \
+                mock.patch.multiple(jetons, _prochaine_synchro=0.0, _journal_lu=0):
+            for paire in paires:
+                self.assertIsNone(jetons.rafraichir(paire['rafraichissement']))
+            self.assertEqual([jetons.verifier(paire['acces']) for paire in paires], [None, None])
+
+    def test_cache_local_refuse_avec_plusieurs_workers(self):
+        jetons.verifier_cache(1)
+        with self.assertRaises(ImproperlyConfigured):
+            jetons.verifier_cache(4)
+
+
+class LimitationTests(DonneesMixin, APITestCase):
+
+    def test_seau_a_jetons(self):
+        self.assertEqual([limitation.prendre('essai', 2, 1, maintenant=100) for _ in range(3)], [0, 0, 1])
+        self.assertAlmostEqual(limitation.prendre('essai', 2, 1, maintenant=100.5), 0.5)
+        self.assertEqual(limitation.prendre('essai', 2, 1, maintenant=101), 0)
+
+    def test_budgets_par_utilisateur_et_par_route(self):
+        with mock.patch.dict(limitation.BUDGETS, {'lourd': (2, 0.01)}):
+            export = '/api/expeditions/export/?format=csv'
+            self.assertEqual([self.client.get(export).status_code for _ in range(3)], [200, 200, 429])
+            self.assertEqual(self.client.get('/api/factures/export/?format=csv').status_code, 429)
+            self.assertEqual(self.client.get('/api/analytics/dashboard/')['Retry-After'], '100')
+            # Budget standard pour les listes (référentiel compris) et les fiches, léger pour le suivi public
+            for url in ('/api/clients/', '/api/destinations/', f'/api/clients/{self.client_a.pk}/'):
+                self.assertEqual(self.client.get(url).status_code, 200)
+            numero = self.creer_expedition().numero_suivi
+            self.assertEqual(self.client.get(f'/api/track/{numero}/').status_code, 200)
+
+            autre = User.objects.create(username="autre", email="autre@example.com")
+            self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {jetons.emettre(autre)['acces']}")
+            self.assertEqual(self.client.get(export).status_code, 200)
+
+    def test_anonyme_identifie_par_son_adresse(self):
+        numero = self.creer_expedition().numero_suivi
+        self.client.credentials()
+        with mock.patch.dict(limitation.BUDGETS, {'leger': (2, 0.01)}):
+            codes = [self.client.get(f'/api/track/{numero}/', HTTP_X_FORWARDED_FOR=f'10.0.0.{i}').status_code
+                     for i in range(3)]
+        self.assertEqual(codes, [200, 200, 429])
+
+    def test_seaux_les_moins_recents_oublies(self):
+        with mock.patch.object(limitation, 'CLES_MAX', 2):
+            for cle in ('a', 'b', 'a', 'c'):
+                limitation.prendre(cle, 2, 1, maintenant=100)
+        self.assertEqual(list(limitation._seaux), ['a', 'c'])
+
+    async def test_dashboards_simultanes_regroupes(self):
+        appels = []
+        compteurs = statistiques.acompteurs
+
+        async def lent():
+            appels.append(1)
+            await asyncio.sleep(0.05)
+            return await compteurs()
+
+        with mock.patch.object(statistiques, 'acompteurs', lent):
+            reponses = await asyncio.gather(*(
+                self.async_client.get('/api/analytics/dashboard/', headers=self.entete) for _ in range(5)
+            ))
+            self.assertEqual([r.status_code for r in reponses], [200] * 5)
+            self.assertEqual(len(appels), 1)
+            # Après la réponse, rien n'est gardé : une nouvelle requête recalcule
+            await self.async_client.get('/api/analytics/dashboard/', headers=self.entete)
+            self.assertEqual(len(appels), 2)
+
+    async def test_regroupement_survit_a_l_abandon_du_meneur(self):
+        async def calcul():
+            await asyncio.sleep(0.05)
+            return 42
+
+        meneur = asyncio.ensure_future(regroupement.partager('cle', calcul))
+        await asyncio.sleep(0)
+        suiveur = asyncio.ensure_future(regroupement.partager('cle', calcul))
+        await asyncio.sleep(0.01)
+        meneur.cancel()
+        self.assertEqual(await suiveur, 42)
+        self.assertTrue(meneur.cancelled())
@@ -1,137 +1,318 @@
+import asyncio
+from collections.abc import Iterable
+from adrf import viewsets as aviewsets
+from adrf.decorators import api_view as async_api_view
 from rest_framework import viewsets, status
-from rest_framework.decorators import action, api_view
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes, throttle_classes
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from django.db.models import Count, Sum, Avg
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import timedelta
-from django.contrib.auth import authenticate
+import hashlib
 from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch, Sum
 from .models import (
     Client, Chauffeur, Vehicule, Destination, TypeService, Expedition,
     Tournee, TourneeExpedition, TrackingHistorique, Facture, FactureExpedition,
     Paiement, Incident, Reclamation
 )
+from . import comptabilite, devis, facturation, jetons, planification, recherche, routage, statistiques, suivi
+from .etats import TransitionMixin
+from .exports import ExportMixin
+from .pagination import KeysetPagination
+from .referentiel import ReferentielViewSet
+from .ingestion import importer_evenements, importer_expeditions
+from .parsers import NDJSONParser, CSVParser
 from .serializers import (
     ClientSerializer, ChauffeurSerializer, VehiculeSerializer, 
     DestinationSerializer, TypeServiceSerializer, ExpeditionSerializer,
     TourneeSerializer, TrackingHistoriqueSerializer, FactureSerializer,
     PaiementSerializer, IncidentSerializer, ReclamationSerializer
 )
+from .limitation import LimitationLegere, LimitationLourde
+from .regroupement import regrouper
+from .filters import (
+    ClientFilter, DestinationFilter, ExpeditionFilter, TourneeFilter, TrackingHistoriqueFilter, FactureFilter,
+    PaiementFilter, IncidentFilter, ReclamationFilter
+)
 
 class ClientViewSet(viewsets.ModelViewSet):
     queryset = Client.objects.all()
     serializer_class = ClientSerializer
+    ordering = ('id',)
+    filterset_class = ClientFilter
 
-class ChauffeurViewSet(viewsets.ModelViewSet):
+class ChauffeurViewSet(ReferentielViewSet):
     queryset = Chauffeur.objects.all()
     serializer_class = ChauffeurSerializer
+    ordering = ('id',)
 
-class VehiculeViewSet(viewsets.ModelViewSet):
+class VehiculeViewSet(ReferentielViewSet):
     queryset = Vehicule.objects.all()
     serializer_class = VehiculeSerializer
+    ordering = ('id',)
 
-class DestinationViewSet(viewsets.ModelViewSet):
+class DestinationViewSet(ReferentielViewSet):
     queryset = Destination.objects.all()
     serializer_class = DestinationSerializer
+    ordering = ('id',)
+    filterset_class = DestinationFilter
 
-class TypeServiceViewSet(viewsets.ModelViewSet):
+class TypeServiceViewSet(ReferentielViewSet):
     queryset = TypeService.objects.all()
     serializer_class = TypeServiceSerializer
+    ordering = ('id',)
 
-class ExpeditionViewSet(viewsets.ModelViewSet):
-    queryset = Expedition.objects.all()
+class ExpeditionViewSet(TransitionMixin, ExportMixin, viewsets.ModelViewSet):
+    queryset = Expedition.objects.select_related('client', 'destination', 'service')
     serializer_class = ExpeditionSerializer
-    filterset_fields = ['statut', 'client']
+    ordering = ('-date_creation', '-id')
+    filterset_class = ExpeditionFilter
+    export_fields = [
+        ('id', 'id'), ('numero_suivi', 'numero_suivi'), ('date_creation', 'date_creation'),
+        ('statut', 'statut'), ('client', 'client_id'), ('nom_client', 'client__nom'),
+        ('destination', 'destination_id'), ('ville_destination', 'destination__ville'),
+        ('service', 'service_id'), ('nom_service', 'service__nom'),
+        ('poids', 'poids'), ('volume', 'volume'), ('montant_total', 'montant_total'),
+        ('description', 'description'),
+    ]
+
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser, CSVParser])
+    def bulk(self, request):
+        """Import d'un manifeste : tableau JSON, NDJSON ou CSV (une expédition par ligne)"""
+        lignes = request.data
+        # Tableau JSON, ou générateur des parseurs NDJSON/CSV
+        if isinstance(lignes, (dict, str)) or not isinstance(lignes, Iterable):
+            return Response({'error': 'Liste d\'expéditions attendue'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        resultat = importer_expeditions(lignes)
+        if resultat['crees']:
+            code = status.HTTP_201_CREATED
+        elif resultat['erreurs']:
+            code = status.HTTP_400_BAD_REQUEST
+        else:
+            code = status.HTTP_200_OK
+        return Response(resultat, status=code)
 
 
 # Nouveaux ViewSets
-class TourneeViewSet(viewsets.ModelViewSet):
-    queryset = Tournee.objects.all()
+
+# Arrêts / lignes chargés en une requête, avec leur expédition et ses clés
+# étrangères jointes : 2 requêtes par page quel que soit le nombre d'arrêts.
+EXPEDITION_JOINTURES = ('expedition__client', 'expedition__destination', 'expedition__service')
+
+
+class TourneeViewSet(TransitionMixin, viewsets.ModelViewSet):
+    queryset = Tournee.objects.select_related('chauffeur', 'vehicule').prefetch_related(
+        Prefetch('expeditions', queryset=TourneeExpedition.objects.select_related(*EXPEDITION_JOINTURES)),
+    )
     serializer_class = TourneeSerializer
-    filterset_fields = ['statut', 'chauffeur', 'date']
+    ordering = ('-date_creation', '-id')
+    filterset_class = TourneeFilter
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # optimize relit les arrêts dans routage ; ?expand= / ?fields= peuvent
+        # aussi retirer les arrêts de la réponse
+        imbriques = self.get_serializer_class().imbriques_demandes(self.request)
+        if self.action == 'optimize' or 'expeditions' not in imbriques:
+            return queryset.prefetch_related(None)
+        return queryset
+
+    @action(detail=True, methods=['post'])
+    def optimize(self, request, pk=None):
+        """Calcule l'ordre de passage des arrêts et met à jour TourneeExpedition.ordre"""
+        tournee = self.get_object()
+        return Response(routage.optimiser_tournee(tournee))
+
+    @action(detail=False, methods=['post'])
+    def planifier(self, request):
+        """Répartit les expéditions en attente entre véhicules et chauffeurs libres ({"date": "AAAA-MM-JJ"})"""
+        valeur = request.data.get('date')
+        jour = parse_date(str(valeur)) if valeur else timezone.now().date()
+        if jour is None:
+            return Response({'error': 'Date invalide (format AAAA-MM-JJ)'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        resultat = planification.planifier(jour)
+        code = status.HTTP_201_CREATED if resultat['tournees'] else status.HTTP_200_OK
+        return Response(resultat, status=code)
 
 
-class TrackingHistoriqueViewSet(viewsets.ModelViewSet):
-    queryset = TrackingHistorique.objects.all()
+class TrackingHistoriqueViewSet(ExportMixin, viewsets.ModelViewSet):
+    queryset = TrackingHistorique.objects.select_related('expedition')
     serializer_class = TrackingHistoriqueSerializer
-    filterset_fields = ['expedition']
+    ordering = ('-date_heure', '-id')
+    filterset_class = TrackingHistoriqueFilter
+    export_fields = [
+        ('id', 'id'), ('expedition', 'expedition_id'), ('expedition_numero', 'expedition__numero_suivi'),
+        ('date_heure', 'date_heure'), ('lieu', 'lieu'), ('statut', 'statut'), ('commentaire', 'commentaire'),
+    ]
 
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser, CSVParser])
+    def bulk(self, request):
+        """Scans des hubs et terminaux : tableau JSON, NDJSON ou CSV (un événement par ligne)"""
+        lignes = request.data
+        if isinstance(lignes, (dict, str)) or not isinstance(lignes, Iterable):
+            return Response({'error': 'Liste d\'événements attendue'}, status=status.HTTP_400_BAD_REQUEST)
 
-class FactureViewSet(viewsets.ModelViewSet):
-    queryset = Facture.objects.all()
+        resultat = importer_evenements(lignes)
+        if resultat['crees']:
+            code = status.HTTP_201_CREATED
+        elif resultat['erreurs']:
+            code = status.HTTP_400_BAD_REQUEST
+        else:
+            code = status.HTTP_200_OK
+        return Response(resultat, status=code)
+
+
+class FactureViewSet(TransitionMixin, ExportMixin, viewsets.ModelViewSet):
+    queryset = Facture.objects.select_related('client').prefetch_related(
+        Prefetch('expeditions', queryset=FactureExpedition.objects.select_related(*EXPEDITION_JOINTURES)),
+    )
     serializer_class = FactureSerializer
-    filterset_fields = ['statut', 'client']
+    ordering = ('-date_emission', '-id')
+    filterset_class = FactureFilter
+    # Une ligne par expédition facturée (jointure sur FactureExpedition)
+    export_fields = [
+        ('id', 'id'), ('numero_facture', 'numero_facture'), ('client', 'client_id'),
+        ('client_nom', 'client__nom'), ('date_emission', 'date_emission'),
+        ('date_echeance', 'date_echeance'), ('statut', 'statut'), ('montant_ht', 'montant_ht'),
+        ('taux_tva', 'taux_tva'), ('montant_tva', 'montant_tva'), ('montant_ttc', 'montant_ttc'),
+        ('expedition', 'expeditions__expedition_id'),
+        ('expedition_numero', 'expeditions__expedition__numero_suivi'),
+        ('expedition_montant', 'expeditions__expedition__montant_total'),
+    ]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if 'expeditions' not in self.get_serializer_class().imbriques_demandes(self.request):
+            return queryset.prefetch_related(None)
+        return queryset
+
+    @action(detail=False, methods=['post'])
+    def generer(self, request):
+        """Facture les expéditions livrées créées jusqu'au jour `fin` inclus ({"fin": "AAAA-MM-JJ"})"""
+        fin = parse_date(str(request.data.get('fin', '')))
+        if fin is None:
+            return Response({'error': 'Date invalide (format AAAA-MM-JJ)'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            execution = facturation.facturer(fin)
+        except facturation.FacturationEnCours as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response({
+            'execution': execution.id,
+            'statut': execution.statut,
+            'factures_creees': execution.factures_creees,
+            'expeditions_facturees': execution.expeditions_facturees,
+            'montant_ttc': execution.montant_ttc,
+        })
 
 
 class PaiementViewSet(viewsets.ModelViewSet):
-    queryset = Paiement.objects.all()
+    queryset = Paiement.objects.select_related('facture')
     serializer_class = PaiementSerializer
-    filterset_fields = ['facture']
+    ordering = ('-date_paiement', '-id')
+    filterset_class = PaiementFilter
 
 
-class IncidentViewSet(viewsets.ModelViewSet):
-    queryset = Incident.objects.all()
+class IncidentViewSet(TransitionMixin, viewsets.ModelViewSet):
+    queryset = Incident.objects.select_related('expedition', 'tournee')
     serializer_class = IncidentSerializer
-    filterset_fields = ['statut', 'type_incident', 'expedition']
+    ordering = ('-date_incident', '-id')
+    filterset_class = IncidentFilter
 
 
-class ReclamationViewSet(viewsets.ModelViewSet):
-    queryset = Reclamation.objects.all()
+class ReclamationViewSet(TransitionMixin, viewsets.ModelViewSet):
+    queryset = Reclamation.objects.select_related('client', 'expedition', 'facture')
     serializer_class = ReclamationSerializer
-    filterset_fields = ['statut', 'client', 'type_reclamation']
+    ordering = ('-date_reclamation', '-id')
+    filterset_class = ReclamationFilter
 
 
 # Analytics ViewSet
-class AnalyticsViewSet(viewsets.ViewSet):
+DUREE_CACHE_CREANCES = getattr(settings, 'CREANCES_CACHE_TIMEOUT', 60)
+
+
+def _date_param(request, nom):
+    """Date optionnelle passée en paramètre ; ValueError si mal formée"""
+    valeur = request.query_params.get(nom)
+    if not valeur:
+        return None
+    date = parse_date(valeur)
+    if date is None:
+        raise ValueError(valeur)
+    return date
+
+
+class AnalyticsViewSet(aviewsets.ViewSet):
+    # Toutes les actions lisent les tables agrégées de core/statistiques.py :
+    # le coût dépend du nombre de jours/clés, pas du nombre d'expéditions.
+    # Actions asynchrones (adrf) : sous ASGI, une requête lente n'immobilise
+    # pas un worker pendant que les suivis passent. Budget lourd, et les
+    # requêtes identiques simultanées sont calculées une fois (regroupement).
+    throttle_classes = [LimitationLourde]
+
     @action(detail=False, methods=['get'])
-    def dashboard(self, request):
+    @regrouper
+    async def dashboard(self, request):
         """Statistiques globales pour le dashboard"""
         today = timezone.now().date()
         last_30_days = today - timedelta(days=30)
         
-        # Statistiques expéditions
-        total_expeditions = Expedition.objects.count()
-        expeditions_en_cours = Expedition.objects.exclude(statut='LIVRE').count()
-        expeditions_livrees = Expedition.objects.filter(statut='LIVRE').count()
-        expeditions_ce_mois = Expedition.objects.filter(date_creation__gte=last_30_days).count()
+        # Agrégats indépendants lancés ensemble
+        par_statut, ce_mois, compteurs, encours, top_clients, top_destinations = await asyncio.gather(
+            statistiques.atotaux_par_cle('statut'),
+            statistiques.atotaux_par_cle('statut', depuis=last_30_days),
+            statistiques.acompteurs(),
+            # Somme des soldes tenus par le grand livre (factures émises - paiements)
+            Client.objects.aaggregate(total=Sum('solde')),
+            statistiques.atop('client'),
+            statistiques.atop('destination'),
+        )
+        clients, destinations = await asyncio.gather(
+            Client.objects.ain_bulk([pk for pk, _ in top_clients]),
+            Destination.objects.ain_bulk([pk for pk, _ in top_destinations]),
+        )
+
+        # Statistiques expéditions (nombre et montant par statut)
+        total_expeditions = sum(n for n, _ in par_statut.values())
+        expeditions_livrees, chiffre_affaires = par_statut.get('LIVRE', (0, 0))
+        expeditions_en_cours = total_expeditions - expeditions_livrees
+        expeditions_ce_mois = sum(n for n, _ in ce_mois.values())
         
         # Statistiques financières
-        chiffre_affaires = Expedition.objects.filter(
-            statut='LIVRE'
-        ).aggregate(total=Sum('montant_total'))['total'] or 0
-        
-        factures_impayees = Facture.objects.exclude(statut='PAYEE').aggregate(
-            total=Sum('montant_ttc')
-        )['total'] or 0
+        factures_impayees = sum(
+            montant for statut, (_, montant) in compteurs['facture'].items() if statut != 'PAYEE'
+        )
+        encours_clients = encours['total'] or 0
         
         # Top clients
-        top_clients = Client.objects.annotate(
-            nb_expeditions=Count('expedition')
-        ).order_by('-nb_expeditions')[:5]
-        
         top_clients_data = [{
-            'id': c.id,
-            'nom': c.nom,
-            'nb_expeditions': c.nb_expeditions
-        } for c in top_clients]
+            'id': pk,
+            'nom': clients[pk].nom,
+            'nb_expeditions': nb
+        } for pk, nb in top_clients if pk in clients]
         
         # Top destinations
-        top_destinations = Destination.objects.annotate(
-            nb_expeditions=Count('expedition')
-        ).order_by('-nb_expeditions')[:5]
-        
         top_destinations_data = [{
-            'id': d.id,
-            'ville': d.ville,
-            'pays': d.pays,
-            'nb_expeditions': d.nb_expeditions
-        } for d in top_destinations]
+            'id': pk,
+            'ville': destinations[pk].ville,
+            'pays': destinations[pk].pays,
+            'nb_expeditions': nb
+        } for pk, nb in top_destinations if pk in destinations]
         
         # Incidents
-        incidents_ouverts = Incident.objects.exclude(statut='CLOS').count()
+        incidents_ouverts = sum(
+            n for statut, (n, _) in compteurs['incident'].items() if statut != 'CLOS'
+        )
         
         # Réclamations
-        reclamations_nouvelles = Reclamation.objects.filter(statut='NOUVELLE').count()
+        reclamations_nouvelles = compteurs['reclamation'].get('NOUVELLE', (0, 0))[0]
         
         return Response({
             'expeditions': {
@@ -143,6 +324,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
             'financier': {
                 'chiffre_affaires': float(chiffre_affaires),
                 'factures_impayees': float(factures_impayees),
+                'encours_clients': float(encours_clients),
             },
             'top_clients': top_clients_data,
             'top_destinations': top_destinations_data,
@@ -151,45 +333,84 @@ class AnalyticsViewSet(viewsets.ViewSet):
         })
 
     @action(detail=False, methods=['get'])
-    def expedition_trend(self, request):
-        """Tendance des expéditions sur les 6 derniers mois"""
-        from datetime import datetime
-        from dateutil.relativedelta import relativedelta
+    @regrouper
+    async def expedition_trend(self, request):
+        """
+        Tendance des expéditions par période (6 derniers mois par défaut).
+
+        Paramètres : ?granularity=day|week|month, ?from=/?to= (AAAA-MM-JJ),
+        ?breakdown=statut|service|destination pour le détail par clé.
+        """
+        granularite = request.query_params.get('granularity', 'month')
+        breakdown = request.query_params.get('breakdown')
+        if granularite not in statistiques.GRANULARITES:
+            return Response({'error': 'granularity doit valoir day, week ou month'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if breakdown not in (None, 'statut', 'service', 'destination'):
+            return Response({'error': 'breakdown doit valoir statut, service ou destination'},
+                            status=status.HTTP_400_BAD_REQUEST)
         
-        today = timezone.now().date()
-        trend_data = []
+        try:
+            debut = _date_param(request, 'from')
+            fin = _date_param(request, 'to') or timezone.now().date()
+        except ValueError:
+            return Response({'error': 'Date invalide (format AAAA-MM-JJ)'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not all(statistiques.DATE_MIN <= jour <= statistiques.DATE_MAX for jour in (debut, fin) if jour):
+            return Response({'error': f'Dates attendues entre {statistiques.DATE_MIN} et {statistiques.DATE_MAX}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if debut is None:
+            # 6 mois, 12 semaines ou 30 jours par défaut
+            debut = fin.replace(day=1)
+            for _ in range(5):
+                debut = (debut - timedelta(days=1)).replace(day=1)
+            debut = {'day': fin - timedelta(days=29), 'week': fin - timedelta(weeks=11)}.get(granularite, debut)
+        if debut > fin:
+            return Response({'error': 'from doit précéder to'}, status=status.HTTP_400_BAD_REQUEST)
+        if statistiques.nombre_periodes(debut, fin, granularite) > statistiques.PERIODES_MAX:
+            return Response({'error': f'Au plus {statistiques.PERIODES_MAX} périodes : '
+                                      f'réduire l\'intervalle ou choisir week ou month'},
+                            status=status.HTTP_400_BAD_REQUEST)
         
-        for i in range(6, 0, -1):
-            month_date = today - relativedelta(months=i)
-            month_start = month_date.replace(day=1)
-            
-            if i > 1:
-                next_month = month_date + relativedelta(months=1)
-                month_end = next_month.replace(day=1)
-            else:
-                month_end = today
-            
-            count = Expedition.objects.filter(
-                date_creation__gte=month_start,
-                date_creation__lt=month_end
-            ).count()
-            
-            trend_data.append({
-                'mois': month_date.strftime('%b'),
-                'expeditions': count,
-                'mois_complet': month_date.strftime('%B %Y')
-            })
+        trend_data = []
+        for periode, total, repartition in await statistiques.atendance(
+                debut, fin, granularite, dimension=breakdown or 'statut'):
+            point = {'periode': periode.isoformat(), 'expeditions': total}
+            if granularite == 'month':
+                point['mois'] = periode.strftime('%b')
+                point['mois_complet'] = periode.strftime('%B %Y')
+            if breakdown:
+                point[breakdown] = repartition
+            trend_data.append(point)
         
         return Response(trend_data)
     
     @action(detail=False, methods=['get'])
-    def status_distribution(self, request):
+    @regrouper
+    async def receivables(self, request):
+        """Balance âgée par client (factures émises non soldées), paginée par client"""
+        jour = timezone.now().date()
+        cle = 'creances:' + hashlib.md5(f'{jour}:{request.get_full_path()}'.encode()).hexdigest()
+        donnees = await cache.aget(cle)
+        if donnees is None:
+            # Page de clients par curseur, puis un seul agrégat pour ces clients
+            paginator = KeysetPagination()
+            paginator.ordering = ('id',)
+            clients = await paginator.apaginate_queryset(comptabilite.clients_debiteurs().values('id'), request)
+            lignes = comptabilite.balance_agee(jour).filter(client__in=[c['id'] for c in clients])
+            donnees = paginator.get_paginated_response([ligne async for ligne in lignes.order_by('client')]).data
+            donnees['date'] = jour
+            await cache.aset(cle, donnees, DUREE_CACHE_CREANCES)
+        return Response(donnees)
+
+    @action(detail=False, methods=['get'])
+    @regrouper
+    async def status_distribution(self, request):
         """Distribution des expéditions par statut"""
-        from django.db.models import Count
-        
-        distribution = Expedition.objects.values('statut').annotate(
-            count=Count('id')
-        ).order_by('-count')
+        distribution = sorted(
+            (await statistiques.atotaux_par_cle('statut')).items(),
+            key=lambda item: -item[1][0]
+        )
         
         status_labels = {
             'EN_TRANSIT': 'En Transit',
@@ -200,17 +421,91 @@ class AnalyticsViewSet(viewsets.ViewSet):
         }
         
         data = [{
-            'name': status_labels.get(item['statut'], item['statut']),
-            'value': item['count'],
-            'statut': item['statut']
-        } for item in distribution]
+            'name': status_labels.get(statut, statut),
+            'value': count,
+            'statut': statut
+        } for statut, (count, _) in distribution if count]
         
         return Response(data)
 
+    @action(detail=False, methods=['get'])
+    @regrouper
+    async def counts(self, request):
+        """Nombre de lignes par table de base ; les expéditions sont lues dans les agrégats"""
+        modeles = {
+            'clients': Client, 'chauffeurs': Chauffeur, 'vehicules': Vehicule,
+            'destinations': Destination, 'types_service': TypeService,
+        }
+        nombres, par_statut = await asyncio.gather(
+            asyncio.gather(*(modele.objects.acount() for modele in modeles.values())),
+            statistiques.atotaux_par_cle('statut'),
+        )
+        data = dict(zip(modeles, nombres))
+        data['expeditions'] = sum(n for n, _ in par_statut.values())
+        return Response(data)
+
+
+@async_api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+@throttle_classes([LimitationLegere])
+async def suivi_view(request, numero_suivi):
+    """Suivi public d'une expédition : statut et derniers événements (?limit=, 10 par défaut)"""
+    donnees = await suivi.aconsulter(numero_suivi)
+    if donnees is None:
+        return Response({'error': 'Numéro de suivi inconnu'}, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        limite = min(max(int(request.query_params.get('limit', 10)), 0), suivi.EVENEMENTS_MAX)
+    except ValueError:
+        limite = 10
+    return Response(dict(donnees, evenements=donnees['evenements'][:limite]))
+
+
+@api_view(['GET'])
+def recherche_view(request):
+    """Autocomplétion : meilleurs résultats par type (?q=, ?types=clients,expeditions,destinations, ?limit=20)"""
+    texte = request.query_params.get('q', '')
+    if not recherche.mots(texte):
+        return Response({'q': ['Ce champ est obligatoire.']}, status=status.HTTP_400_BAD_REQUEST)
+    types = [t for t in request.query_params.get('types', '').split(',') if t] or list(recherche.TYPES)
+    inconnus = [t for t in types if t not in recherche.TYPES]
+    if inconnus:
+        return Response({'types': [f"« {t} » n'est pas un choix valide." for t in inconnus]},
+                        status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limite = min(max(int(request.query_params.get('limit', recherche.LIMITE)), 1), recherche.LIMITE_MAX)
+    except ValueError:
+        limite = recherche.LIMITE
+    return Response(dict(recherche.suggestions(texte, types, limite), q=texte))
+
+
+@api_view(['POST'])
+def devis_view(request):
+    """Prix d'une expédition (objet) ou d'une liste d'expéditions, sans rien créer"""
+    unique = isinstance(request.data, dict)
+    lignes = [request.data] if unique else request.data
+    if not isinstance(lignes, list):
+        return Response({'error': 'Objet ou liste attendu'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(lignes) > devis.LIGNES_MAX:
+        return Response(
+            {'error': f'{devis.LIGNES_MAX} lignes au maximum par requête'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    resultat = devis.coter(lignes)
+    if unique:
+        if resultat['erreurs']:
+            return Response(resultat['erreurs'][0]['erreurs'], status=status.HTTP_400_BAD_REQUEST)
+        return Response(resultat['resultats'][0])
+    return Response(resultat)
+
 
 @api_view(['POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])
 def login_view(request):
-    """Login endpoint that accepts email and password"""
+    """Vérifie email et mot de passe, puis renvoie les jetons de la session (core/jetons.py)"""
     email = request.data.get('email')
     password = request.data.get('password')
     
@@ -220,17 +515,12 @@ def login_view(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Find user by email
-    try:
-        user = User.objects.get(email=email)
-    except User.DoesNotExist:
-        return Response(
-            {'error': 'Email ou mot de passe incorrect'},
-            status=status.HTTP_401_UNAUTHORIZED
-        )
-    
-    # Check password
-    if not user.check_password(password):
+    # Recherche par email (index auth_user_email_idx)
+    user = User.objects.filter(email=email).order_by('pk').first()
+    if user is None:
+        # Même coût qu'un mot de passe faux : l'email existant ne se devine pas au temps de réponse
+        User().set_password(password)
+    if user is None or not user.check_password(password) or not user.is_active:
         return Response(
             {'error': 'Email ou mot de passe incorrect'},
             status=status.HTTP_401_UNAUTHORIZED
@@ -245,5 +535,26 @@ def login_view(request):
             'email': user.email,
             'is_staff': user.is_staff,
             'is_superuser': user.is_superuser
-        }
+        },
+        **jetons.emettre(user),
     }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def rafraichir_view(request):
+    """Nouvelle paire de jetons contre le jeton de rafraîchissement ({"rafraichissement": "..."})"""
+    paire = jetons.rafraichir(request.data.get('rafraichissement'))
+    if paire is None:
+        return Response({'error': 'Session expirée, veuillez vous reconnecter'},
+                        status=status.HTTP_401_UNAUTHORIZED)
+    return Response(paire)
+
+
+@api_view(['POST'])
+def logout_view(request):
+    """Révoque la session du jeton présenté"""
+    if isinstance(request.auth, dict):
+        jetons.revoquer(request.auth['s'])
+    return Response(status=status.HTTP_204_NO_CONTENT)
@@ -12,7 +12,6 @@ const AnalyticsDashboard = () => {
 
   useEffect(() => {
     fetchStats();
-    fetchExpeditions();
     fetchExpeditionTrend();
     fetchStatusDistribution();
   }, []);
@@ -28,6 +27,7 @@ const AnalyticsDashboard = () => {
     }
   };
 
+  // Repli de la répartition par statut : toutes les expéditions, page par page
   const fetchExpeditions = async () => {
     try {
       const response = await expeditionAPI.getAll();
@@ -52,6 +52,7 @@ const AnalyticsDashboard = () => {
       setStatusDistribution(response.data);
     } catch (error) {
       console.error('Error fetching status distribution:', error);
+      fetchExpeditions();
     }
   };
 
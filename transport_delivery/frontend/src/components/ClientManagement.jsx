@@ -7,21 +7,22 @@ const ClientManagement = ({ onBack }) => {
   const [loading, setLoading] = useState(false);
   const [showForm, setShowForm] = useState(false);
   const [editingClient, setEditingClient] = useState(null);
+  const [recherche, setRecherche] = useState('');
   const [formData, setFormData] = useState({
     nom: '',
     adresse: '',
-    telephone: '',
-    solde: '0.00'
+    telephone: ''
   });
 
   useEffect(() => {
-    fetchClients();
-  }, []);
+    const delai = setTimeout(fetchClients, recherche ? 300 : 0);
+    return () => clearTimeout(delai);
+  }, [recherche]);
 
   const fetchClients = async () => {
     setLoading(true);
     try {
-      const response = await clientAPI.getAll();
+      const response = await clientAPI.getAll(recherche.trim() ? { q: recherche.trim() } : {});
       setClients(response.data);
     } catch (error) {
       console.error('Error fetching clients:', error);
@@ -49,7 +50,8 @@ const ClientManagement = ({ onBack }) => {
 
   const handleEdit = (client) => {
     setEditingClient(client);
-    setFormData(client);
+    // Le solde est calculé par le serveur (grand livre), il n'est pas modifiable
+    setFormData({ nom: client.nom, adresse: client.adresse, telephone: client.telephone });
     setShowForm(true);
   };
 
@@ -66,7 +68,7 @@ const ClientManagement = ({ onBack }) => {
   };
 
   const resetForm = () => {
-    setFormData({ nom: '', adresse: '', telephone: '', solde: '0.00' });
+    setFormData({ nom: '', adresse: '', telephone: '' });
     setEditingClient(null);
     setShowForm(false);
   };
@@ -89,12 +91,21 @@ const ClientManagement = ({ onBack }) => {
           <h2 className="text-3xl font-bold text-gray-900">Gestion des Clients</h2>
           <p className="text-gray-600 mt-1">Gérer tous les clients avec opérations CRUD complètes</p>
         </div>
-        <button
-          onClick={() => setShowForm(!showForm)}
-          className="flex items-center gap-2 bg-blue-600 text-white px-6 py-3 rounded-lg hover:bg-blue-700 transition shadow-md"
-        >
-          <FaPlus /> {showForm ? 'Annuler' : 'Nouveau Client'}
-        </button>
+        <div className="flex gap-2">
+          <input
+            type="search"
+            value={recherche}
+            onChange={(e) => setRecherche(e.target.value)}
+            placeholder="Nom, téléphone..."
+            className="px-3 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-blue-500"
+          />
+          <button
+            onClick={() => setShowForm(!showForm)}
+            className="flex items-center gap-2 bg-blue-600 text-white px-6 py-3 rounded-lg hover:bg-blue-700 transition shadow-md"
+          >
+            <FaPlus /> {showForm ? 'Annuler' : 'Nouveau Client'}
+          </button>
+        </div>
       </div>
 
       {/* Form */}
@@ -134,17 +145,6 @@ const ClientManagement = ({ onBack }) => {
                 required
               />
             </div>
-            <div>
-              <label className="block text-sm font-semibold text-gray-700 mb-2">Solde (€)</label>
-              <input
-                type="number"
-                step="0.01"
-                value={formData.solde}
-                onChange={(e) => setFormData({ ...formData, solde: e.target.value })}
-                className="w-full px-4 py-3 border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-blue-500 focus:border-transparent transition"
-                required
-              />
-            </div>
             <div className="md:col-span-2 flex gap-3 mt-2">
               <button
                 type="submit"
@@ -11,6 +11,7 @@ const ExpeditionManagement = ({ onBack }) => {
   const [showForm, setShowForm] = useState(false);
   const [editingExpedition, setEditingExpedition] = useState(null);
   const [filterStatut, setFilterStatut] = useState('');
+  const [recherche, setRecherche] = useState('');
   const [formData, setFormData] = useState({
     client: '',
     destination: '',
@@ -29,27 +30,44 @@ const ExpeditionManagement = ({ onBack }) => {
     { value: 'ECHEC', label: 'Échec', color: 'red' },
   ];
 
+  // Listes des formulaires : chargées une fois, pas à chaque recherche
   useEffect(() => {
-    fetchAll();
-  }, [filterStatut]);
+    fetchReferences();
+  }, []);
 
-  const fetchAll = async () => {
-    setLoading(true);
+  useEffect(() => {
+    // Recherche côté serveur, relancée une fois la frappe terminée
+    const delai = setTimeout(fetchAll, recherche ? 300 : 0);
+    return () => clearTimeout(delai);
+  }, [filterStatut, recherche]);
+
+  const fetchReferences = async () => {
     try {
-      const params = filterStatut ? { statut: filterStatut } : {};
-      const [expResponse, clientsResponse, destResponse, servResponse] = await Promise.all([
-        expeditionAPI.getAll(params),
+      const [clientsResponse, destResponse, servResponse] = await Promise.all([
         clientAPI.getAll(),
         destinationAPI.getAll(),
         typeServiceAPI.getAll()
       ]);
-      setExpeditions(expResponse.data);
       setClients(clientsResponse.data);
       setDestinations(destResponse.data);
       setServices(servResponse.data);
     } catch (error) {
       console.error('Error fetching data:', error);
       alert('Erreur lors du chargement des données');
+    }
+  };
+
+  const fetchAll = async () => {
+    setLoading(true);
+    try {
+      const params = {};
+      if (filterStatut) params.statut = filterStatut;
+      if (recherche.trim()) params.q = recherche.trim();
+      const expResponse = await expeditionAPI.getAll(params);
+      setExpeditions(expResponse.data);
+    } catch (error) {
+      console.error('Error fetching data:', error);
+      alert('Erreur lors du chargement des données');
     } finally {
       setLoading(false);
     }
@@ -134,6 +152,13 @@ const ExpeditionManagement = ({ onBack }) => {
           <p className="text-gray-600 mt-1">Gérer toutes les expéditions avec opérations CRUD complètes</p>
         </div>
         <div className="flex gap-2">
+          <input
+            type="search"
+            value={recherche}
+            onChange={(e) => setRecherche(e.target.value)}
+            placeholder="N° de suivi, description..."
+            className="px-3 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-blue-500"
+          />
           <select
             value={filterStatut}
             onChange={(e) => setFilterStatut(e.target.value)}
@@ -24,6 +24,8 @@ const Login = ({ onLogin }) => {
         localStorage.setItem('username', response.data.user.username);
         localStorage.setItem('email', response.data.user.email);
         localStorage.setItem('userId', response.data.user.id);
+        localStorage.setItem('acces', response.data.acces);
+        localStorage.setItem('rafraichissement', response.data.rafraichissement);
         onLogin();
       }
     } catch (err) {
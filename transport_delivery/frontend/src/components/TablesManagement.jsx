@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { FaUsers, FaUserTie, FaCar, FaMapMarkerAlt, FaCog, FaDollarSign } from 'react-icons/fa';
-import { clientAPI, chauffeurAPI, vehiculeAPI, destinationAPI, typeServiceAPI, expeditionAPI } from '../services/api';
+import { analyticsAPI } from '../services/api';
 
 const TableCard = ({ title, icon: Icon, count, onClick, isActive }) => (
   <button
@@ -40,22 +40,16 @@ const TablesManagement = ({ onSelectTable }) => {
 
   const fetchCounts = async () => {
     try {
-      const [clients, drivers, vehicles, destinations, services, shipments] = await Promise.all([
-        clientAPI.getAll(),
-        chauffeurAPI.getAll(),
-        vehiculeAPI.getAll(),
-        destinationAPI.getAll(),
-        typeServiceAPI.getAll(),
-        expeditionAPI.getAll(),
-      ]);
+      // Nombres calculés par le serveur : les listes sont paginées
+      const { data } = await analyticsAPI.getCounts();
 
       setCounts({
-        clients: clients.data.length,
-        drivers: drivers.data.length,
-        vehicles: vehicles.data.length,
-        destinations: destinations.data.length,
-        serviceTypes: services.data.length,
-        shipments: shipments.data.length,
+        clients: data.clients,
+        drivers: data.chauffeurs,
+        vehicles: data.vehicules,
+        destinations: data.destinations,
+        serviceTypes: data.types_service,
+        shipments: data.expeditions,
       });
     } catch (error) {
       console.error('Error fetching counts:', error);
@@ -9,9 +9,110 @@ const api = axios.create({
   },
 });
 
+// Jeton d'accès (15 min) envoyé à chaque requête, renouvelé par le jeton de
+// rafraîchissement à la première réponse 401
+api.interceptors.request.use((config) => {
+  const acces = localStorage.getItem('acces');
+  if (acces) {
+    config.headers.Authorization = `Bearer ${acces}`;
+  }
+  return config;
+});
+
+export const oublierSession = () => {
+  ['isAuthenticated', 'username', 'email', 'userId', 'acces', 'rafraichissement']
+    .forEach((cle) => localStorage.removeItem(cle));
+};
+
+// Un seul rafraîchissement à la fois pour toutes les requêtes refusées
+let rafraichissement = null;
+
+const rafraichir = () => {
+  if (!rafraichissement) {
+    rafraichissement = axios
+      .post(`${API_BASE_URL}/token/refresh/`, { rafraichissement: localStorage.getItem('rafraichissement') })
+      .then(({ data }) => {
+        localStorage.setItem('acces', data.acces);
+        localStorage.setItem('rafraichissement', data.rafraichissement);
+        return data.acces;
+      })
+      .finally(() => {
+        rafraichissement = null;
+      });
+  }
+  return rafraichissement;
+};
+
+// Débit limité (429) : la requête est rejouée après Retry-After, si l'attente
+// est courte, au plus REJEUX_429 fois
+const ATTENTE_429_MAX = 10;
+const REJEUX_429 = 3;
+
+const attendre = (secondes) => new Promise((resolve) => setTimeout(resolve, secondes * 1000));
+
+// Un seul message pour toutes les requêtes refusées pendant la même attente
+let limiteSignalee = false;
+
+const signalerLimite = (attente) => {
+  if (!limiteSignalee) {
+    limiteSignalee = true;
+    setTimeout(() => { limiteSignalee = false; }, attente * 1000);
+    alert(`Trop de requêtes : réessayez dans ${attente} s`);
+  }
+};
+
+// Les listes sont paginées par curseur : on expose `results` comme avant
+// et on garde les liens de navigation dans `response.pagination` (suivis
+// par toutesLesPages)
+api.interceptors.response.use((response) => {
+  const { data } = response;
+  if (data && Array.isArray(data.results) && 'next' in data) {
+    response.pagination = { next: data.next, previous: data.previous };
+    response.data = data.results;
+  }
+  return response;
+}, async (error) => {
+  const { config, response } = error;
+  if (response?.status === 429 && config) {
+    const attente = Number(response.headers['retry-after']) || 1;
+    const rejeux = config.rejeux429 || 0;
+    if (attente <= ATTENTE_429_MAX && rejeux < REJEUX_429) {
+      await attendre(attente);
+      return api({ ...config, rejeux429: rejeux + 1 });
+    }
+    error.message = `Trop de requêtes : réessayez dans ${attente} s`;
+    signalerLimite(attente);
+    return Promise.reject(error);
+  }
+  if (response?.status !== 401 || !config || config.dejaRejoue || !localStorage.getItem('rafraichissement')) {
+    return Promise.reject(error);
+  }
+  try {
+    const acces = await rafraichir();
+    return api({ ...config, dejaRejoue: true, headers: { ...config.headers, Authorization: `Bearer ${acces}` } });
+  } catch {
+    // Session révoquée ou expirée : retour à l'écran de connexion
+    oublierSession();
+    window.location.reload();
+    return Promise.reject(error);
+  }
+});
+
+// Liste complète : suit les liens `next` de la pagination par curseur et
+// renvoie toutes les lignes dans `data`, comme une réponse non paginée
+export const toutesLesPages = async (url, params) => {
+  let response = await api.get(url, { params });
+  const lignes = [...response.data];
+  while (response.pagination?.next) {
+    response = await api.get(response.pagination.next);
+    lignes.push(...response.data);
+  }
+  return { ...response, data: lignes };
+};
+
 // Client API
 export const clientAPI = {
-  getAll: () => api.get('/clients/'),
+  getAll: (params) => toutesLesPages('/clients/', params),
   get: (id) => api.get(`/clients/${id}/`),
   create: (data) => api.post('/clients/', data),
   update: (id, data) => api.put(`/clients/${id}/`, data),
@@ -20,7 +121,7 @@ export const clientAPI = {
 
 // Chauffeur API
 export const chauffeurAPI = {
-  getAll: () => api.get('/chauffeurs/'),
+  getAll: (params) => toutesLesPages('/chauffeurs/', params),
   get: (id) => api.get(`/chauffeurs/${id}/`),
   create: (data) => api.post('/chauffeurs/', data),
   update: (id, data) => api.put(`/chauffeurs/${id}/`, data),
@@ -29,7 +130,7 @@ export const chauffeurAPI = {
 
 // Vehicule API
 export const vehiculeAPI = {
-  getAll: () => api.get('/vehicules/'),
+  getAll: (params) => toutesLesPages('/vehicules/', params),
   get: (id) => api.get(`/vehicules/${id}/`),
   create: (data) => api.post('/vehicules/', data),
   update: (id, data) => api.put(`/vehicules/${id}/`, data),
@@ -38,7 +139,7 @@ export const vehiculeAPI = {
 
 // Destination API
 export const destinationAPI = {
-  getAll: () => api.get('/destinations/'),
+  getAll: (params) => toutesLesPages('/destinations/', params),
   get: (id) => api.get(`/destinations/${id}/`),
   create: (data) => api.post('/destinations/', data),
   update: (id, data) => api.put(`/destinations/${id}/`, data),
@@ -47,7 +148,7 @@ export const destinationAPI = {
 
 // TypeService API
 export const typeServiceAPI = {
-  getAll: () => api.get('/types-service/'),
+  getAll: (params) => toutesLesPages('/types-service/', params),
   get: (id) => api.get(`/types-service/${id}/`),
   create: (data) => api.post('/types-service/', data),
   update: (id, data) => api.put(`/types-service/${id}/`, data),
@@ -56,43 +157,62 @@ export const typeServiceAPI = {
 
 // Expedition API
 export const expeditionAPI = {
-  getAll: (params) => api.get('/expeditions/', { params }),
+  getAll: (params) => toutesLesPages('/expeditions/', params),
   get: (id) => api.get(`/expeditions/${id}/`),
   create: (data) => api.post('/expeditions/', data),
   update: (id, data) => api.put(`/expeditions/${id}/`, data),
   delete: (id) => api.delete(`/expeditions/${id}/`),
+  // Changement de statut de plusieurs lignes ; extra : { lieu, commentaire }
+  transition: (ids, statut, extra) => api.post('/expeditions/transition/', { ids, statut, ...extra }),
 };
 
 // Tournée API
 export const tourneeAPI = {
-  getAll: (params) => api.get('/tournees/', { params }),
+  getAll: (params) => toutesLesPages('/tournees/', params),
   get: (id) => api.get(`/tournees/${id}/`),
   create: (data) => api.post('/tournees/', data),
   update: (id, data) => api.put(`/tournees/${id}/`, data),
   delete: (id) => api.delete(`/tournees/${id}/`),
+  transition: (ids, statut, extra) => api.post('/tournees/transition/', { ids, statut, ...extra }),
 };
 
 // Tracking API
 export const trackingAPI = {
-  getAll: (params) => api.get('/tracking/', { params }),
+  getAll: (params) => toutesLesPages('/tracking/', params),
   get: (id) => api.get(`/tracking/${id}/`),
   create: (data) => api.post('/tracking/', data),
   update: (id, data) => api.put(`/tracking/${id}/`, data),
   delete: (id) => api.delete(`/tracking/${id}/`),
 };
 
+// Suivi public par numéro de suivi
+export const suiviAPI = {
+  get: (numeroSuivi, params) => api.get(`/track/${numeroSuivi}/`, { params }),
+};
+
+// Recherche : ?q= sur les listes, ou autocomplétion sur clients, expéditions et destinations
+export const rechercheAPI = {
+  suggestions: (q, params) => api.get('/search/', { params: { q, ...params } }),
+};
+
+// Devis : prix avant création (objet ou liste)
+export const devisAPI = {
+  quote: (data) => api.post('/quotes/', data),
+};
+
 // Facture API
 export const factureAPI = {
-  getAll: (params) => api.get('/factures/', { params }),
+  getAll: (params) => toutesLesPages('/factures/', params),
   get: (id) => api.get(`/factures/${id}/`),
   create: (data) => api.post('/factures/', data),
   update: (id, data) => api.put(`/factures/${id}/`, data),
   delete: (id) => api.delete(`/factures/${id}/`),
+  transition: (ids, statut, extra) => api.post('/factures/transition/', { ids, statut, ...extra }),
 };
 
 // Paiement API
 export const paiementAPI = {
-  getAll: (params) => api.get('/paiements/', { params }),
+  getAll: (params) => toutesLesPages('/paiements/', params),
   get: (id) => api.get(`/paiements/${id}/`),
   create: (data) => api.post('/paiements/', data),
   update: (id, data) => api.put(`/paiements/${id}/`, data),
@@ -101,32 +221,38 @@ export const paiementAPI = {
 
 // Incident API
 export const incidentAPI = {
-  getAll: (params) => api.get('/incidents/', { params }),
+  getAll: (params) => toutesLesPages('/incidents/', params),
   get: (id) => api.get(`/incidents/${id}/`),
   create: (data) => api.post('/incidents/', data),
   update: (id, data) => api.put(`/incidents/${id}/`, data),
   delete: (id) => api.delete(`/incidents/${id}/`),
+  transition: (ids, statut, extra) => api.post('/incidents/transition/', { ids, statut, ...extra }),
 };
 
 // Réclamation API
 export const reclamationAPI = {
-  getAll: (params) => api.get('/reclamations/', { params }),
+  getAll: (params) => toutesLesPages('/reclamations/', params),
   get: (id) => api.get(`/reclamations/${id}/`),
   create: (data) => api.post('/reclamations/', data),
   update: (id, data) => api.put(`/reclamations/${id}/`, data),
   delete: (id) => api.delete(`/reclamations/${id}/`),
+  transition: (ids, statut, extra) => api.post('/reclamations/transition/', { ids, statut, ...extra }),
 };
 
 // Analytics API
 export const analyticsAPI = {
   getDashboard: () => api.get('/analytics/dashboard/'),
-  getExpeditionTrend: () => api.get('/analytics/expedition_trend/'),
+  getExpeditionTrend: (params) => api.get('/analytics/expedition_trend/', { params }),
   getStatusDistribution: () => api.get('/analytics/status_distribution/'),
+  getReceivables: (params) => api.get('/analytics/receivables/', { params }),
+  // Nombre de lignes par table (clients, chauffeurs, vehicules, destinations, types_service, expeditions)
+  getCounts: () => api.get('/analytics/counts/'),
 };
 
 // Auth API
 export const authAPI = {
   login: (email, password) => api.post('/login/', { email, password }),
+  logout: () => api.post('/logout/'),
 };
 
 export default api;
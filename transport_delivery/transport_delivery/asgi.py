@@ -3,6 +3,14 @@ ASGI config for transport_delivery project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Le suivi, les actions d'analytics et les listes de référence sont des vues
+asynchrones : servies en ASGI, un processus garde des milliers de suivis en
+attente sans un thread chacun. En production, plusieurs workers partagent
+leur cache par Redis (settings.py refuse de démarrer sans REDIS_URL) :
+
+    REDIS_URL=redis://localhost:6379/0 WEB_CONCURRENCY=4 \
+        uvicorn transport_delivery.asgi:application --no-access-log
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
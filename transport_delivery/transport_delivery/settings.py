@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -38,11 +41,15 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',      # Ajout
+    'adrf',                # vues DRF asynchrones (suivi, analytics, référentiel)
     'corsheaders',         # Ajout
+    'django_filters',
     'core',
 ]
 
 MIDDLEWARE = [
+    # En tête de pile pour mesurer aussi les autres middlewares
+    'core.metriques.MetriquesMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -76,11 +83,99 @@ WSGI_APPLICATION = 'transport_delivery.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Base de données choisie par l'environnement : SQLite par défaut, PostgreSQL
+# avec DB_ENGINE=postgresql (POSTGRES_DB, POSTGRES_USER, POSTGRES_PASSWORD,
+# POSTGRES_HOST, POSTGRES_PORT).
+if os.environ.get('DB_ENGINE') == 'postgresql':
+    DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', '0'))
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'transport_delivery'),
+            'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # Le pool (psycopg_pool) et les connexions persistantes s'excluent :
+            # avec DB_POOL_MAX > 0 chaque requête emprunte une connexion au pool
+            'CONN_MAX_AGE': 0 if DB_POOL_MAX else int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DB_POOL_MIN', '2')),
+                    'max_size': DB_POOL_MAX,
+                    'timeout': int(os.environ.get('DB_POOL_TIMEOUT', '10')),
+                },
+            } if DB_POOL_MAX else {},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # WAL : les lectures ne bloquent plus les écritures. IMMEDIATE :
+                # le verrou d'écriture est pris au début de la transaction, et
+                # busy_timeout fait attendre au lieu de « database is locked ».
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA busy_timeout=20000;'
+                    'PRAGMA mmap_size=268435456;'
+                    'PRAGMA cache_size=-65536;'
+                    'PRAGMA temp_store=MEMORY'
+                ),
+            },
+        }
+    }
+
+
+# Cache (suivi public, créances, données de référence). Mémoire locale par
+# défaut ; REDIS_URL (ex. redis://localhost:6379/0) pour un cache partagé
+# entre processus (paquet redis, dans requirements.txt).
+# Plusieurs workers (WEB_CONCURRENCY, lu aussi par uvicorn et gunicorn) :
+# invalidations du référentiel, révocations de jetons et seaux de limitation
+# doivent être vus de tous, REDIS_URL est alors obligatoire.
+if int(os.environ.get('WEB_CONCURRENCY') or 1) > 1 and not os.environ.get('REDIS_URL'):
+    raise ImproperlyConfigured('WEB_CONCURRENCY > 1 exige REDIS_URL (cache partagé entre les workers)')
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+            'KEY_PREFIX': 'transport-delivery',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'transport-delivery',
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        }
     }
+
+SUIVI_CACHE_TIMEOUT = 300
+CREANCES_CACHE_TIMEOUT = 60
+REFERENTIEL_CACHE = 'default'
+REFERENTIEL_CACHE_TIMEOUT = 3600
+
+# Instrumentation (core/metriques.py) : /metrics et journal des requêtes lentes
+METRIQUES_SEUIL_LENT_MS = 1000
+METRIQUES_SEUIL_REQUETES = 200
+METRIQUES_IPS = ['127.0.0.1', '::1']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core': {'handlers': ['console'], 'level': 'INFO'},
+    },
 }
 
 
@@ -106,6 +201,40 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
 ]
+# Lu par le frontend pour rejouer une requête limitée (429)
+CORS_EXPOSE_HEADERS = ['Retry-After']
+
+REST_FRAMEWORK = {
+    # Pagination par curseur sur (date, id) : pas de COUNT ni d'OFFSET
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    # Jetons signés vérifiés sans requête (core/jetons.py) ; la session sert à l'API navigable
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'core.jetons.JetonAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.IsAuthenticated'],
+    # Seaux à jetons par utilisateur (core/limitation.py)
+    'DEFAULT_THROTTLE_CLASSES': ['core.limitation.LimitationParDefaut'],
+    # Proxys de confiance devant l'application ; 0 : X-Forwarded-For ignoré
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES') or 0),
+}
+
+# Jetons (core/jetons.py) : durées en secondes, cache des sessions révoquées
+# (partagé et sans éviction dès que WEB_CONCURRENCY > 1)
+JETON_ACCES_DUREE = 15 * 60
+JETON_RAFRAICHISSEMENT_DUREE = 7 * 24 * 3600
+JETONS_CACHE = 'default'
+
+# Limitation de débit (core/limitation.py) : (capacité, jetons par seconde)
+LIMITATION_BUDGETS = {
+    'lourd': (30, 1),
+    'standard': (120, 10),
+    'leger': (300, 50),
+}
+# Alias de CACHES pour partager les seaux entre processus ; None : en mémoire
+LIMITATION_CACHE = 'default' if os.environ.get('REDIS_URL') else None
 
 
 # Internationalization
@@ -20,12 +20,13 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from core.metriques import metriques_view
 from core.views import (
     ClientViewSet, ExpeditionViewSet, ChauffeurViewSet,
     VehiculeViewSet, DestinationViewSet, TypeServiceViewSet,
     TourneeViewSet, TrackingHistoriqueViewSet, FactureViewSet,
     PaiementViewSet, IncidentViewSet, ReclamationViewSet, AnalyticsViewSet,
-    login_view
+    login_view, rafraichir_view, logout_view, suivi_view, devis_view, recherche_view
 )
 
 router = DefaultRouter()
@@ -50,4 +51,10 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include(router.urls)),
     path('api/login/', login_view, name='login'),
+    path('api/token/refresh/', rafraichir_view, name='rafraichir'),
+    path('api/logout/', logout_view, name='logout'),
+    path('api/track/<str:numero_suivi>/', suivi_view, name='suivi'),
+    path('api/quotes/', devis_view, name='devis'),
+    path('api/search/', recherche_view, name='recherche'),
+    path('metrics', metriques_view, name='metriques'),
 ]